@@ -0,0 +1,54 @@
+"""
+批次匯出吞吐量：PDFs/sec 對 worker 數
+
+    python benchmarks/bench_bulk_export.py --quotes 200 --items 15 --workers 1 2 4 8
+
+每個 worker 數各跑一次 ZIP 匯出 (含 process pool 啟動成本)，最後附上合併 PDF 的數字。
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from modules import bulk_export  # noqa: E402
+
+
+def sample_quotes(n_quotes, n_items):
+    return [{
+        "id": f"QUO-202610-{q + 1:03d}",
+        "date": "2026-10-01",
+        "client_name": f"示範客戶 {q % 30:02d}",
+        "items": [{"name": f"FX5U-32MR/ES #{i}", "price": 12000 + i, "qty": 1 + i % 5} for i in range(n_items)],
+    } for q in range(n_quotes)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--quotes", type=int, default=100)
+    parser.add_argument("--items", type=int, default=15)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    quotes = sample_quotes(args.quotes, args.items)
+    print(f"{args.quotes} 張報價單 x {args.items} 品項 (CPU: {os.cpu_count()})")
+    print(f"{'mode':<14}{'秒':>8}{'PDFs/sec':>10}{'MB':>8}")
+
+    for workers in args.workers:
+        started = time.perf_counter()
+        out = bulk_export.export_zip(quotes, workers=workers)
+        elapsed = time.perf_counter() - started
+        size = out.seek(0, os.SEEK_END)
+        print(f"{f'zip x{workers}':<14}{elapsed:>8.2f}{args.quotes / elapsed:>10.1f}{size / 1e6:>8.2f}")
+
+    started = time.perf_counter()
+    out = bulk_export.export_merged(quotes)
+    elapsed = time.perf_counter() - started
+    size = out.seek(0, os.SEEK_END)
+    print(f"{'merged':<14}{elapsed:>8.2f}{args.quotes / elapsed:>10.1f}{size / 1e6:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+頁面往返量測：用 Streamlit AppTest 驅動 main.py，後端換成有延遲的假 Supabase
+
+    python benchmarks/bench_pages.py                     # 量測並與 baseline 比較
+    python benchmarks/bench_pages.py --update-baseline   # 更新 baseline
+    python benchmarks/bench_pages.py --latency-ms 120 --items 20
+    python benchmarks/bench_pages.py --items 200 --products 5000   # 大型報價單目標情境
+
+每一步 (一次 rerun) 記錄：資料庫呼叫次數、wall time、傳輸位元組數、整頁重跑次數 (full_runs)。
+AppTest 的元件操作一律整頁重跑；fragment 內的操作 (計算機、明細編輯、載入更多) 另以
+「只跑該 fragment」的 *_fragment 步驟量測，對應實際瀏覽器中只重跑 fragment 的成本。
+與 benchmarks/baseline_pages.json 比較，任何一步退步 (或找不到 baseline) 即以 exit code 1 結束 (給 CI 用)：
+  - 呼叫次數比 baseline 多
+  - 位元組數超過 baseline 的 BYTES_TOLERANCE 倍
+  - 整頁重跑次數比 baseline 多
+wall time 隨機器而異，超過 baseline 的 WALL_TOLERANCE 倍再加 WALL_SLACK_MS 時只提出警告；
+在產生 baseline 的同一台機器上可加 --strict-wall 一併視為退步。
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# 匯入 database 前先指到暫存 SQLite，避免讀取正式 secrets；之後再換成假 Supabase
+os.environ.setdefault("DB_BACKEND", "sqlite")
+os.environ.setdefault("SQLITE_PATH", os.path.join(tempfile.mkdtemp(), "bench.db"))
+
+import streamlit as st  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+from modules import database, metrics  # noqa: E402
+from modules.storage_supabase import SupabaseBackend  # noqa: E402
+from fake_supabase import FakeSupabase, seed_demo_data  # noqa: E402
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline_pages.json")
+BYTES_TOLERANCE = 1.10
+WALL_TOLERANCE = 1.5
+WALL_SLACK_MS = 50
+
+PAGES = {
+    "dashboard": "🏠 首頁概覽",
+    "new_quote": "📝 新增報價單",
+    "history": "📊 歷史定價比較",
+    "db_admin": "🗃️ 資料庫管理",
+}
+
+
+def full_runs():
+    stats = metrics.process_metrics.stats.get("app.full_run")
+    return stats.calls if stats else 0
+
+
+class Recorder:
+    def __init__(self, fake):
+        self.fake = fake
+        self.results = {}
+
+    def step(self, name, action):
+        """執行一次會觸發 rerun 的動作並記錄差值"""
+        calls0, bytes0 = self.fake.snapshot()
+        runs0 = full_runs()
+        started = time.perf_counter()
+        at = action()
+        wall_ms = (time.perf_counter() - started) * 1000
+        calls1, bytes1 = self.fake.snapshot()
+        if at is not None and at.exception:
+            raise RuntimeError(f"{name}: {at.exception[0].message}")
+        self.results[name] = {"calls": calls1 - calls0, "wall_ms": round(wall_ms, 1), "bytes": bytes1 - bytes0,
+                              "full_runs": full_runs() - runs0}
+        return at
+
+
+def new_app(fake):
+    # 每個情境從冷快取開始
+    database.use_backend(SupabaseBackend(fake))
+    database.warmup.wait(5)
+    st.cache_data.clear()
+    at = AppTest.from_file(os.path.join(ROOT, "main.py"), default_timeout=120)
+    at.session_state["password_correct"] = True
+    return at
+
+
+def fragment_app(script, *args):
+    """只執行單一 fragment 的 AppTest (script 內自行 import)，量測 fragment 重跑的成本"""
+    at = AppTest.from_function(script, args=args, default_timeout=120)
+    at.session_state["password_correct"] = True
+    return at
+
+
+def calculator_fragment():
+    from modules import calculator
+    calculator.render_simple_calculator()
+
+
+def line_item_fragment(n_items):
+    from modules import database, line_items, ui_components
+    import streamlit as st
+    index = database.get_product_index()
+    if "quote_items" not in st.session_state:
+        st.session_state.quote_items = line_items.append(
+            line_items.empty(), [{"product": name, "price": 1000, "qty": 2} for name in index.names[:n_items]])
+        st.session_state.quote_items_ver = 0
+    ui_components.render_line_item_editor(index, None, "")
+
+
+def goto(at, page):
+    return at.sidebar.radio[0].set_value(PAGES[page]).run()
+
+
+def button(at, label):
+    return next(b for b in at.button if b.label == label)
+
+
+def run_dashboard(rec, fake):
+    at = new_app(fake)
+    rec.step("dashboard/first_load", at.run)
+    rec.step("dashboard/rerun", at.run)
+
+
+def run_new_quote(rec, fake, n_items):
+    at = new_app(fake)
+    at.run()
+    rec.step("new_quote/open", lambda: goto(at, "new_quote"))
+    names = [p['name'] for p in fake.tables["products"][:n_items]]
+    at.text_area(key="paste_items").input("\n".join(f"{name}\t2\t1000" for name in names))
+    rec.step(f"new_quote/paste_{n_items}_items", lambda: button(at, "📥 加入貼上的品項").click().run())
+    at.text_input(key="product_query").input(names[0])
+    rec.step("new_quote/search_product", at.run)
+    rec.step("new_quote/add_item", lambda: button(at, "➕ 新增品項").click().run())
+    at.number_input(key="bulk_qty").set_value(3)
+    rec.step("new_quote/bulk_qty", lambda: button(at, "🔢 全部數量改為此值").click().run())
+    rec.step("new_quote/calculator_key", lambda: at.button(key="s_btn_7").click().run())
+
+    frag = fragment_app(line_item_fragment, n_items)
+    frag.run()
+    frag.text_input(key="product_query").input(names[0])
+    rec.step("new_quote/search_product_fragment", frag.run)
+    rec.step("new_quote/add_item_fragment", lambda: button(frag, "➕ 新增品項").click().run())
+    frag = fragment_app(calculator_fragment)
+    frag.run()
+    rec.step("new_quote/calculator_key_fragment", lambda: frag.button(key="s_btn_7").click().run())
+
+
+def run_history(rec, fake):
+    at = new_app(fake)
+    at.run()
+    rec.step("history/open", lambda: goto(at, "history"))
+    at.text_input(key="search_kw").input("FX5U")
+    # 第一次搜尋直接查資料庫並在背景開始同步歷史快照；等同步完成，讓它的呼叫都算在這一步 (數字才穩定)
+    rec.step("history/search", lambda: (button(at, "🔍 搜尋").click().run(), database.wait_history(60))[0])
+    rec.step("history/load_more", lambda: at.button(key="btn_page_more").click().run())
+
+
+def run_db_admin(rec, fake):
+    at = new_app(fake)
+    at.run()
+    rec.step("db_admin/open", lambda: goto(at, "db_admin"))
+    rec.step("db_admin/rerun", at.run)
+
+
+def compare(results, baseline):
+    """回傳 (退步, wall time 警告)"""
+    failures, slow = [], []
+    for name, cur in results.items():
+        base = baseline.get(name)
+        if not base: continue
+        if cur["calls"] > base["calls"]:
+            failures.append(f"{name}: 呼叫次數 {base['calls']} -> {cur['calls']}")
+        if cur["bytes"] > base["bytes"] * BYTES_TOLERANCE:
+            failures.append(f"{name}: 位元組 {base['bytes']:,} -> {cur['bytes']:,}")
+        if cur.get("full_runs", 0) > base.get("full_runs", cur.get("full_runs", 0)):
+            failures.append(f"{name}: 整頁重跑 {base['full_runs']} -> {cur['full_runs']}")
+        if cur["wall_ms"] > base["wall_ms"] * WALL_TOLERANCE + WALL_SLACK_MS:
+            slow.append(f"{name}: wall {base['wall_ms']:.0f} ms -> {cur['wall_ms']:.0f} ms")
+    return failures, slow
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency-ms", type=float, default=50, help="每次資料庫呼叫的模擬延遲")
+    parser.add_argument("--items", type=int, default=10, help="新增報價單情境的品項數")
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--quotes", type=int, default=200)
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--strict-wall", action="store_true", help="wall time 超出容許範圍也視為退步")
+    args = parser.parse_args()
+
+    fake = seed_demo_data(FakeSupabase(latency_ms=args.latency_ms), n_products=args.products, n_quotes=args.quotes)
+    rec = Recorder(fake)
+    run_dashboard(rec, fake)
+    run_new_quote(rec, fake, args.items)
+    run_history(rec, fake)
+    run_db_admin(rec, fake)
+
+    print(f"{'step':<40}{'calls':>7}{'wall ms':>10}{'bytes':>12}{'full runs':>11}")
+    for name, r in rec.results.items():
+        print(f"{name:<40}{r['calls']:>7}{r['wall_ms']:>10.0f}{r['bytes']:>12,}{r['full_runs']:>11}")
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"latency_ms": args.latency_ms, "steps": rec.results}, f, ensure_ascii=False, indent=2)
+        print(f"\n已更新 baseline: {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"\n❌ 找不到 baseline: {args.baseline} (請先執行 --update-baseline 並提交)")
+        sys.exit(1)
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("latency_ms") != args.latency_ms:
+        print(f"\n⚠️ baseline 以 latency {baseline.get('latency_ms')} ms 量測，wall time 比較可能失準")
+
+    failures, slow = compare(rec.results, baseline["steps"])
+    missing = [name for name in rec.results if name not in baseline["steps"]]
+    if missing:
+        print(f"\n⚠️ baseline 沒有這些步驟 (未比較)：{', '.join(missing)}")
+    if args.strict_wall:
+        failures += slow
+    elif slow:
+        print("\n⚠️ wall time 超出容許範圍 (不影響結果，同機器比較請加 --strict-wall)：")
+        for f in slow: print(f"  - {f}")
+    if failures:
+        print("\n❌ 效能退步：")
+        for f in failures: print(f"  - {f}")
+        sys.exit(1)
+    print("\n✅ 未超出 baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""
+PDF 產生效能量測與退步檢查
+
+    python benchmarks/bench_pdf.py                       # 量測並與 baseline 比較
+    python benchmarks/bench_pdf.py --update-baseline     # 更新 baseline
+    python benchmarks/bench_pdf.py --items 10 100 --repeat 3
+    python benchmarks/bench_pdf.py --font-dir /path/to/fonts --items 10 100   # 指定字型目錄 (只量測，不比較)
+
+品項數 x 大小章 (有 / 無) 的每個組合各在全新的 process 裡量測：
+cold   : 該 process 的第一份 PDF (含 TTF 解析、圖片解碼、字寬快取暖機)
+warm   : 之後 repeat 份的中位數
+reparse: 每份 PDF 都重新解析字型 (舊版行為，作為對照) 的中位數
+cold / warm 各記錄 wall 與 CPU 時間 (process_time)；另記錄 pages/sec、輸出位元組數、
+其中內嵌字型子集的位元組數 (font KB)、tracemalloc 峰值 (Python 配置的記憶體)。
+使用 Helvetica 替代字型時沒有內嵌字型，reparse 也與 warm 相同；字型快取的效果只有在真正的 TTF 下才看得到。
+字型與圖片直接使用 fonts/ 與 assets/，與正式環境相同。
+
+與 benchmarks/baseline_pdf.json 比較，任何組合退步 (或找不到 baseline) 即以 exit code 1 結束 (給 CI 用)：
+  - cold / warm CPU 時間超過 baseline 的 CPU_TOLERANCE 倍再加 CPU_SLACK_MS
+  - 峰值記憶體超過 baseline 的 MEMORY_TOLERANCE 倍
+  - 位元組數超過 baseline 的 BYTES_TOLERANCE 倍
+wall time 隨機器負載而異，超過 baseline 的 WALL_TOLERANCE 倍再加 WALL_SLACK_MS 時只提出警告；
+在產生 baseline 的同一台機器上可加 --strict-wall 一併視為退步 (與 bench_pages 相同)。
+本次與 baseline 的字型環境不同 (一邊是 Helvetica 替代字型) 時數字無法比較，直接以 exit code 1 結束。
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from reportlab.pdfbase import pdfmetrics  # noqa: E402
+from modules import pdf_gen  # noqa: E402
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline_pdf.json")
+CPU_TOLERANCE = 1.5
+CPU_SLACK_MS = 20
+WALL_TOLERANCE = 1.5
+WALL_SLACK_MS = 20
+MEMORY_TOLERANCE = 1.5
+BYTES_TOLERANCE = 1.10
+
+# 型號 / 規格長短混合，讓換行與分頁都有被量到
+SAMPLE_ITEMS = [
+    ("FX5U-32MR/ES", ""),
+    ("FX5U-32MR/ES", "可程式控制器"),
+    ("Q03UDVCPU", "高速通用型 CPU 模組 (含 SD 記憶卡插槽、乙太網路埠)"),
+    ("GT2510-VTBA", "10.4吋人機介面 TFT 彩色 65536色 DC24V 乙太網路 / RS-232 / RS-422/485 / USB"),
+    ("NF125-SV 3P 100A", "無熔絲開關"),
+]
+
+
+def sample_quote(n_items):
+    return {
+        "id": "QUO-202610-001",
+        "date": "2026-10-01",
+        "client_name": "示範客戶股份有限公司",
+        "items": [{"name": f"{SAMPLE_ITEMS[i % len(SAMPLE_ITEMS)][0]} #{i}", "spec": SAMPLE_ITEMS[i % len(SAMPLE_ITEMS)][1],
+                   "price": 12000 + i, "qty": 1 + i % 5}
+                  for i in range(n_items)],
+    }
+
+
+def count_pages(pdf_bytes):
+    # 頁面物件是 /Type /Page，頁面樹是 /Type /Pages
+    return len(re.findall(rb"/Type /Page[^s]", pdf_bytes))
+
+
+def render_once(data, show_stamp):
+    """回傳 (wall 秒, CPU 秒, PDF bytes)"""
+    wall, cpu = time.perf_counter(), time.process_time()
+    content = pdf_gen.create_quotation_pdf(data, show_stamp=show_stamp).getvalue()
+    return time.perf_counter() - wall, time.process_time() - cpu, content
+
+
+def font_bytes(pdf_bytes):
+    """內嵌的 TrueType 子集 (FontFile2 串流，壓縮後) 位元組數"""
+    total = 0
+    for ref in re.findall(rb"/FontFile2 (\d+) 0 R", pdf_bytes):
+        m = re.search(rb"\n" + ref + rb" 0 obj\n<<[^>]*?/Length (\d+)", pdf_bytes)
+        if m: total += int(m.group(1))
+    return total
+
+
+def reset_fonts():
+    """丟掉已解析的字型，下一次 register_fonts 會重新讀 TTF"""
+    pdf_gen._fonts = None
+    for name in pdf_gen.FONT_FILES:
+        pdfmetrics._fonts.pop(name, None)
+
+
+def median(samples):
+    return sorted(samples)[len(samples) // 2]
+
+
+def run_case(n_items, show_stamp, repeat):
+    """在目前 process 量測一個組合 (須為全新 process 才算 cold)"""
+    data = sample_quote(n_items)
+    cold, cold_cpu, content = render_once(data, show_stamp)
+    samples = [render_once(data, show_stamp) for _ in range(repeat)]
+    warm, warm_cpu = median([s[0] for s in samples]), median([s[1] for s in samples])
+
+    tracemalloc.start()
+    render_once(data, show_stamp)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    pages = count_pages(content)
+    fonts = pdf_gen.register_fonts()
+    reparse = []
+    for _ in range(repeat):
+        reset_fonts()
+        reparse.append(render_once(data, show_stamp)[0])
+    return {
+        "cold_ms": cold * 1000,
+        "cold_cpu_ms": cold_cpu * 1000,
+        "warm_ms": warm * 1000,
+        "warm_cpu_ms": warm_cpu * 1000,
+        "reparse_ms": median(reparse) * 1000,
+        "pages": pages,
+        "pages_per_sec": pages / warm if warm else 0,
+        "peak_mb": peak / 1e6,
+        "bytes": len(content),
+        "font_bytes": font_bytes(content),
+        "fallback_fonts": any(fonts[name] != name for name in fonts),
+    }
+
+
+def measure(n_items, show_stamp, repeat, font_dir=None):
+    out = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--single", "--items", str(n_items),
+         "--stamp", str(int(show_stamp)), "--repeat", str(repeat)] + (["--font-dir", font_dir] if font_dir else []),
+        capture_output=True, text=True, check=True, cwd=ROOT
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def case_name(n_items, show_stamp):
+    return f"{n_items}_items_{'stamp' if show_stamp else 'nostamp'}"
+
+
+def compare(results, baseline):
+    """回傳 (退步, wall time 警告)"""
+    failures, slow = [], []
+    for name, cur in results.items():
+        base = baseline.get(name)
+        if not base: continue
+        for key in ("cold_cpu_ms", "warm_cpu_ms"):
+            if cur[key] > base[key] * CPU_TOLERANCE + CPU_SLACK_MS:
+                failures.append(f"{name}: {key} {base[key]:.0f} -> {cur[key]:.0f}")
+        for key in ("cold_ms", "warm_ms"):
+            if cur[key] > base[key] * WALL_TOLERANCE + WALL_SLACK_MS:
+                slow.append(f"{name}: {key} {base[key]:.0f} -> {cur[key]:.0f}")
+        if cur["peak_mb"] > base["peak_mb"] * MEMORY_TOLERANCE:
+            failures.append(f"{name}: 峰值 {base['peak_mb']:.1f} MB -> {cur['peak_mb']:.1f} MB")
+        if cur["bytes"] > base["bytes"] * BYTES_TOLERANCE:
+            failures.append(f"{name}: 位元組 {base['bytes']:,} -> {cur['bytes']:,}")
+    return failures, slow
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, nargs="+", default=[10, 100, 1000, 5000])
+    parser.add_argument("--repeat", type=int, default=5, help="warm 量測次數 (取中位數)")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--strict-wall", action="store_true", help="wall time 超出容許範圍也視為退步")
+    parser.add_argument("--font-dir", help="改用此目錄的字型檔 (預設 fonts/)；指定時只量測，不與 baseline 比較")
+    parser.add_argument("--single", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--stamp", type=int, default=1, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.font_dir:
+        pdf_gen.FONT_DIR = os.path.abspath(args.font_dir)
+    if args.single:
+        print(json.dumps(run_case(args.items[0], bool(args.stamp), args.repeat)))
+        return
+
+    results = {}
+    print(f"{'case':<22}{'cold ms':>9}{'cold CPU':>10}{'warm ms':>9}{'warm CPU':>10}{'reparse':>9}"
+          f"{'pages':>7}{'pages/s':>9}{'peak MB':>9}{'bytes':>12}{'font KB':>9}")
+    for n_items in args.items:
+        for show_stamp in (True, False):
+            name = case_name(n_items, show_stamp)
+            r = results[name] = measure(n_items, show_stamp, args.repeat, args.font_dir)
+            print(f"{name:<22}{r['cold_ms']:>9.0f}{r['cold_cpu_ms']:>10.0f}{r['warm_ms']:>9.0f}"
+                  f"{r['warm_cpu_ms']:>10.0f}{r['reparse_ms']:>9.0f}{r['pages']:>7}"
+                  f"{r['pages_per_sec']:>9.1f}{r['peak_mb']:>9.1f}{r['bytes']:>12,}{r['font_bytes'] / 1000:>9.1f}")
+
+    if any(r["fallback_fonts"] for r in results.values()):
+        print("\n⚠️ 找不到 fonts/ 內的字型，改用 Helvetica 量測，數字與正式環境不符")
+    if args.font_dir:
+        print(f"\nℹ️ 使用 {args.font_dir} 的字型，不與 baseline 比較")
+        return
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"template": pdf_gen.TEMPLATE_VERSION, "cases": results}, f, ensure_ascii=False, indent=2)
+        print(f"\n已更新 baseline: {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"\n❌ 找不到 baseline: {args.baseline} (請先執行 --update-baseline 並提交)")
+        sys.exit(1)
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("template") != pdf_gen.TEMPLATE_VERSION:
+        print(f"\nℹ️ baseline 版型 {baseline.get('template')}，目前 {pdf_gen.TEMPLATE_VERSION}")
+
+    mismatched = [name for name, r in results.items()
+                  if name in baseline["cases"] and r["fallback_fonts"] != baseline["cases"][name]["fallback_fonts"]]
+    if mismatched:
+        print(f"\n❌ 字型環境與 baseline 不同 (一邊使用 Helvetica 替代)，無法比較：{', '.join(mismatched)}")
+        print("   請在與 baseline 相同的字型環境執行，或以 --update-baseline 重新產生並提交")
+        sys.exit(1)
+
+    failures, slow = compare(results, baseline["cases"])
+    if args.strict_wall:
+        failures += slow
+    elif slow:
+        print("\n⚠️ wall time 超出容許範圍 (不影響結果，同機器比較請加 --strict-wall)：")
+        for f in slow: print(f"  - {f}")
+    if failures:
+        print("\n❌ 效能退步：")
+        for f in failures: print(f"  - {f}")
+        sys.exit(1)
+    print("\n✅ 未超出 baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+大型報價單 PDF 的記憶體峰值：BytesIO vs 直接寫入磁碟快取
+
+    python benchmarks/bench_pdf_memory.py --items 100 1000 10000
+
+每個組合在全新的 process 裡跑一次，以 ru_maxrss 取 process 峰值 RSS
+(已扣除載入字型與圖片後的基準值)。
+bytesio: create_quotation_pdf() 後 getvalue() 再寫檔 (舊版快取流程)
+file   : write_quotation_pdf() 直接寫進磁碟檔案 (pdf_cache.get_or_create)
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from modules import pdf_gen  # noqa: E402
+from bench_pdf import sample_quote  # noqa: E402
+
+MODES = ("bytesio", "file")
+
+
+def peak_rss_mb():
+    # Linux 的 ru_maxrss 單位是 KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_single(mode, n_items):
+    """回傳 (秒, 峰值增量 MB, 位元組數)"""
+    pdf_gen.register_fonts()
+    pdf_gen.load_assets()
+    data = sample_quote(n_items)
+    baseline = peak_rss_mb()
+
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    os.close(fd)
+    try:
+        started = time.perf_counter()
+        if mode == "bytesio":
+            content = pdf_gen.create_quotation_pdf(data).getvalue()
+            with open(path, "wb") as f:
+                f.write(content)
+        else:
+            with open(path, "wb") as f:
+                pdf_gen.write_quotation_pdf(data, f)
+        elapsed = time.perf_counter() - started
+        return elapsed, peak_rss_mb() - baseline, os.path.getsize(path)
+    finally:
+        os.remove(path)
+
+
+def measure(mode, n_items):
+    out = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--single", mode, "--items", str(n_items)],
+        capture_output=True, text=True, check=True, cwd=ROOT
+    )
+    elapsed, peak, size = out.stdout.strip().splitlines()[-1].split()
+    return float(elapsed), float(peak), int(size)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--single", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(*run_single(args.single, args.items[0]))
+        return
+
+    print(f"{'items':>8}{'mode':>10}{'秒':>8}{'峰值 +MB':>10}{'PDF MB':>9}")
+    for n_items in args.items:
+        for mode in MODES:
+            elapsed, peak, size = measure(mode, n_items)
+            print(f"{n_items:>8}{mode:>10}{elapsed:>8.2f}{peak:>10.1f}{size / 1e6:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+定價規則引擎：整份目錄價目表與整張報價單的重算時間
+
+    python benchmarks/bench_pricing.py --products 5000 --items 200
+
+對照組「逐列」為舊做法：每個產品各自把算式字串 eval 一次 (計算機的做法)。
+規則第一次使用時編譯 (cold)，之後從快取取出 (warm)。
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from modules import line_items, pricing  # noqa: E402
+from modules.product_index import ProductIndex  # noqa: E402
+from fake_supabase import FakeSupabase, seed_demo_data  # noqa: E402
+
+RULES = [
+    "dealer_price * 0.65",
+    "round(dealer_price * discount * client_discount, -1)",
+    "max(經銷價 * 折扣, 100)",
+]
+SERIES_TABLE = "FX5U = 0.7\nFX3U = 0.75\nQ03 = 80%\nQ = 0.85\nR = 0.9\nGT = 0.8\nMR = 0.78\nHG = 0.72"
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return min(samples) * 1000
+
+
+def per_row_eval(index, rule):
+    # 舊做法：逐列把經銷價代進字串再 eval
+    return [eval(rule.replace("dealer_price", str(index.dealer_prices[name]))) for name in index.names]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    random.seed(0)
+
+    fake = seed_demo_data(FakeSupabase(), n_products=args.products, n_quotes=0)
+    index = ProductIndex(fake.tables["products"])
+    series = pricing.parse_table(SERIES_TABLE)
+    names = random.sample(index.names, min(args.items, len(index)))
+    items = line_items.append(line_items.empty(), [{"product": n, "price": 0, "qty": 2} for n in names])
+
+    pricing.price_list(index, "dealer_price * discount", series)    # 暖機 (pandas 字串運算第一次呼叫較慢)
+    print(f"{'規則':<56}{'cold ms':>9}{'價目表 ms':>11}{'明細 ms':>9}")
+    for rule in RULES:
+        pricing.compile_rule.cache_clear()
+        started = time.perf_counter()
+        pricing.price_list(index, rule, series, 0.95)
+        cold = (time.perf_counter() - started) * 1000
+        catalog = timed(lambda: pricing.price_list(index, rule, series, 0.95), args.repeat)
+        quote = timed(lambda: line_items.apply_rule(items, index, rule, series, 0.95), args.repeat)
+        print(f"{rule:<56}{cold:>9.1f}{catalog:>11.1f}{quote:>9.1f}")
+
+    baseline = timed(lambda: per_row_eval(index, RULES[0]), 1)
+    print(f"\n逐列 eval ({RULES[0]}, {len(index)} 個產品): {baseline:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+產品搜尋索引延遲：建索引時間與每次查詢的 p50 / p99
+
+    python benchmarks/bench_product_search.py --products 5000 --queries 2000
+
+查詢混合：型號開頭、型號中段、規格、打錯字 (模糊比對)。
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from modules.product_index import ProductIndex  # noqa: E402
+from fake_supabase import FakeSupabase, seed_demo_data  # noqa: E402
+
+
+def typo(text):
+    i = random.randrange(len(text))
+    return text[:i] + random.choice("abcdefxyz0123456789") + text[i + 1:]
+
+
+def sample_queries(names, specs, n):
+    makers = [
+        lambda name: name[:random.randint(2, 8)],
+        lambda name: name[random.randint(1, 5):random.randint(7, 14)],
+        lambda name: specs[name],
+        lambda name: typo(name[:10]),
+    ]
+    return [random.choice(makers)(random.choice(names)) for _ in range(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--k", type=int, default=20)
+    args = parser.parse_args()
+    random.seed(0)
+
+    fake = seed_demo_data(FakeSupabase(), n_products=args.products, n_quotes=0)
+    started = time.perf_counter()
+    index = ProductIndex(fake.tables["products"])
+    print(f"建索引: {len(index)} 個產品 {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    samples = []
+    for query in sample_queries(index.names, index.specs, args.queries):
+        started = time.perf_counter()
+        index.search(query, args.k)
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    p50, p99 = samples[len(samples) // 2], samples[int(len(samples) * 0.99)]
+    print(f"查詢 {len(samples)} 次  p50 {p50 * 1000:.3f} ms   p99 {p99 * 1000:.3f} ms   max {samples[-1] * 1000:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
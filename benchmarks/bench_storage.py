@@ -0,0 +1,92 @@
+"""
+儲存後端查詢效能量測 (內嵌 SQLite)
+
+    python benchmarks/bench_storage.py --quotes 20000 --items-per-quote 8
+
+建立暫存資料庫、灌入假資料，量測各項操作的延遲：
+目錄讀取、存檔、儀表板統計、歷史搜尋第 1 頁 / 第 50 頁。
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.storage_sqlite import SQLiteBackend  # noqa: E402
+
+MODELS = ["FX5U-32MR/ES", "FX3U-48MR", "NF32-SV 3P 20A", "NV63-CV 3P 30A", "S-T21 AC220V", "FR-E820-0.75K", "GOT2000-GT2710", "QJ71C24N"]
+
+
+def seed(backend, n_quotes, items_per_quote, n_products):
+    products = [{"name": f"{random.choice(MODELS)}-{i:05d}", "spec": "", "dealer_price": random.randint(500, 50000)} for i in range(n_products)]
+    backend.upsert_products(products)
+    for i in range(50):
+        backend.insert_client({"name": f"客戶{i:02d}", "tax_id": "", "contact_person": "", "phone": "", "address": ""})
+    client_ids = [c['id'] for c in backend.list_clients()]
+
+    for q in range(n_quotes):
+        items = []
+        for _ in range(items_per_quote):
+            p = random.choice(products)
+            items.append({"product_name": p['name'], "quantity": random.randint(1, 20),
+                          "unit_price": round(p['dealer_price'] * random.uniform(0.5, 0.9)), "dealer_price_snapshot": p['dealer_price']})
+        backend.save_quotation(random.choice(client_ids), f"2026-{q % 12 + 1:02d}-01", f"2026{q % 12 + 1:02d}", items)
+
+
+def timed(label, fn, repeat=20):
+    samples = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - t) * 1000)
+    samples.sort()
+    print(f"{label:<28} p50 {samples[len(samples) // 2]:8.2f} ms   max {samples[-1]:8.2f} ms")
+    return result
+
+
+def page_cursor(backend, keyword, pages, limit=10):
+    cursor = None
+    for _ in range(pages - 1):
+        rows = backend.search_history(keyword, cursor, limit)
+        if not rows: break
+        cursor = rows[-1]['id']
+    return cursor
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--quotes", type=int, default=5000)
+    parser.add_argument("--items-per-quote", type=int, default=8)
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--db", help="SQLite 檔案 (預設為暫存檔)")
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(), "bench.db")
+    backend = SQLiteBackend(path)
+
+    t = time.perf_counter()
+    seed(backend, args.quotes, args.items_per_quote, args.products)
+    total_items = args.quotes * args.items_per_quote
+    print(f"灌入 {args.quotes:,} 張報價單 / {total_items:,} 筆明細：{time.perf_counter() - t:.1f} 秒 ({path})")
+
+    timed("list_products", backend.list_products)
+    timed("list_clients", backend.list_clients)
+    timed("dashboard_stats", lambda: backend.dashboard_stats(86400))
+    timed("reconcile_stats", backend.reconcile_stats, repeat=3)
+    timed("save_quotation (8 items)", lambda: backend.save_quotation(1, "2026-10-01", "202610", [
+        {"product_name": "FX5U-32MR/ES-00001", "quantity": 1, "unit_price": 1000, "dealer_price_snapshot": 1500}] * 8))
+
+    for keyword in ["FX5U", "NF"]:
+        timed(f"search '{keyword}' page 1", lambda: backend.search_history(keyword, None, 11))
+        cursor = page_cursor(backend, keyword, 50)
+        timed(f"search '{keyword}' page 50", lambda: backend.search_history(keyword, cursor, 11))
+
+    q, amount = backend.dashboard_stats(86400)
+    assert (q, round(amount)) == tuple(map(round, backend.reconcile_stats())), "rollup 與全表彙總不一致"
+
+
+if __name__ == "__main__":
+    main()
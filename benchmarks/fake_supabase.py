@@ -0,0 +1,317 @@
+"""
+記憶體內的假 Supabase client，給效能量測用
+
+只實作 SupabaseBackend 用到的 PostgREST 子集 (select / 內嵌關聯 / 篩選 / 排序 /
+insert / upsert) 以及 sql/ 底下的 RPC。每次 execute() 會：
+  - 依 latency_ms 睡一下，模擬網路往返
+  - 記錄呼叫次數與傳輸位元組數 (請求 + 回應的 JSON 大小)
+  - 每次回應最多 max_rows 筆 (同 PostgREST 的 max-rows，Supabase 預設 1000)，多的默默截掉
+
+    fake = FakeSupabase(latency_ms=80)
+    database.use_backend(SupabaseBackend(fake))
+"""
+import json
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+# 內嵌關聯: 關聯名稱 -> 本表上的外鍵欄位
+FOREIGN_KEYS = {"quotations": "quotation_id", "clients": "client_id"}
+UNIQUE_KEYS = {"products": "name", "quotations": "quote_no"}
+
+
+class FakeResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class FakeSupabase:
+    def __init__(self, latency_ms=0, max_rows=1000):
+        self.latency_ms = latency_ms
+        self.max_rows = max_rows
+        self.tables = {"clients": [], "products": [], "quotations": [], "quotation_items": []}
+        self.sequences = {}
+        self.stats = {"total_quotes": 0, "total_amount": 0.0, "reconciled_at": 0.0}
+        self.calls = Counter()
+        self.bytes = 0
+        self._ids = Counter()
+        self._lock = threading.Lock()
+
+    # --- 計數 ---
+    def snapshot(self):
+        return sum(self.calls.values()), self.bytes
+
+    def _record(self, label, request, response):
+        with self._lock:
+            self.calls[label] += 1
+            self.bytes += len(json.dumps(request, default=str)) + len(json.dumps(response, default=str))
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+    def _insert_row(self, table, row):
+        self._ids[table] += 1
+        row = dict(row, id=self._ids[table])
+        self.tables[table].append(row)
+        return row
+
+    # --- 公開介面 ---
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def rpc(self, name, params=None):
+        return FakeRpc(self, name, params or {})
+
+    def seed(self, table, rows):
+        """直接灌資料，不計入呼叫次數"""
+        with self._lock:
+            return [self._insert_row(table, r) for r in rows]
+
+
+class FakeRpc:
+    def __init__(self, fake, name, params):
+        self.fake, self.name, self.params = fake, name, params
+
+    def execute(self):
+        fake = self.fake
+        with fake._lock:
+            data = getattr(self, f"_{self.name}")(**self.params)
+            if isinstance(data, list) and fake.max_rows is not None:
+                data = data[:fake.max_rows]
+        fake._record(f"rpc:{self.name}", self.params, data)
+        return FakeResponse(data)
+
+    def _next_quote_no(self, p_period):
+        seq = self.fake.sequences.get(p_period, 0) + 1
+        self.fake.sequences[p_period] = seq
+        return f"QUO-{p_period}-{seq:03d}"
+
+    def _save_quotation(self, p_client_id, p_quote_date, p_period, p_items):
+        quote_no = self._next_quote_no(p_period)
+        header = self.fake._insert_row("quotations", {"quote_no": quote_no, "client_id": p_client_id, "quote_date": p_quote_date})
+        for item in p_items:
+            self.fake._insert_row("quotation_items", dict(item, quotation_id=header['id']))
+        self._bump_dashboard_stats(1, sum(float(i['unit_price']) * int(i['quantity']) for i in p_items))
+        return quote_no
+
+    def _history_for_products(self, p_client_id, p_products, p_limit=5):
+        tables = self.fake.tables
+        quotes = {q['id']: q for q in tables["quotations"]}
+        clients = {c['id']: c['name'] for c in tables["clients"]}
+        wanted = set(p_products)
+        client_rows, global_rows = {}, {}
+        for item in sorted(tables["quotation_items"], key=lambda i: i['id'], reverse=True):
+            name = item['product_name']
+            if name not in wanted: continue
+            q = quotes.get(item['quotation_id']) or {}
+            row = {"id": item['id'], "product_name": name, "quantity": item['quantity'],
+                   "unit_price": item['unit_price'], "dealer_price_snapshot": item.get('dealer_price_snapshot', 0),
+                   "quote_date": q.get('quote_date'), "quote_no": q.get('quote_no'),
+                   "client_name": clients.get(q.get('client_id'))}
+            if q.get('client_id') == p_client_id and len(client_rows.setdefault(name, [])) < p_limit:
+                client_rows[name].append(dict(row, scope="client"))
+            if len(global_rows.setdefault(name, [])) < p_limit:
+                global_rows[name].append(dict(row, scope="global"))
+        return [r for rows in client_rows.values() for r in rows] + [r for rows in global_rows.values() for r in rows]
+
+    def _bump_dashboard_stats(self, p_quotes, p_amount):
+        self.fake.stats["total_quotes"] += p_quotes
+        self.fake.stats["total_amount"] += p_amount
+
+    def _reconcile_dashboard_stats(self):
+        stats = self.fake.stats
+        stats["total_quotes"] = len(self.fake.tables["quotations"])
+        stats["total_amount"] = sum(float(i['unit_price']) * int(i['quantity']) for i in self.fake.tables["quotation_items"])
+        stats["reconciled_at"] = time.time()
+        return [{"total_quotes": stats["total_quotes"], "total_amount": stats["total_amount"]}]
+
+    def _get_dashboard_stats(self, p_max_age_seconds=86400):
+        stats = self.fake.stats
+        if stats["reconciled_at"] < time.time() - p_max_age_seconds:
+            return self._reconcile_dashboard_stats()
+        return [{"total_quotes": stats["total_quotes"], "total_amount": stats["total_amount"]}]
+
+
+def _split_top_level(text):
+    parts, depth, buf = [], 0, ""
+    for ch in text:
+        if ch == "," and depth == 0:
+            parts.append(buf.strip())
+            buf = ""
+            continue
+        depth += ch == "("
+        depth -= ch == ")"
+        buf += ch
+    if buf.strip(): parts.append(buf.strip())
+    return parts
+
+
+def _resolve(row, path):
+    for key in path.split("."):
+        if not isinstance(row, dict): return None
+        row = row.get(key)
+    return row
+
+
+def _sort_key(value):
+    return (value is None, 0 if value is None else value)
+
+
+def _ilike(pattern):
+    # 同 PostgREST + Postgres：* 視同 %，反斜線跳脫下一個字元
+    parts, chars = [], iter(pattern)
+    for ch in chars:
+        if ch == "\\": parts.append(re.escape(next(chars, "\\")))
+        elif ch in "%*": parts.append(".*")
+        elif ch == "_": parts.append(".")
+        else: parts.append(re.escape(ch))
+    return re.compile("".join(parts), re.IGNORECASE | re.DOTALL)
+
+
+class FakeQuery:
+    def __init__(self, fake, table):
+        self.fake, self.table_name = fake, table
+        self.op, self.columns, self.count_mode = "select", "*", None
+        self.payload, self.on_conflict = None, None
+        self.filters, self.orders = [], []
+        self.limit_n, self.offset = None, 0
+
+    # --- 操作 ---
+    def select(self, columns="*", count=None):
+        self.columns, self.count_mode = columns, count
+        return self
+
+    def insert(self, data):
+        self.op, self.payload = "insert", data
+        return self
+
+    def upsert(self, data, on_conflict=None):
+        self.op, self.payload, self.on_conflict = "upsert", data, on_conflict
+        return self
+
+    # --- 篩選 / 排序 / 分頁 ---
+    def _filter(self, column, test):
+        self.filters.append((column, test))
+        return self
+
+    def eq(self, column, value): return self._filter(column, lambda v: v == value)
+    def neq(self, column, value): return self._filter(column, lambda v: v != value)
+    def lt(self, column, value): return self._filter(column, lambda v: v is not None and v < value)
+    def lte(self, column, value): return self._filter(column, lambda v: v is not None and v <= value)
+    def gt(self, column, value): return self._filter(column, lambda v: v is not None and v > value)
+    def gte(self, column, value): return self._filter(column, lambda v: v is not None and v >= value)
+    def in_(self, column, values):
+        values = set(values)
+        return self._filter(column, lambda v: v in values)
+
+    def ilike(self, column, pattern):
+        regex = _ilike(pattern)
+        return self._filter(column, lambda v: v is not None and regex.fullmatch(str(v)) is not None)
+
+    def order(self, column, desc=False):
+        self.orders.append((column, desc))
+        return self
+
+    def limit(self, n):
+        self.limit_n = n
+        return self
+
+    def range(self, start, end):
+        self.offset, self.limit_n = start, end - start + 1
+        return self
+
+    # --- 執行 ---
+    def execute(self):
+        fake = self.fake
+        with fake._lock:
+            if self.op == "select":
+                data, count = self._run_select()
+            else:
+                data, count = self._run_write(), None
+        fake._record(f"{self.op}:{self.table_name}", self.payload, data)
+        return FakeResponse(data, count)
+
+    def _run_write(self):
+        rows = self.payload if isinstance(self.payload, list) else [self.payload]
+        table = self.fake.tables[self.table_name]
+        written = []
+        for row in rows:
+            key = self.on_conflict
+            existing = next((r for r in table if key and r.get(key) == row.get(key)), None) if self.op == "upsert" else None
+            if existing is not None:
+                existing.update(row)
+                written.append(dict(existing))
+                continue
+            unique = UNIQUE_KEYS.get(self.table_name)
+            if unique and any(r.get(unique) == row.get(unique) for r in table):
+                raise ValueError(f"duplicate key value violates unique constraint ({self.table_name}.{unique})")
+            written.append(dict(self.fake._insert_row(self.table_name, row)))
+        return written
+
+    def _embed(self, row, columns):
+        out = {}
+        inner_ok = True
+        for part in _split_top_level(columns):
+            if "(" not in part:
+                if part == "*":
+                    out.update(row)
+                else:
+                    out[part] = row.get(part)
+                continue
+            relation, inner = part.split("(", 1)
+            inner = inner.rsplit(")", 1)[0]
+            relation, _, hint = relation.partition("!")
+            target = self.fake.tables[relation]
+            fk = row.get(FOREIGN_KEYS[relation])
+            child = next((r for r in target if r['id'] == fk), None)
+            if child is None:
+                out[relation] = None
+                if hint == "inner": inner_ok = False
+            else:
+                embedded, ok = self._embed(child, inner)
+                out[relation] = embedded
+                if hint == "inner" and not ok: inner_ok = False
+        return out, inner_ok
+
+    def _run_select(self):
+        rows = []
+        for row in self.fake.tables[self.table_name]:
+            shaped, ok = self._embed(row, self.columns)
+            if not ok: continue
+            probe = dict(row, **{k: v for k, v in shaped.items() if isinstance(v, dict)})
+            if all(test(_resolve(probe, column)) for column, test in self.filters):
+                rows.append(shaped)
+
+        count = len(rows) if self.count_mode == "exact" else None
+        for column, desc in reversed(self.orders):
+            rows.sort(key=lambda r: _sort_key(_resolve(r, column)), reverse=desc)
+        if self.limit_n is not None:
+            rows = rows[self.offset:self.offset + self.limit_n]
+        if self.fake.max_rows is not None:
+            rows = rows[:self.fake.max_rows]
+        return rows, count
+
+
+def seed_demo_data(fake, n_products=500, n_clients=30, n_quotes=200, items_per_quote=6):
+    """產生一份固定的示範資料 (不計入呼叫次數)"""
+    models = ["FX5U-32MR/ES", "FX3U-48MR", "NF32-SV 3P", "NV63-CV 3P", "S-T21 AC220V", "FR-E820", "GT2710-STBA", "QJ71C24N"]
+    products = fake.seed("products", [
+        {"name": f"{models[i % len(models)]}-{i:05d}", "spec": f"規格 {i}", "dealer_price": 1000 + (i * 37) % 40000}
+        for i in range(n_products)
+    ])
+    clients = fake.seed("clients", [
+        {"name": f"示範客戶 {i:02d}", "tax_id": f"{12345600 + i}", "contact_person": "", "phone": "", "address": ""}
+        for i in range(n_clients)
+    ])
+    rpc = FakeRpc(fake, "save_quotation", {})
+    for q in range(n_quotes):
+        items = []
+        for k in range(items_per_quote):
+            p = products[(q * 7 + k * 13) % len(products)]
+            items.append({"product_name": p['name'], "quantity": 1 + (q + k) % 10,
+                          "unit_price": round(p['dealer_price'] * 0.7), "dealer_price_snapshot": p['dealer_price']})
+        with fake._lock:
+            rpc._save_quotation(clients[q % len(clients)]['id'], datetime(2026, q % 12 + 1, 1).date().isoformat(), "2026%02d" % (q % 12 + 1), items)
+    return fake
@@ -0,0 +1,113 @@
+"""
+存檔併發壓力測試：N 個執行緒同時 save_quotation，檢查存進去的單號不重複且連號
+
+    python benchmarks/quote_no_load.py --threads 32 --per-thread 20
+    python benchmarks/quote_no_load.py --backend fake --latency-ms 20
+    python benchmarks/quote_no_load.py --backend secrets --client-id 12   # 正式資料庫 (需明確指定)
+
+--backend：
+  sqlite  (預設) 暫存目錄裡的全新 SQLite 檔
+  fake    假 Supabase (benchmarks/fake_supabase.py)
+  secrets .streamlit/secrets.toml 設定的資料庫；會真的寫入報價單，須以 --client-id 指定測試用客戶
+取號月份預設為 900001，不會動到正式月份的流水號。
+存檔結果以回傳的單號與資料庫內實際的報價單兩邊檢查：不可重複，且序號從第一個號碼起連續不中斷。
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+ITEMS = [{"product": "LOAD-TEST-ITEM", "price": 100, "qty": 1}]
+
+
+def setup(args):
+    """依 --backend 準備 database 模組，回傳 (database, client_id)"""
+    if args.backend != "secrets":
+        # 匯入 database 前先指到暫存 SQLite，避免讀取正式 secrets
+        os.environ["DB_BACKEND"] = "sqlite"
+        os.environ["SQLITE_PATH"] = os.path.join(tempfile.mkdtemp(), "quote_no_load.db")
+    from modules import database
+    if args.backend == "fake":
+        from fake_supabase import FakeSupabase
+        from modules.storage_supabase import SupabaseBackend
+        database.use_backend(SupabaseBackend(FakeSupabase(latency_ms=args.latency_ms)))
+    if not database.backend:
+        sys.exit("資料庫未連線")
+    if args.backend == "secrets":
+        if not args.client_id:
+            sys.exit("--backend secrets 會寫入正式資料庫，請以 --client-id 指定測試用客戶")
+        return database, args.client_id
+    database.backend.insert_client({"name": "壓力測試", "tax_id": "", "contact_person": "", "phone": "", "address": ""})
+    return database, database.backend.list_clients()[0]['id']
+
+
+def sequence(quote_no):
+    return int(quote_no.rsplit("-", 1)[1])
+
+
+def check(numbers, label):
+    """回傳問題列表：重複、序號不連續"""
+    problems = [f"{label}重複: {no} x{n}" for no, n in sorted(Counter(numbers).items()) if n > 1]
+    seqs = sorted({sequence(no) for no in numbers})
+    if seqs and seqs != list(range(seqs[0], seqs[0] + len(seqs))):
+        missing = sorted(set(range(seqs[0], seqs[-1] + 1)) - set(seqs))
+        problems.append(f"{label}序號不連續，缺 {len(missing)} 個: {missing[:10]}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--per-thread", type=int, default=10)
+    parser.add_argument("--period", default="900001", help="取號月份 (YYYYMM)")
+    parser.add_argument("--backend", choices=["sqlite", "fake", "secrets"], default="sqlite")
+    parser.add_argument("--latency-ms", type=float, default=5, help="--backend fake 每次呼叫的模擬延遲")
+    parser.add_argument("--client-id", type=int, help="--backend secrets 時的測試用客戶 id")
+    args = parser.parse_args()
+
+    database, client_id = setup(args)
+    prefix = f"QUO-{args.period}-"
+    before = {q['quote_no'] for q in database.backend.list_quotations(client_id=client_id)}
+
+    numbers, errors = [], []
+    lock = threading.Lock()
+    barrier = threading.Barrier(args.threads)
+
+    def worker():
+        barrier.wait()
+        for _ in range(args.per_thread):
+            ok, result = database.save_quotation(client_id, "2026-10-01", ITEMS, 100, period=args.period)
+            with lock: (numbers if ok else errors).append(result)
+
+    threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+    started = time.perf_counter()
+    for t in threads: t.start()
+    for t in threads: t.join()
+    elapsed = time.perf_counter() - started
+
+    saved = [q['quote_no'] for q in database.backend.list_quotations(client_id=client_id)
+             if q['quote_no'].startswith(prefix) and q['quote_no'] not in before]
+    problems = check(numbers, "回傳單號") + check(saved, "資料庫內單號")
+    if sorted(saved) != sorted(numbers):
+        problems.append(f"資料庫內有 {len(saved)} 張，回傳成功 {len(numbers)} 張")
+
+    print(f"[{args.backend}] 存檔 {len(numbers)} 張，{elapsed:.2f} 秒 ({len(numbers) / elapsed:,.0f} 張/秒)")
+    if numbers:
+        print(f"單號 {min(numbers)} ~ {max(numbers)}")
+    print(f"錯誤 {len(errors)} 次，問題 {len(problems)} 項")
+    for p in problems[:20]:
+        print(f"  {p}")
+    for e in errors[:5]:
+        print(f"  錯誤: {e}")
+    sys.exit(1 if problems or errors else 0)
+
+
+if __name__ == "__main__":
+    main()
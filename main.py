@@ -1,7 +1,6 @@
 import streamlit as st
-import pandas as pd
 import time
-from modules import calculator, database, pdf_gen, ui_components
+from modules import calculator, database, importer, line_items, metrics, pdf_cache, product_index, ui_components
 
 # 設定頁面
 st.set_page_config(page_title="報價管理系統", layout="wide", page_icon="💼")
@@ -15,9 +14,14 @@ def check_password():
     password = st.text_input("請輸入授權密碼", type="password")
     
     correct_password = st.secrets.get("APP_PASSWORD", "1234")
+    admin_password = st.secrets.get("ADMIN_PASSWORD")
     
     if st.button("登入"):
-        if password == correct_password:
+        if admin_password and password == admin_password:
+            st.session_state["password_correct"] = True
+            st.session_state["is_admin"] = True
+            st.rerun()
+        elif password == correct_password:
             st.session_state["password_correct"] = True
             st.rerun()
         else:
@@ -31,17 +35,33 @@ if not check_password():
 # 主程式
 # ==========================================
 
+# 整頁重跑的次數與耗時 (app.full_run)；fragment 內的操作只重跑該段，不會計入
+run_started = time.perf_counter()
+
+# 量測檔匯出 (Prometheus textfile)，每個 process 只會啟動一次
+if st.secrets.get("METRICS_FILE"):
+    metrics.start_file_exporter(st.secrets["METRICS_FILE"])
+
 calculator.render_simple_calculator()
 
 st.sidebar.title("功能選單")
 page = st.sidebar.radio("Go to", ["🏠 首頁概覽", "📝 新增報價單", "📊 歷史定價比較", "🗃️ 資料庫管理"])
 
+# 連線狀態
+status_level, status_msg = database.connection_status()
+if status_level == "ok":
+    st.sidebar.caption(f"🟢 {status_msg}")
+elif status_level == "down":
+    st.sidebar.error(f"🔴 {status_msg}")
+else:
+    st.sidebar.warning(f"🟡 {status_msg}")
+
 # --- 頁面 0: 首頁概覽 ---
 if page == "🏠 首頁概覽":
     st.title("📊 營運儀表板")
     
     # 檢查連線
-    if not database.supabase:
+    if not database.backend:
         st.error("🔴 資料庫未連線！請檢查 Secrets 設定或重啟應用程式。")
     else:
         with st.spinner("更新數據中..."):
@@ -54,22 +74,19 @@ if page == "🏠 首頁概覽":
 elif page == "📝 新增報價單":
     st.title("📝 新增報價單")
     
-    # 1. 取得資料
-    clients_list = database.get_clients()
-    raw_products = database.get_products()
-    
-    # 2. 防呆處理 (避免 AttributeError)
-    products_map = {}
-    if raw_products:
-        products_map = {item['name']: item['dealer_price'] for item in raw_products}
+    # 1. 取得資料 (客戶與產品索引同時讀取；產品目錄以索引提供，不在每列重新掃描)
+    loaded, late = database.load_concurrently(
+        {"clients": database.get_clients, "index": database.get_product_index},
+        defaults={"clients": [], "index": product_index.ProductIndex([])},
+    )
+    clients_list, index = loaded["clients"], loaded["index"]
+    if late:
+        st.warning("⏳ 資料庫回應較慢，部分資料尚未載入，請稍後重新整理。")
     
-    # 如果沒產品，顯示假資料並警告，防止當機
-    if not products_map:
+    if not len(index):
         st.warning("⚠️ 無產品資料或資料庫未連線。請先至「資料庫管理」新增產品。")
-        # 給一個假的選項，讓下面的程式碼有東西可以跑，不會崩潰
-        products_map = {"(尚無產品)": 0}
-        
-    # 3. 介面顯示
+
+    # 2. 介面顯示
     with st.container():
         col1, col2, col3 = st.columns([2, 1, 1])
         with col1:
@@ -81,7 +98,7 @@ elif page == "📝 新增報價單":
                     client_name = selected_client_str.split(":")[1].strip()
             else:
                 st.warning("查無客戶資料")
-                client_name = ""
+                client_id, client_name = None, ""
         
         with col2:
             quote_date = st.date_input("報價日期")
@@ -90,71 +107,32 @@ elif page == "📝 新增報價單":
 
     st.divider()
 
-    # 初始化 (這裡就是您之前報錯的地方，現在加上了保護)
-    if "rows" not in st.session_state:
-        # 使用 products_map 的第一個鍵，因為我們上面已經保證它至少有一個 "(尚無產品)"
-        first_prod = list(products_map.keys())[0]
-        st.session_state.rows = [{"product": first_prod, "price": 0, "qty": 1}]
-
-    h1, h2, h3, h4, h5, h6 = st.columns([0.5, 3, 2, 2, 1.5, 1])
-    h2.text("產品名稱")
-    h3.text("單價")
-    h4.text("數量")
-
-    for i, row in enumerate(st.session_state.rows):
-        c1, c2, c3, c4, c5, c6 = st.columns([0.5, 3, 2, 2, 1.5, 1])
-        
-        with c2:
-            current_prod = row["product"]
-            if current_prod not in products_map: 
-                current_prod = list(products_map.keys())[0]
-            
-            prod_name = st.selectbox(f"p_{i}", list(products_map.keys()), index=list(products_map.keys()).index(current_prod), key=f"p_{i}", label_visibility="collapsed")
-            dealer_ref_price = products_map[prod_name]
-            
-        with c3:
-            price = st.number_input(f"pr_{i}", value=float(row["price"]), key=f"price_input_{i}", label_visibility="collapsed")
-        with c4:
-            qty = st.number_input(f"qt_{i}", value=int(row["qty"]), key=f"qty_input_{i}", label_visibility="collapsed")
-
-        if dealer_ref_price > 0 and price > 0:
-            ratio = price / dealer_ref_price
-            if ratio < 0.6:
-                c1.markdown("### ⚠️")
-                c1.caption(f"{ratio:.0%}")
-
-        with c5:
-            if st.button("📜 歷史", key=f"hist_{i}"):
-                ui_components.show_history_modal(client_name, prod_name)
-        with c6:
-            if st.button("🗑️", key=f"del_{i}"):
-                st.session_state.rows.pop(i)
-                st.rerun()
-        
-        st.session_state.rows[i] = {"product": prod_name, "price": price, "qty": qty}
-
-    if st.button("➕ 新增品項"):
-        st.session_state.rows.append({"product": list(products_map.keys())[0], "price": 0, "qty": 1})
-        st.rerun()
+    lines = ui_components.render_line_item_editor(index, client_id, client_name)
 
     st.divider()
 
     if st.button("💾 儲存並生成 PDF", type="primary", use_container_width=True):
-        if not client_name or "(尚無產品)" in [r['product'] for r in st.session_state.rows]:
-            st.error("資料不完整，無法存檔")
+        if not client_name or lines.empty or not lines["known"].all():
+            st.error("資料不完整，無法存檔 (需選擇客戶，且所有型號都在產品目錄中)")
             st.stop()
 
+        items = line_items.to_rows(lines)
         with st.spinner("儲存中..."):
-            success, result_msg = database.save_quotation(client_id, quote_date, st.session_state.rows, 0)
+            success, result_msg = database.save_quotation(client_id, quote_date, items, 0)
         
         if success:
             st.success(f"✅ 單號：{result_msg}")
-            pdf_data = {"id": result_msg, "date": str(quote_date), "client_name": client_name, "items": [{"name": r["product"], "price": r["price"], "qty": r["qty"]} for r in st.session_state.rows]}
-            pdf_file = pdf_gen.create_quotation_pdf(pdf_data, show_stamp=show_stamp)
-            st.download_button(label="📥 下載 PDF", data=pdf_file, file_name=f"{result_msg}.pdf", mime="application/pdf")
+            pdf_data = {"id": result_msg, "date": str(quote_date), "client_name": client_name, "items": [{"name": r["product"], "spec": index.specs.get(r["product"], ""), "price": r["price"], "qty": r["qty"]} for r in items]}
+            pdf_path = pdf_cache.get_or_create(pdf_data, show_stamp=show_stamp)
+            st.session_state.last_pdf = {"quote_no": result_msg, "path": pdf_path, "show_stamp": show_stamp}
         else:
             st.error(f"存檔失敗: {result_msg}")
 
+    # 最近一次存檔的 PDF (存在磁碟快取，操作其他元件後仍可下載)
+    if st.session_state.get("last_pdf"):
+        last = st.session_state.last_pdf
+        ui_components.pdf_download_button(last["quote_no"], last["show_stamp"], key="dl_last_pdf")
+
 # --- 頁面 2: 歷史定價 ---
 elif page == "📊 歷史定價比較":
     ui_components.render_price_analysis_page()
@@ -164,10 +142,18 @@ elif page == "🗃️ 資料庫管理":
     st.title("🗃️ 資料庫管理")
     
     # 檢查連線狀態
-    if not database.supabase:
+    if not database.backend:
         st.error("🔴 資料庫未連線！無法執行新增操作。請檢查 Secrets 設定。")
     
-    tab1, tab2 = st.tabs(["📦 產品管理", "👥 客戶管理"])
+    # 產品與客戶清單同時讀取 (匯入 / 新增後會 st.rerun，清單重新讀取)
+    loaded, late = database.load_concurrently(
+        {"products": database.get_products, "clients": database.get_clients},
+        defaults={"products": [], "clients": []},
+    )
+    if late:
+        st.warning("⏳ 資料庫回應較慢，部分清單尚未載入，請稍後重新整理。")
+
+    tab1, tab2, tab3 = st.tabs(["📦 產品管理", "👥 客戶管理", "🗂️ 批次匯出"])
     
     with tab1:
         st.subheader("批次匯入 (Excel)")
@@ -176,25 +162,30 @@ elif page == "🗃️ 資料庫管理":
         
         if uploaded_file:
             try:
-                if uploaded_file.name.endswith('.csv'): 
-                    df = pd.read_csv(uploaded_file)
-                else: 
-                    df = pd.read_excel(uploaded_file)
-                
                 st.write("預覽 (前5筆):")
-                preview_df = df.head().copy()
+                preview_df = importer.read_preview(uploaded_file, uploaded_file.name)
                 cols_hide = [c for c in preview_df.columns if "NO" in str(c).upper() or "訂購" in str(c)]
                 st.dataframe(preview_df.drop(columns=cols_hide, errors='ignore'))
                 
                 if st.button("🚀 確認匯入"):
-                    with st.spinner("寫入中..."):
-                        success, msg = database.batch_import_products(df)
-                        if success: 
-                            st.success(msg)
-                            time.sleep(2)
-                            st.rerun()
-                        else: 
-                            st.error(msg)
+                    total_rows = importer.estimate_rows(uploaded_file, uploaded_file.name)
+                    bar = st.progress(0, text="寫入中...")
+
+                    def show_progress(done, rate):
+                        pct = min(done / total_rows, 1.0) if total_rows else 0
+                        bar.progress(pct, text=f"已處理 {done:,} 筆 ({rate:,.0f} 筆/秒)")
+
+                    imported, failed_batches, msg = database.batch_import_products(
+                        uploaded_file, uploaded_file.name, on_progress=show_progress)
+                    bar.empty()
+                    if not failed_batches:
+                        st.success(msg + "！")
+                        time.sleep(2)
+                        st.rerun()
+                    else:
+                        # 部分成功顯示警告，完全沒有匯入顯示錯誤
+                        notice = st.warning if imported else st.error
+                        notice(msg + "\n\n失敗批次：\n" + "\n".join(f"- {e}" for e in failed_batches))
             except Exception as e:
                 st.error(f"讀取錯誤: {e}")
 
@@ -214,7 +205,10 @@ elif page == "🗃️ 資料庫管理":
                         st.error("新增失敗 (可能原因：資料庫連線中斷 或 RLS 鎖定)")
         
         st.subheader("現有產品")
-        st.dataframe(database.get_products(), use_container_width=True)
+        st.dataframe(loaded["products"], use_container_width=True)
+
+        st.subheader("💲 價目表")
+        ui_components.render_price_list(database.get_product_index(), [c["name"] for c in loaded["clients"]])
 
     with tab2:
         with st.form("add_cli"):
@@ -229,4 +223,13 @@ elif page == "🗃️ 資料庫管理":
                     else:
                         st.error("新增失敗")
         st.subheader("現有客戶")
-        st.dataframe(database.get_clients(), use_container_width=True)
\ No newline at end of file
+        st.dataframe(loaded["clients"], use_container_width=True)
+
+    with tab3:
+        ui_components.render_bulk_export()
+
+metrics.record("app.full_run", time.perf_counter() - run_started)
+
+# --- 管理員：效能量測面板 (放最後，才會包含本次 rerun 的呼叫) ---
+if st.session_state.get("is_admin"):
+    ui_components.render_metrics_panel()
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+# --- 歷史定價分析 ---
+# 輸入為 database.fetch_history_frame() 的 DataFrame
+# (欄位: id, product_name, quantity, unit_price, dealer_price_snapshot, quote_date, quote_no, client_name)
+# 全部以整欄運算與 groupby 完成，不逐列 apply，十萬筆以上也在毫秒到百毫秒內。
+
+RATIO_BINS = [0, 0.8, 0.9, 1.0, 1.1, 1.2, 1.3, 1.5, 2.0, np.inf]
+RATIO_LABELS = ["<80%", "80-90%", "90-100%", "100-110%", "110-120%", "120-130%", "130-150%", "150-200%", "≥200%"]
+
+
+def discount_ratio(df):
+    """單價 / 經銷價；經銷價為 0 或缺值時為 NaN"""
+    cost = pd.to_numeric(df["dealer_price_snapshot"], errors="coerce")
+    price = pd.to_numeric(df["unit_price"], errors="coerce")
+    return (price / cost.where(cost > 0)).astype("float64")
+
+
+def prepare(df):
+    """補上 ratio 與日期欄，依 id 由新到舊排序"""
+    df = df.copy()
+    df["ratio"] = discount_ratio(df)
+    df["quote_date"] = pd.to_datetime(df["quote_date"], errors="coerce")
+    df["client_name"] = df["client_name"].fillna("未知客戶")
+    return df.sort_values("id", ascending=False, ignore_index=True)
+
+
+def client_price_stats(df):
+    """每個客戶的 最低 / 中位數 / 最高單價、筆數、平均折數，以及最近一次報價"""
+    grouped = df.groupby("client_name", sort=False)
+    stats = grouped["unit_price"].agg(["min", "median", "max", "count"])
+    stats["avg_ratio"] = grouped["ratio"].mean()
+    # df 已依 id 由新到舊排序，每組第一列就是最近一次
+    latest = grouped[["unit_price", "quote_date", "product_name"]].first()
+    stats["last_price"] = latest["unit_price"]
+    stats["last_date"] = latest["quote_date"]
+    stats["last_product"] = latest["product_name"]
+    return stats.sort_values("count", ascending=False).reset_index()
+
+
+def ratio_distribution(df):
+    """折數分佈 (各區間筆數)"""
+    buckets = pd.cut(df["ratio"].dropna(), bins=RATIO_BINS, labels=RATIO_LABELS, right=False)
+    return buckets.value_counts(sort=False).rename_axis("折數").rename("筆數")
+
+
+def price_trend(df, freq="MS"):
+    """每月的 最低 / 平均 / 最高 單價"""
+    dated = df.dropna(subset=["quote_date"])
+    if dated.empty: return pd.DataFrame(columns=["最低", "平均", "最高"])
+    trend = dated.set_index("quote_date")["unit_price"].resample(freq).agg(["min", "mean", "max"])
+    return trend.dropna(how="all").rename(columns={"min": "最低", "mean": "平均", "max": "最高"})
+
+
+def last_price(df, client_name):
+    """該客戶最近一次的 (單價, 日期, 單號)；沒有報過價回傳 None"""
+    rows = df[df["client_name"] == client_name]
+    if rows.empty: return None
+    row = rows.iloc[0]
+    return row["unit_price"], row["quote_date"], row["quote_no"]
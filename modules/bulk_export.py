@@ -0,0 +1,101 @@
+import multiprocessing
+import os
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from modules import pdf_gen
+
+# --- 批次匯出報價單 PDF ---
+# ZIP：每張報價單各自一份 PDF，完成一份寫入一份；張數多且 CPU 足夠時在 process pool 平行產生
+# 合併 PDF：全部畫在同一個 canvas (共用字型子集與頁首頁尾 form)，每張一個書籤
+
+SPOOL_MAX_SIZE = 32 * 1024 * 1024     # 超過就改寫到暫存檔，不佔記憶體
+POOL_MIN_QUOTES = 200                  # 少於此數不開 process pool (spawn worker 約 1 秒，單一 process 每秒約 50 份)
+# 頁面上的匯出寫到磁碟檔，按下載時才讀取 (st.download_button 的 data 傳 callable)
+EXPORT_DIR = os.path.join(tempfile.gettempdir(), "quotation_exports")
+EXPORT_MAX_AGE = 60 * 60               # 秒；超過的匯出檔在下次匯出時刪除
+
+
+def default_workers(n_quotes=None):
+    """CPU 不足 (≤ 2 核) 或張數少於 POOL_MIN_QUOTES 時回傳 1：依序產生，不啟動 process pool"""
+    if n_quotes is not None and n_quotes < POOL_MIN_QUOTES: return 1
+    return max(1, min(4, (os.cpu_count() or 1) - 1))
+
+
+def new_export_file(suffix):
+    """在 EXPORT_DIR 建立匯出檔 (順便刪掉過期的舊檔)，回傳 (路徑, 已開啟可寫入的檔案)"""
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    cutoff = time.time() - EXPORT_MAX_AGE
+    for entry in os.scandir(EXPORT_DIR):
+        try:
+            if entry.stat().st_mtime < cutoff: os.remove(entry.path)
+        except OSError:
+            pass
+    fd, path = tempfile.mkstemp(prefix="quotations_", suffix=suffix, dir=EXPORT_DIR)
+    return path, os.fdopen(fd, "w+b")
+
+
+def read_file(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _init_worker():
+    # 每個 worker 開始時先載入字型與圖片，之後每份 PDF 都是 warm
+    pdf_gen.register_fonts()
+    pdf_gen.load_assets()
+
+
+def _render(job):
+    data, show_stamp = job
+    return data['id'], pdf_gen.create_quotation_pdf(data, show_stamp=show_stamp).getvalue()
+
+
+def export_zip(quotes, show_stamp=True, workers=None, on_progress=None, fileobj=None):
+    """
+    quotes: database.fetch_quotations() 的結果
+    回傳已寫入 ZIP 並移回開頭的檔案物件
+    on_progress(已完成, 總數)
+    """
+    fileobj = fileobj or tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    workers = workers or default_workers(len(quotes))
+    jobs = [(q, show_stamp) for q in quotes]
+
+    # PDF 本身已壓縮，ZIP 只打包不再壓縮
+    with zipfile.ZipFile(fileobj, "w", compression=zipfile.ZIP_STORED) as zf:
+        if workers <= 1:
+            results = map(_render, jobs)
+            _write_all(zf, results, len(jobs), on_progress)
+        else:
+            # spawn：不 fork 正在跑 Streamlit server 的多執行緒 process
+            ctx = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker) as pool:
+                chunksize = max(1, len(jobs) // (workers * 4))
+                _write_all(zf, pool.map(_render, jobs, chunksize=chunksize), len(jobs), on_progress)
+
+    fileobj.seek(0)
+    return fileobj
+
+
+def _write_all(zf, results, total, on_progress):
+    for done, (quote_no, pdf_bytes) in enumerate(results, start=1):
+        zf.writestr(f"{quote_no}.pdf", pdf_bytes)
+        if on_progress: on_progress(done, total)
+
+
+def export_merged(quotes, show_stamp=True, on_progress=None, fileobj=None):
+    """所有報價單合併成一份 PDF，每張報價單一個書籤"""
+    fileobj = fileobj or tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    c = pdf_gen.new_canvas(fileobj)
+    c.showOutline()
+    for done, quote in enumerate(quotes, start=1):
+        key = f"quote_{done}"
+        c.bookmarkPage(key)
+        c.addOutlineEntry(f"{quote['id']}  {quote['client_name']}  {quote['date']}", key, level=0)
+        pdf_gen.draw_quotation(c, quote, show_stamp)
+        c.showPage()
+        if on_progress: on_progress(done, len(quotes))
+    c.save()
+    fileobj.seek(0)
+    return fileobj
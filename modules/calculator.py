@@ -1,6 +1,13 @@
 import streamlit as st
+from modules import pricing
 
 def render_simple_calculator():
+    # 計算機是獨立的 fragment：按鍵只重跑計算機本身，不會重跑整個頁面 (不重新讀取客戶 / 產品、不重畫明細)
+    with st.sidebar:
+        _calculator_panel()
+
+@st.fragment
+def _calculator_panel():
     # --- 1. 初始化 Session State ---
     if 'calc_current' not in st.session_state: st.session_state.calc_current = "0"
     if 'calc_expression' not in st.session_state: st.session_state.calc_expression = ""
@@ -41,14 +48,13 @@ def render_simple_calculator():
             if st.session_state.calc_expression:
                 try:
                     expr_str = st.session_state.calc_expression + " " + curr
-                    eval_str = expr_str.replace("×", "*").replace("÷", "/")
-                    result = eval(eval_str)
+                    result = pricing.evaluate(expr_str)
                     res_str = f"{result:g}" 
                     st.session_state.calc_history.insert(0, f"{expr_str} = {res_str}")
                     st.session_state.calc_current = res_str
                     st.session_state.calc_expression = ""
                     st.session_state.new_entry = True
-                except:
+                except pricing.RuleError:
                     st.session_state.calc_current = "Error"
                     st.session_state.new_entry = True
 
@@ -68,53 +74,48 @@ def render_simple_calculator():
             st.session_state.calc_history = []
 
     # --- 3. UI 佈局 (側邊欄) ---
-    with st.sidebar:
-        st.markdown("### 🧮 快速計算")
+    st.markdown("### 🧮 快速計算")
 
-        # 鍵盤速算輸入
-        kb_input = st.text_input("⌨️ 鍵盤輸入 (Enter)", key="kb_simple_input", placeholder="如: 500*0.8")
-        if kb_input:
-            try:
-                allowed = set("0123456789.+-*/ ")
-                if set(kb_input).issubset(allowed):
-                    res = str(eval(kb_input))
-                    st.success(f"= {res}")
-                    st.session_state.calc_history.insert(0, f"{kb_input} = {res}")
-                else:
-                    st.error("格式錯誤")
-            except: pass
+    # 鍵盤速算輸入
+    kb_input = st.text_input("⌨️ 鍵盤輸入 (Enter)", key="kb_simple_input", placeholder="如: 500*0.8")
+    if kb_input:
+        # 以定價規則引擎計算 (modules/pricing.py，不經過 eval)；只接受數字、+ - * / ( ) 與 round / min / max 等函式
+        try:
+            res = str(pricing.evaluate(kb_input))
+            st.success(f"= {res}")
+            st.session_state.calc_history.insert(0, f"{kb_input} = {res}")
+        except pricing.RuleError as e:
+            st.error(f"格式錯誤：{e}")
 
-        st.divider()
-        
-        # 顯示幕
-        st.markdown(f"<div style='text-align: right; color: gray; font-size: 12px; min-height: 20px;'>{st.session_state.calc_expression}</div>", unsafe_allow_html=True)
-        st.markdown(f"<div style='text-align: right; font-size: 24px; font-weight: bold; margin-bottom: 10px; background-color: #f0f2f6; padding: 5px; border-radius: 5px;'>{st.session_state.calc_current}</div>", unsafe_allow_html=True)
+    st.divider()
+    
+    # 顯示幕
+    st.markdown(f"<div style='text-align: right; color: gray; font-size: 12px; min-height: 20px;'>{st.session_state.calc_expression}</div>", unsafe_allow_html=True)
+    st.markdown(f"<div style='text-align: right; font-size: 24px; font-weight: bold; margin-bottom: 10px; background-color: #f0f2f6; padding: 5px; border-radius: 5px;'>{st.session_state.calc_current}</div>", unsafe_allow_html=True)
 
-        # 按鈕矩陣
-        buttons_grid = [
-            ["C", "⌫", "%", "÷"],
-            ["7", "8", "9", "×"],
-            ["4", "5", "6", "-"],
-            ["1", "2", "3", "+"],
-            ["±", "0", ".", "="]
-        ]
+    # 按鈕矩陣
+    buttons_grid = [
+        ["C", "⌫", "%", "÷"],
+        ["7", "8", "9", "×"],
+        ["4", "5", "6", "-"],
+        ["1", "2", "3", "+"],
+        ["±", "0", ".", "="]
+    ]
 
-        for row in buttons_grid:
-            cols = st.columns(4)
-            for i, btn_label in enumerate(row):
-                btn_type = "primary" if btn_label in ["=", "+", "-", "×", "÷"] else "secondary"
-                if cols[i].button(btn_label, key=f"s_btn_{btn_label}", type=btn_type, use_container_width=True):
-                    on_click(btn_label)
-                    st.rerun()
+    for row in buttons_grid:
+        cols = st.columns(4)
+        for i, btn_label in enumerate(row):
+            btn_type = "primary" if btn_label in ["=", "+", "-", "×", "÷"] else "secondary"
+            cols[i].button(btn_label, key=f"s_btn_{btn_label}", type=btn_type, use_container_width=True,
+                           on_click=on_click, args=(btn_label,))
 
-        # 歷史紀錄
-        st.caption("📜 紀錄")
-        if st.session_state.calc_history:
-            with st.container(height=150):
-                for item in st.session_state.calc_history:
-                    st.text(item)
-            if st.button("清空紀錄", key="del_simple_hist", use_container_width=True):
-                on_click("clear_history")
-                st.rerun()
-        else:
-            st.text("...")
\ No newline at end of file
+    # 歷史紀錄
+    st.caption("📜 紀錄")
+    if st.session_state.calc_history:
+        with st.container(height=150):
+            for item in st.session_state.calc_history:
+                st.text(item)
+        st.button("清空紀錄", key="del_simple_hist", use_container_width=True,
+                  on_click=on_click, args=("clear_history",))
+    else:
+        st.text("...")
\ No newline at end of file
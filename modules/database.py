@@ -1,55 +1,202 @@
 import streamlit as st
-from supabase import create_client, Client
-from supabase.lib.client_options import ClientOptions
-import pandas as pd
+import os
+import hashlib
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
+from modules import history_snapshot, importer, metrics, product_index, resilience
+from modules.storage import StorageBackend
+
+# --- 設定讀取 ---
+def _setting(key, default=None):
+    # 環境變數優先，其次 secrets.toml
+    if key in os.environ: return os.environ[key]
+    try:
+        return st.secrets.get(key, default)
+    except Exception:
+        return default
 
 # --- 初始化連線 ---
+# DB_BACKEND = "supabase" (預設) 或 "sqlite" (離線 / 展場 / 效能量測)
+# SQLITE_PATH 指定 SQLite 檔案位置；DB_TIMEOUT 為單次請求逾時秒數
 @st.cache_resource
 def init_connection():
     try:
+        if _setting("DB_BACKEND", "supabase") == "sqlite":
+            from modules.storage_sqlite import SQLiteBackend
+            return SQLiteBackend(_setting("SQLITE_PATH", "data/quotation.db"))
+
         # 1. 檢查 secrets 是否存在
-        if "SUPABASE_URL" not in st.secrets:
+        url = _setting("SUPABASE_URL")
+        if not url:
             st.error("❌ 系統讀取不到 SUPABASE_URL！請確認 secrets.toml 設定正確。")
             return None
-            
-        url = st.secrets["SUPABASE_URL"]
-        key = st.secrets["SUPABASE_KEY"]
-        
-        # 2. 設定連線逾時 (60秒)，解決免費版休眠問題
-        options = ClientOptions(postgrest_client_timeout=60)
-        
-        return create_client(url, key, options=options)
+
+        from modules.storage_supabase import SupabaseBackend
+        return SupabaseBackend.connect(url, _setting("SUPABASE_KEY"), timeout=float(_setting("DB_TIMEOUT", 10)))
     except Exception as e:
         st.error(f"🔥 資料庫連線初始化失敗: {str(e)}")
         return None
 
-supabase: Client = init_connection()
+backend: StorageBackend = init_connection()
+
+# --- 連線韌性 (見 modules/resilience.py) ---
+# 暫時性錯誤以退避重試；連續失敗後斷路器打開，讀取改用最近一次成功的結果
+BREAKER_FAILURES = 3
+BREAKER_RESET = 30         # 秒
+RETRY_DEADLINE = 5         # 秒；一次讀取含重試的時間預算，逾時 (DB_TIMEOUT) 失敗的請求不會再重試
+
+breaker = None
+warmup = None
+_last_good = {}            # 最近一次成功的讀取結果 (全站共用)
+
+def _setup_resilience():
+    global breaker, warmup
+    trip_on = backend.transient_errors if backend else (Exception,)
+    breaker = resilience.CircuitBreaker(BREAKER_FAILURES, BREAKER_RESET, trip_on=trip_on)
+    # 啟動時背景喚醒資料庫，不讓第一位使用者卡在休眠喚醒
+    warmup = resilience.Warmup(backend.ping).start() if backend else None
+
+_setup_resilience()
+
+def _call(fn, *args, retry=True):
+    """
+    經斷路器呼叫後端；retry=True 時暫時性錯誤會在 RETRY_DEADLINE 內重試 (只用在可重複執行的操作)
+    背景暖機進行中 (資料庫可能還在喚醒) 不重試，直接失敗改用快取資料
+    每次呼叫記一筆 backend.<方法> 量測，含重試時間
+    """
+    started = time.perf_counter()
+    result, error = None, True
+    if warmup and warmup.state in ("pending", "warming"): retry = False
+    try:
+        if retry:
+            result = breaker.call(resilience.retry_call, fn, *args, retry_on=backend.transient_errors,
+                                  deadline=RETRY_DEADLINE)
+        else:
+            result = breaker.call(fn, *args)
+        error = False
+        return result
+    finally:
+        rows = len(result) if isinstance(result, list) else 0
+        metrics.record(f"backend.{fn.__name__}", time.perf_counter() - started, rows, error)
+
+def _remember(key, value):
+    _last_good[key] = value
+    return value
+
+def connection_status():
+    """回傳 (等級, 訊息) 給側邊欄；等級: ok / warming / degraded / down"""
+    if not backend: return "down", "資料庫未連線"
+    state = breaker.state
+    if state == "open":
+        return "down", f"資料庫暫時無法連線，顯示快取資料 ({breaker.retry_after():.0f} 秒後重試)"
+    if state == "half_open":
+        return "degraded", "資料庫恢復中..."
+    if warmup and warmup.state == "warming":
+        return "warming", "資料庫喚醒中..."
+    if warmup and warmup.state == "failed" and breaker.failures:
+        return "degraded", f"資料庫連線不穩：{breaker.last_error}"
+    if backend.name == "sqlite":
+        return "ok", f"離線模式 (SQLite: {backend.path})"
+    return "ok", "資料庫已連線"
+
+def use_backend(new_backend):
+    """切換後端 (效能量測、離線模式用)，並清除目錄快取"""
+    global backend
+    backend = new_backend
+    _last_good.clear()
+    invalidate_catalog()
+    _setup_resilience()
+    _reset_history()
+    invalidate_item_history()
 
 # --- 讀取功能 (Read) ---
 
+# 產品 / 客戶目錄快取 (全站共用，所有使用者 session 共享同一份)
+CATALOG_TTL = 300          # 秒；寫入時會主動清除，TTL 只是保險
+CATALOG_MAX_ENTRIES = 4
+
+@st.cache_data(ttl=CATALOG_TTL, max_entries=CATALOG_MAX_ENTRIES, show_spinner=False)
+def _fetch_clients():
+    # 失敗時直接拋出例外，避免把空清單存進快取
+    return _call(backend.list_clients)
+
+@st.cache_data(ttl=CATALOG_TTL, max_entries=CATALOG_MAX_ENTRIES, show_spinner=False)
+def _fetch_products():
+    return _call(backend.list_products)
+
+# 產品索引是共用的唯讀物件，用 cache_resource 避免每次讀取都複製一份
+@st.cache_resource(ttl=CATALOG_TTL, show_spinner=False)
+def _build_product_index():
+    return product_index.ProductIndex(_fetch_products())
+
+def invalidate_catalog():
+    """寫入產品或客戶後呼叫，讓所有 session 下次讀取時重新抓取"""
+    _fetch_clients.clear()
+    _fetch_products.clear()
+    _build_product_index.clear()
+
+@metrics.instrument("db.get_clients")
 def get_clients():
-    if not supabase: return []
+    if not backend: return []
     try:
-        response = supabase.table("clients").select("*").order("id").execute()
-        return response.data
+        return _remember("clients", _fetch_clients())
     except Exception as e:
         print(f"讀取客戶失敗: {e}")
-        return []
+        return _last_good.get("clients", [])
 
+@metrics.instrument("db.get_products")
 def get_products():
-    if not supabase: return []
+    if not backend: return []
     try:
-        response = supabase.table("products").select("*").order("id").execute()
-        return response.data
+        return _remember("products", _fetch_products())
     except Exception as e:
         print(f"讀取產品失敗: {e}")
-        return []
+        return _last_good.get("products", [])
+
+@metrics.instrument("db.get_product_index", rows=lambda args, kwargs, result: len(result))
+def get_product_index():
+    """產品目錄的查詢索引 (modules/product_index.py)，目錄更新時重建"""
+    if not backend: return product_index.ProductIndex([])
+    try:
+        return _build_product_index()
+    except Exception as e:
+        print(f"建立產品索引失敗: {e}")
+        return product_index.ProductIndex(_last_good.get("products", []))
+
+# --- 頁面初始資料並行讀取 ---
+# 同一頁互不相依的讀取 (例如客戶清單與產品索引) 同時送出，冷啟動時只等最慢的那一個。
+# 超過 PAGE_LOAD_DEADLINE 秒還沒回來的項目先用 defaults 顯示，背景完成後寫進快取，下次 rerun 補上。
+PAGE_LOAD_DEADLINE = 8     # 秒
+
+def load_concurrently(tasks, defaults=None, timeout=PAGE_LOAD_DEADLINE):
+    """
+    tasks: {名稱: 無參數函式}，例如 {"clients": get_clients, "index": get_product_index}
+    回傳 (results, late)：results 含所有名稱 (逾時或失敗的用 defaults 的值)，late 為逾時或失敗的名稱
+    """
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+    ctx = get_script_run_ctx()
+
+    def in_session(fn):
+        # 背景執行緒掛上目前的 script context，快取與 session 量測 (metrics) 照常運作
+        def run():
+            add_script_run_ctx(threading.current_thread(), ctx)
+            return fn()
+        return run
+
+    started = time.perf_counter()
+    results, late = resilience.gather({name: in_session(fn) for name, fn in tasks.items()}, timeout)
+    metrics.record("db.load_concurrently", time.perf_counter() - started, len(results), error=bool(late))
+    for name in late:
+        results[name] = (defaults or {}).get(name)
+    return results, late
 
 # --- 寫入功能 (Create/Update) ---
 
+@metrics.instrument("db.add_client")
 def add_client(name, tax_id, contact, phone, address):
-    if not supabase: return False
+    if not backend: return False
     try:
         data = {
             "name": name,
@@ -58,22 +205,25 @@ def add_client(name, tax_id, contact, phone, address):
             "phone": phone,
             "address": address
         }
-        supabase.table("clients").insert(data).execute()
+        _call(backend.insert_client, data, retry=False)
+        invalidate_catalog()
         return True
     except Exception as e:
         # 【修正】把錯誤顯示出來
         st.error(f"❌ 新增客戶失敗: {str(e)}")
         return False
 
+@metrics.instrument("db.add_product")
 def add_product(name, spec, price):
-    if not supabase: return False
+    if not backend: return False
     try:
         data = {
             "name": name,
             "spec": spec,
             "dealer_price": price
         }
-        supabase.table("products").insert(data).execute()
+        _call(backend.insert_product, data, retry=False)
+        invalidate_catalog()
         return True
     except Exception as e:
         # 【修正】把錯誤顯示出來
@@ -81,137 +231,321 @@ def add_product(name, spec, price):
         return False
 
 # --- 批次匯入功能 (Excel) ---
-def batch_import_products(df):
+IMPORT_BATCH_SIZE = 500    # 每批 upsert 筆數，控制在 postgrest 逾時之內
+
+@metrics.instrument("db.batch_import_products")
+def batch_import_products(source, filename="", on_progress=None, batch_size=IMPORT_BATCH_SIZE):
     """
-    將 Pandas DataFrame 批次寫入 products 表
+    串流匯入產品價目表，依型號 (name) upsert
+    source: 上傳的 xlsx/csv 檔案物件，或 Pandas DataFrame
     支援格式: [NO., 型號, 牌價, 經銷價, 規格, 訂購品(V)]
+    on_progress(已處理筆數, 每秒筆數) 每批完成後呼叫
+    回傳 (匯入筆數, 失敗批次說明 list, 摘要訊息)；失敗批次為空表示全部成功
     """
-    if not supabase: return False, "資料庫未連線"
-    
-    try:
-        # 0. 清理欄位名稱
-        df.columns = [str(c).strip() for c in df.columns]
-
-        # 1. 智慧欄位對照
-        if '型號' in df.columns: df = df.rename(columns={'型號': 'name'})
-        elif '品名' in df.columns: df = df.rename(columns={'品名': 'name'})
-        
-        if '規格' in df.columns: df = df.rename(columns={'規格': 'spec'})
-        
-        if '牌價' in df.columns: df = df.rename(columns={'牌價': 'dealer_price'})
-        elif '經銷價' in df.columns: df = df.rename(columns={'經銷價': 'dealer_price'})
-        elif '單價' in df.columns: df = df.rename(columns={'單價': 'dealer_price'})
-
-        # 2. 檢查必要欄位
-        required_cols = ["name", "dealer_price"]
-        if not all(col in df.columns for col in required_cols):
-            return False, "Excel 缺少必要欄位 (需包含: 型號/品名, 牌價/經銷價)"
-            
-        # 3. 補上選填欄位
-        if "spec" not in df.columns: df["spec"] = ""
-            
-        # 4. 資料清理 (處理 NaN 空值)
-        df['name'] = df['name'].astype(str)
-        df['spec'] = df['spec'].fillna("").astype(str)
-        df['dealer_price'] = pd.to_numeric(df['dealer_price'], errors='coerce').fillna(0)
-
-        # 5. 轉換並寫入
-        records = df[["name", "spec", "dealer_price"]].to_dict(orient="records")
-        supabase.table("products").insert(records).execute()
-        
-        return True, f"成功匯入 {len(records)} 筆產品！"
-        
+    if not backend: return 0, ["資料庫未連線"], "匯入失敗"
+
+    imported, processed, errors = 0, 0, []
+    started = time.perf_counter()
+    try:
+        for start_line, records in importer.iter_product_chunks(source, filename, chunk_size=batch_size):
+            try:
+                _call(backend.upsert_products, records)
+                imported += len(records)
+            except Exception as e:
+                errors.append(f"第 {start_line} 列起 {len(records)} 筆: {str(e)}")
+            processed += len(records)
+            if on_progress:
+                elapsed = time.perf_counter() - started
+                on_progress(processed, processed / elapsed if elapsed else 0)
+    except ValueError as e:
+        return 0, [str(e)], "匯入失敗"
     except Exception as e:
-        return False, f"匯入錯誤: {str(e)}"
+        errors.append(f"讀取中斷: {str(e)}")
+    finally:
+        if imported: invalidate_catalog()
+
+    elapsed = time.perf_counter() - started
+    rate = imported / elapsed if elapsed else 0
+    return imported, errors, f"成功匯入 {imported} 筆產品 ({elapsed:.1f} 秒，{rate:,.0f} 筆/秒)"
 
 # --- 報價單存檔與編號 ---
-def generate_quote_no():
-    if not supabase: return "OFFLINE-001"
-    current_ym = datetime.now().strftime("%Y%m")
-    prefix = f"QUO-{current_ym}-"
-    try:
-        response = supabase.table("quotations").select("quote_no").ilike("quote_no", f"{prefix}%").order("quote_no", desc=True).limit(1).execute()
-        if response.data:
-            last_no = response.data[0]['quote_no']
-            seq = int(last_no.split("-")[-1]) + 1
-        else:
-            seq = 1
-        return f"{prefix}{seq:03d}"
-    except:
-        return f"{prefix}000"
-
-def save_quotation(client_id, date, items, total_amount):
-    if not supabase: return False, "資料庫未連線"
-    new_quote_no = generate_quote_no()
-    try:
-        # 1. 寫入主表
-        main_data = {"quote_no": new_quote_no, "client_id": client_id, "quote_date": str(date)}
-        res_main = supabase.table("quotations").insert(main_data).execute()
-        if not res_main.data: return False, "主表寫入失敗"
-        
-        quotation_id = res_main.data[0]['id']
-        
-        # 2. 寫入明細表
-        items_data = []
-        for item in items:
-            items_data.append({
-                "quotation_id": quotation_id,
-                "product_name": item['product'],
-                "quantity": item['qty'],
-                "unit_price": item['price'],
-                "dealer_price_snapshot": 0 
-            })
-        supabase.table("quotation_items").insert(items_data).execute()
-        return True, new_quote_no
+@metrics.instrument("db.generate_quote_no")
+def generate_quote_no(period=None):
+    """
+    向資料庫配發下一個單號 QUO-YYYYMM-NNN (見 sql/003_quote_sequences.sql)
+    單一呼叫、原子遞增，多人同時存檔也不會重複；失敗時拋出例外，不回傳假單號
+    """
+    if not backend: raise RuntimeError("資料庫未連線")
+    return _call(backend.next_quote_no, period or datetime.now().strftime("%Y%m"), retry=False)
+
+@metrics.instrument("db.save_quotation")
+def save_quotation(client_id, date, items, total_amount, period=None):
+    """
+    一次呼叫完成存檔 (見 sql/004_save_quotation.sql)：取號 + 主表 + 明細 + 統計在同一交易
+    經銷價快照取自產品目錄快取，不另外查詢；period 為取號月份 (YYYYMM)，預設本月
+    """
+    if not backend: return False, "資料庫未連線"
+    try:
+        dealer_prices = {p['name']: p.get('dealer_price') or 0 for p in get_products()}
+        items_data = [{
+            "product_name": item['product'],
+            "quantity": item['qty'],
+            "unit_price": item['price'],
+            "dealer_price_snapshot": dealer_prices.get(item['product'], 0)
+        } for item in items]
+
+        # 不重試：逾時當下可能已經寫入，重送會變成兩張單
+        period = period or datetime.now().strftime("%Y%m")
+        quote_no = _call(backend.save_quotation, client_id, date, period, items_data, retry=False)
+        if _history: _history.mark_stale()
+        invalidate_item_history([i['product_name'] for i in items_data])
+        return True, quote_no
     except Exception as e:
         return False, str(e)
 
+# --- 報價單讀取 (批次匯出 / 重新下載) ---
+@metrics.instrument("db.fetch_quotations")
+def fetch_quotations(start_date=None, end_date=None, client_id=None):
+    """
+    依日期區間 / 客戶取回完整報價單 (主表一次查詢 + 明細批次查詢)
+    回傳 create_quotation_pdf 用的格式: [{id, date, client_name, items: [{name, price, qty}]}, ...]
+    """
+    if not backend: return []
+    try:
+        return _assemble_quotations(_call(backend.list_quotations, start_date, end_date, client_id))
+    except Exception as e:
+        print(f"讀取報價單失敗: {e}")
+        return []
+
+@metrics.instrument("db.fetch_quotation")
+def fetch_quotation(quote_no):
+    """依單號取回單張報價單 (格式同 fetch_quotations)，查無資料回傳 None"""
+    if not backend: return None
+    try:
+        quotes = _assemble_quotations(_call(backend.list_quotations, None, None, None, quote_no))
+        return quotes[0] if quotes else None
+    except Exception as e:
+        print(f"讀取報價單失敗: {e}")
+        return None
+
+def _assemble_quotations(headers):
+    if not headers: return []
+    items_by_quote = {}
+    # 明細只存型號，規格取目前產品目錄的內容 (PDF 的品名 / 規格欄)
+    specs = get_product_index().specs
+    for item in _call(backend.list_quotation_items, [h['id'] for h in headers]):
+        items_by_quote.setdefault(item['quotation_id'], []).append({
+            "name": item['product_name'], "spec": specs.get(item['product_name'], ""),
+            "price": item['unit_price'], "qty": item['quantity'],
+        })
+    return [{
+        "id": h['quote_no'],
+        "date": str(h['quote_date']),
+        "client_name": h.get('client_name') or '未知客戶',
+        "items": items_by_quote.get(h['id'], [])
+    } for h in headers]
+
 # --- 歷史查詢 ---
-def search_product_history(product_keyword, offset=0, limit=10):
-    if not supabase: return [], False
-    try:
-        response = supabase.table("quotation_items")\
-            .select("*, quotations(quote_date, quote_no, clients(name))")\
-            .ilike("product_name", f"%{product_keyword}%")\
-            .order("id", desc=True)\
-            .range(offset, offset + limit - 1)\
-            .execute()
-            
-        data = response.data
-        formatted_data = []
-        for item in data:
-            q_data = item.get('quotations') or {}
-            c_data = q_data.get('clients') or {}
-            formatted_data.append({
-                "日期": q_data.get('quote_date', 'N/A'),
-                "單號": q_data.get('quote_no', 'N/A'),
-                "客戶": c_data.get('name', '未知客戶'),
-                "產品": item['product_name'],
-                "數量": item['quantity'],
-                "單價": item['unit_price'],
-                "經銷價": item.get('dealer_price_snapshot', 0)
-            })
-        has_more = len(data) == limit
-        return formatted_data, has_more
+# 本機歷史快照 (見 modules/history_snapshot.py)：查詢在 process 內完成，資料庫只做增量同步
+# HISTORY_SNAPSHOT=off 或未安裝 pyarrow 時直接查資料庫
+_history = None
+
+def _reset_history():
+    global _history
+    _history = None
+
+def history():
+    """回傳已同步的 HistorySnapshot；停用或尚無資料可用時回傳 None"""
+    global _history
+    if not backend or not history_snapshot.HAS_PYARROW: return None
+    if str(_setting("HISTORY_SNAPSHOT", "on")).lower() == "off": return None
+    if _history is None:
+        directory = None
+        if backend.location:
+            source = hashlib.sha256(f"{backend.name}:{backend.location}".encode("utf-8")).hexdigest()[:16]
+            directory = os.path.join(history_snapshot.SNAPSHOT_DIR, source)
+        _history = history_snapshot.HistorySnapshot(
+            lambda after_id, limit: _call(backend.list_history_since, after_id, limit), directory)
+    if not _history.ready:
+        # 第一次同步 (重新啟動後可能要下載整份歷史) 在背景進行，完成前直接查資料庫
+        _history.start_background_sync()
+        return None
+    try:
+        _history.sync()
+    except Exception as e:
+        # 同步失敗時沿用既有快照 (資料可能稍舊)
+        print(f"歷史快照同步失敗: {e}")
+        if _history.frame is None or _history.frame.empty: return None
+    return _history
+
+def wait_history(timeout=None):
+    """等背景的第一次歷史同步完成 (benchmark 用)；回傳快照是否已可查詢"""
+    return bool(_history and _history.wait(timeout))
+
+@metrics.instrument("db.search_product_history")
+def search_product_history(product_keyword, before_id=None, limit=10):
+    """
+    依產品關鍵字查詢報價明細，id 由新到舊
+    分頁用 keyset 游標：傳入上一頁回傳的 next_cursor 當 before_id
+    回傳 (資料, next_cursor)；next_cursor 為 None 表示沒有更多
+    """
+    if not backend: return [], None
+    try:
+        # 多抓一筆判斷是否還有下一頁
+        snapshot = history()
+        if snapshot:
+            rows = snapshot.search(product_keyword, before_id, limit + 1)
+        else:
+            rows = _call(backend.search_history, product_keyword, before_id, limit + 1)
+
+        data = rows[:limit]
+        formatted_data = [_format_history(item) for item in data]
+        next_cursor = data[-1]['id'] if len(rows) > limit else None
+        return formatted_data, next_cursor
     except Exception as e:
         # st.error(f"查詢錯誤: {e}")
-        return [], False
+        return [], None
 
-def fetch_history_items(client_name, product_name, offset=0, limit=5):
-    # 簡易版歷史查詢 (給 Modal 用)
-    return search_product_history(product_name, offset, limit)
+def _format_history(item):
+    return {
+        "id": item['id'],
+        "日期": item.get('quote_date') or 'N/A',
+        "單號": item.get('quote_no') or 'N/A',
+        "客戶": item.get('client_name') or '未知客戶',
+        "產品": item['product_name'],
+        "數量": item['quantity'],
+        "單價": item['unit_price'],
+        "經銷價": item.get('dealer_price_snapshot') or 0
+    }
+
+# 報價明細的「📜 歷史」：整張報價單的品項整批查詢 (見 sql/006_history_for_products.sql)，
+# 結果依 (客戶, 產品) 快取在 process 內，開啟任何一列的歷史都不必再查資料庫
+HISTORY_PREFETCH_LIMIT = 5
+HISTORY_CACHE_TTL = 300    # 秒；存檔時會清掉相關品項
+HISTORY_CACHE_MAX = 5000   # 最多快取幾組 (客戶, 產品)，超過時淘汰最久沒用的
+HISTORY_MAX_ROWS = 1000    # 單次回應的筆數上限 (PostgREST max-rows，Supabase 預設 1000)
+# 每個品項最多回傳 2 × HISTORY_PREFETCH_LIMIT 列 (客戶 + 全部)，每批品項數要讓回應不超過上限
+HISTORY_PREFETCH_BATCH = HISTORY_MAX_ROWS // (2 * HISTORY_PREFETCH_LIMIT)
+
+_item_history = OrderedDict()   # (client_id, 產品) -> (抓取時間, {"client": [...], "global": [...]})
+_item_history_lock = threading.Lock()
+
+def _cached_history(client_id, product_name, now):
+    entry = _item_history.get((client_id, product_name))
+    if entry is None or now - entry[0] > HISTORY_CACHE_TTL: return None
+    _item_history.move_to_end((client_id, product_name))
+    return entry[1]
+
+def invalidate_item_history(product_names=None):
+    """清除品項歷史快取；product_names 為 None 時全部清除"""
+    with _item_history_lock:
+        if product_names is None:
+            _item_history.clear()
+            return
+        names = set(product_names)
+        for key in [k for k in _item_history if k[1] in names]:
+            del _item_history[key]
+
+@metrics.instrument("db.prefetch_history")
+def prefetch_history(client_id, product_names):
+    """
+    快取中沒有 (或已過期) 的品項整批查詢補齊 (每 HISTORY_PREFETCH_BATCH 個品項一次)，回傳查詢的品項數
+    查詢失敗的批次不寫入快取，開啟歷史時會再單獨查一次
+    """
+    if not backend or client_id is None: return 0
+    now = time.time()
+    with _item_history_lock:
+        missing = [p for p in dict.fromkeys(product_names) if _cached_history(client_id, p, now) is None]
+    fetched = 0
+    for start in range(0, len(missing), HISTORY_PREFETCH_BATCH):
+        batch = missing[start:start + HISTORY_PREFETCH_BATCH]
+        try:
+            rows = _call(backend.history_for_products, client_id, batch, HISTORY_PREFETCH_LIMIT)
+        except Exception as e:
+            print(f"讀取品項歷史失敗: {e}")
+            continue
+        _store_history(client_id, batch, rows, now)
+        fetched += len(batch)
+    return fetched
+
+def _store_history(client_id, batch, rows, now):
+    grouped = {p: {"client": [], "global": []} for p in batch}
+    for row in rows:
+        target = grouped.get(row['product_name'])
+        if target is not None:
+            target[row['scope']].append(_format_history(row))
+    # 回應達到筆數上限時可能被截斷：沒出現在結果裡的品項不能當成「查無資料」快取
+    if len(rows) >= HISTORY_MAX_ROWS:
+        grouped = {p: h for p, h in grouped.items() if h["client"] or h["global"]}
+    with _item_history_lock:
+        for product_name, history in grouped.items():
+            _item_history[(client_id, product_name)] = (now, history)
+            _item_history.move_to_end((client_id, product_name))
+        while len(_item_history) > HISTORY_CACHE_MAX:
+            _item_history.popitem(last=False)
+
+@metrics.instrument("db.fetch_history_items", rows=lambda args, kwargs, result: len(result["client"]) + len(result["global"]))
+def fetch_history_items(client_id, product_name):
+    """
+    回傳 {"client": 此客戶最近報價, "global": 所有客戶最近報價}
+    通常已由 prefetch_history 整批抓好；快取沒有時單獨查這一個品項
+    """
+    with _item_history_lock:
+        history = _cached_history(client_id, product_name, time.time())
+    if history is None:
+        prefetch_history(client_id, [product_name])
+        with _item_history_lock:
+            history = _cached_history(client_id, product_name, time.time())
+    return history or {"client": [], "global": []}
+
+# 統計分析用：關鍵字的全部明細。有本機快照時直接在記憶體篩選；
+# 沒有時分頁向資料庫取回，最多 ANALYTICS_MAX_ROWS 筆 (最新的優先)
+ANALYTICS_MAX_ROWS = 20000
+ANALYTICS_PAGE_SIZE = 1000
+ANALYTICS_TTL = 60         # 秒
+
+@st.cache_data(ttl=ANALYTICS_TTL, max_entries=16, show_spinner=False)
+def _fetch_history_rows(keyword):
+    rows, before_id = [], None
+    while len(rows) < ANALYTICS_MAX_ROWS:
+        page = _call(backend.search_history, keyword, before_id, ANALYTICS_PAGE_SIZE)
+        rows.extend(page)
+        if len(page) < ANALYTICS_PAGE_SIZE: break
+        before_id = page[-1]['id']
+    return rows
+
+@metrics.instrument("db.fetch_history_frame", rows=lambda args, kwargs, result: len(result))
+def fetch_history_frame(keyword):
+    """回傳 DataFrame (欄位同 StorageBackend.search_history)，給 modules/analytics.py 使用"""
+    if not backend: return history_snapshot.to_frame([])
+    snapshot = history()
+    if snapshot: return snapshot.matching(keyword)
+    try:
+        return history_snapshot.to_frame(_fetch_history_rows(keyword))
+    except Exception as e:
+        print(f"讀取歷史明細失敗: {e}")
+        return history_snapshot.to_frame([])
 
 # --- 儀表板統計 ---
+# 總數由資料庫端 rollup 維護 (見 sql/001_dashboard_stats.sql)，
+# 讀取成本固定為一列；超過 STATS_RECONCILE_INTERVAL 秒會自動重新彙總對帳。
+STATS_RECONCILE_INTERVAL = 24 * 60 * 60
+
+@metrics.instrument("db.get_dashboard_stats")
 def get_dashboard_stats():
-    if not supabase: return 0, 0
-    try:
-        res_count = supabase.table("quotations").select("id", count="exact").execute()
-        total_quotes = res_count.count
-        
-        # 簡易計算總金額 (僅供 MVP 使用)
-        res_items = supabase.table("quotation_items").select("unit_price, quantity").execute()
-        total_amount = sum([item['unit_price'] * item['quantity'] for item in res_items.data])
-        
-        return total_quotes, total_amount
-    except:
-        return 0, 0
\ No newline at end of file
+    if not backend: return 0, 0
+    try:
+        return _remember("stats", _call(backend.dashboard_stats, STATS_RECONCILE_INTERVAL))
+    except Exception as e:
+        print(f"讀取統計失敗: {e}")
+        return _last_good.get("stats", (0, 0))
+
+@metrics.instrument("db.reconcile_dashboard_stats")
+def reconcile_dashboard_stats():
+    """強制重新彙總 (資料被手動修改後使用)"""
+    if not backend: return 0, 0
+    try:
+        return _remember("stats", _call(backend.reconcile_stats))
+    except Exception as e:
+        print(f"統計對帳失敗: {e}")
+        return 0, 0
@@ -0,0 +1,201 @@
+import glob
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401  pandas 讀寫 parquet 用
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+# --- 本機歷史快照 ---
+# quotation_items + quotations + clients 攤平後存成 parquet，依 id 增量同步。
+# 併發存檔時較小的 id 可能比較大的 id 晚提交，所以每次同步從 (已同步的最大 id - SYNC_OVERLAP) 開始重抓，
+# 依 id 去重，只有之前沒看過的 id 才寫入。
+# 歷史查詢在 process 內用 pandas 完成，不必每頁都往返資料庫。
+# 明細存檔後不會再修改，所以只追新增即可；有疑慮時 rebuild() 整份重抓。
+# 第一次同步 (重新啟動後可能是整份歷史) 用 start_background_sync() 放到背景執行緒，完成前由呼叫端直接查資料庫。
+# 每次同步寫一個 part 檔，超過 MAX_PARTS 個就合併成一個。
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SNAPSHOT_DIR = os.path.join(BASE_DIR, ".cache", "history")
+SYNC_INTERVAL = 60          # 秒；存檔後會標記過期，下次查詢立即同步
+SYNC_PAGE_SIZE = 1000      # 不超過 PostgREST max-rows (Supabase 預設 1000)，超過的部分會被伺服器默默截掉
+SYNC_OVERLAP = 500         # 每次同步重抓最後這麼多個 id 範圍內的明細，補上晚提交的較小 id
+MAX_PARTS = 16
+
+COLUMNS = ["id", "product_name", "quantity", "unit_price", "dealer_price_snapshot",
+           "quote_date", "quote_no", "client_name"]
+
+
+def to_frame(rows):
+    df = pd.DataFrame(rows, columns=COLUMNS)
+    df = df.fillna({"product_name": "", "quantity": 0, "unit_price": 0, "dealer_price_snapshot": 0})
+    return df.astype({
+        "id": "int64",
+        "product_name": "string",
+        "quantity": "int64",
+        "unit_price": "float64",
+        "dealer_price_snapshot": "float64",
+        "quote_date": "string",
+        "quote_no": "string",
+        "client_name": "string",
+    })
+
+
+def _empty():
+    return to_frame([]).astype({"product_name": "category"})
+
+
+class HistorySnapshot:
+    def __init__(self, fetch_since, directory=None, sync_interval=SYNC_INTERVAL):
+        """
+        fetch_since(after_id, limit): 回傳 id > after_id 的明細 (StorageBackend.list_history_since)
+        directory 為 None 時只放在記憶體，不寫 parquet
+        """
+        self.fetch_since = fetch_since
+        self.directory = directory
+        self.sync_interval = sync_interval
+        self.frame = None          # 依 id 由小到大；product_name 為 category
+        self.max_id = 0
+        self.synced_at = 0.0
+        self.ready = False         # 已完成一次同步，可以直接查詢
+        self._lock = threading.Lock()
+        self._thread = None
+        self._thread_lock = threading.Lock()   # 與 _lock 分開：背景同步整段持有 _lock，不能讓查詢卡在這裡
+
+    # --- 同步 ---
+    def sync(self, force=False):
+        """抓取新明細並回傳新增筆數；距上次同步未滿 sync_interval 秒則略過"""
+        with self._lock:
+            if self.frame is None:
+                self._load()
+            if not force and time.time() - self.synced_at < self.sync_interval:
+                return 0
+
+            after = max(0, self.max_id - SYNC_OVERLAP)
+            ids = self.frame["id"].to_numpy()
+            known = ids[np.searchsorted(ids, after, side="right"):]
+            parts = []
+            try:
+                while True:
+                    rows = self.fetch_since(after, SYNC_PAGE_SIZE)
+                    if not rows: break
+                    part = to_frame(rows)
+                    after = int(part["id"].iloc[-1])
+                    # 伺服器可能回傳比 SYNC_PAGE_SIZE 少的筆數 (max-rows 上限)，抓到空頁才算同步完
+                    part = part[~part["id"].isin(known)]
+                    if part.empty: continue
+                    self._write_part(part)
+                    parts.append(part)
+            finally:
+                # 中途失敗時已抓到的部分照樣併入
+                if parts: self._append(parts)
+            self.synced_at = time.time()
+            self.ready = True
+            if self.directory and len(self._part_files()) > MAX_PARTS:
+                self._compact()
+            return sum(len(p) for p in parts)
+
+    def start_background_sync(self):
+        """在背景執行緒同步 (第一次同步用)；已有同步執行緒在跑時不重複啟動"""
+        with self._thread_lock:
+            if self._thread and self._thread.is_alive(): return
+            self._thread = threading.Thread(target=self._background_sync, name="history-sync", daemon=True)
+            self._thread.start()
+
+    def _background_sync(self):
+        try:
+            self.sync(force=True)
+        except Exception as e:
+            print(f"歷史快照背景同步失敗: {e}")
+
+    def wait(self, timeout=None):
+        """等背景同步結束；回傳是否已可查詢"""
+        thread = self._thread
+        if thread: thread.join(timeout)
+        return self.ready
+
+    def mark_stale(self):
+        self.synced_at = 0.0
+
+    def rebuild(self):
+        """丟掉快照整份重抓"""
+        with self._lock:
+            for path in self._part_files():
+                os.remove(path)
+            self.frame = _empty()
+            self.max_id = 0
+        self.mark_stale()
+        return self.sync(force=True)
+
+    # --- 查詢 ---
+    def _mask(self, frame, keyword):
+        # 只對不重複的產品名稱比對字串，再用 category code 展開成整欄
+        names = frame["product_name"].cat.categories
+        hit = np.asarray(names.str.contains(keyword or "", case=False, regex=False), dtype=bool)
+        return hit[frame["product_name"].cat.codes.to_numpy()]
+
+    def search(self, keyword, before_id=None, limit=10):
+        """同 StorageBackend.search_history：產品名稱包含 keyword，id 由新到舊、id < before_id"""
+        frame = self.frame
+        if frame is None or frame.empty: return []
+        mask = self._mask(frame, keyword)
+        if before_id is not None:
+            mask &= frame["id"].to_numpy() < before_id
+        idx = np.flatnonzero(mask)[-limit:][::-1]
+        return _records(frame.iloc[idx])
+
+    def matching(self, keyword):
+        """產品名稱包含 keyword 的全部明細 (DataFrame，id 由新到舊)，給統計分析用"""
+        frame = self.frame
+        if frame is None or frame.empty: return to_frame([])
+        return frame[self._mask(frame, keyword)].iloc[::-1].astype({"product_name": "string"})
+
+    # --- 檔案 ---
+    def _part_files(self):
+        if not self.directory: return []
+        return sorted(glob.glob(os.path.join(self.directory, "part-*.parquet")))
+
+    def _load(self):
+        self.frame, self.max_id = _empty(), 0
+        try:
+            frames = [pd.read_parquet(path) for path in self._part_files()]
+        except Exception as e:
+            # 檔案損毀就整份丟掉，之後從頭同步
+            print(f"歷史快照讀取失敗，將重新同步: {e}")
+            for path in self._part_files():
+                os.remove(path)
+            return
+        if frames: self._append(frames)
+
+    def _append(self, parts):
+        frames = [] if self.frame is None or self.frame.empty else [self.frame.astype({"product_name": "string"})]
+        frame = pd.concat(frames + parts, ignore_index=True)
+        frame = frame.drop_duplicates("id", keep="last").sort_values("id", ignore_index=True)
+        frame["product_name"] = frame["product_name"].astype("category")
+        self.frame = frame
+        self.max_id = int(frame["id"].iloc[-1]) if len(frame) else 0
+
+    def _write_part(self, part):
+        if not self.directory: return None
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"part-{part['id'].iloc[0]:012d}-{part['id'].iloc[-1]:012d}.parquet")
+        tmp = f"{path}.{os.getpid()}.tmp"
+        part.to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+        return path
+
+    def _compact(self):
+        old = self._part_files()
+        merged = self._write_part(self.frame.astype({"product_name": "string"}))
+        for path in old:
+            if path != merged: os.remove(path)
+
+
+def _records(df):
+    # 轉回 Python 原生型別 (NA -> None)，游標 (id) 可以直接再傳給資料庫
+    return [{k: (None if v is pd.NA else v) for k, v in row.items()} for row in df.to_dict("records")]
@@ -0,0 +1,124 @@
+import csv
+import io
+import pandas as pd
+from openpyxl import load_workbook
+
+# --- 產品價目表串流讀取 (Excel / CSV) ---
+# 逐列讀取，不把整份檔案展開成 DataFrame，記憶體用量與檔案大小無關。
+
+# 欄位對照：依序比對，先找到的優先
+COLUMN_ALIASES = {
+    "name": ["型號", "品名"],
+    "spec": ["規格"],
+    "dealer_price": ["牌價", "經銷價", "單價"],
+}
+REQUIRED_COLUMNS = ["name", "dealer_price"]
+
+def iter_raw_rows(source, filename=""):
+    """逐列產出 tuple，第一列為標題列"""
+    if isinstance(source, pd.DataFrame):
+        yield tuple(source.columns)
+        yield from source.itertuples(index=False, name=None)
+        return
+
+    if hasattr(source, "seek"): source.seek(0)
+
+    if str(filename).lower().endswith(".csv"):
+        text = io.TextIOWrapper(source, encoding="utf-8-sig", newline="")
+        try:
+            yield from (tuple(r) for r in csv.reader(text))
+        finally:
+            text.detach()
+        return
+
+    # openpyxl 唯讀模式：逐列解析 XML，不會整張表載入記憶體
+    wb = load_workbook(source, read_only=True, data_only=True)
+    try:
+        yield from wb.active.iter_rows(values_only=True)
+    finally:
+        wb.close()
+
+def estimate_rows(source, filename=""):
+    """估計資料列數 (進度條用)，無法得知時回傳 None"""
+    if isinstance(source, pd.DataFrame): return len(source)
+    if str(filename).lower().endswith(".csv"): return None
+    try:
+        source.seek(0)
+        wb = load_workbook(source, read_only=True)
+        total = wb.active.max_row
+        wb.close()
+        return max(total - 1, 0) if total else None
+    except Exception:
+        return None
+
+def map_columns(header):
+    """標題列 -> {欄位: index}，缺少必要欄位時拋出 ValueError"""
+    header = [str(c).strip() if c is not None else "" for c in header]
+    mapping = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        for alias in [field] + aliases:
+            if alias in header:
+                mapping[field] = header.index(alias)
+                break
+    if not all(col in mapping for col in REQUIRED_COLUMNS):
+        raise ValueError("Excel 缺少必要欄位 (需包含: 型號/品名, 牌價/經銷價)")
+    return mapping
+
+def normalize_row(row, mapping):
+    """單列清理，型號空白回傳 None"""
+    def cell(field):
+        idx = mapping.get(field)
+        if idx is None or idx >= len(row): return None
+        val = row[idx]
+        return None if val is None or (isinstance(val, float) and pd.isna(val)) else val
+
+    name = cell("name")
+    name = str(name).strip() if name is not None else ""
+    if not name: return None
+
+    spec = cell("spec")
+    try:
+        price = float(str(cell("dealer_price")).replace(",", ""))
+        if pd.isna(price): price = 0
+    except (TypeError, ValueError):
+        price = 0
+
+    return {"name": name, "spec": str(spec).strip() if spec is not None else "", "dealer_price": price}
+
+def iter_product_chunks(source, filename="", chunk_size=1000):
+    """產出 (起始列號, [records])；同一批內型號重複時以最後一筆為準"""
+    rows = iter_raw_rows(source, filename)
+    try:
+        header = next(rows)
+    except StopIteration:
+        raise ValueError("檔案沒有內容")
+    mapping = map_columns(header)
+
+    chunk, start = {}, 2   # Excel 列號，標題列為第 1 列
+    line_no = 1
+    for row in rows:
+        line_no += 1
+        record = normalize_row(row, mapping)
+        if record is None: continue
+        chunk[record["name"]] = record
+        if len(chunk) >= chunk_size:
+            yield start, list(chunk.values())
+            chunk, start = {}, line_no + 1
+    if chunk:
+        yield start, list(chunk.values())
+
+def read_preview(source, filename="", n=5):
+    """只讀前 n 列做預覽"""
+    rows = iter_raw_rows(source, filename)
+    try:
+        header = next(rows)
+    except StopIteration:
+        return pd.DataFrame()
+    data = []
+    header = [str(c).strip() if c is not None else "" for c in header]
+    for row in rows:
+        row = tuple(row)[:len(header)]
+        data.append(row + (None,) * (len(header) - len(row)))
+        if len(data) >= n: break
+    rows.close()
+    return pd.DataFrame(data, columns=header)
@@ -0,0 +1,134 @@
+import csv
+import math
+import pandas as pd
+from modules import pricing
+
+# --- 報價明細 ---
+# 明細以 DataFrame 保存 (欄位: product, price, qty)，給 st.data_editor 編輯。
+# 新增 / 刪除 / 貼上 / 批次改數量都是整批套用，不逐列重畫元件。
+
+COLUMNS = ["product", "price", "qty"]
+LOW_RATIO = 0.6            # 單價低於經銷價此比例時提醒
+MAX_QTY = 1_000_000        # 單列數量上限；數量一律四捨五入成整數並限制在 1 ~ MAX_QTY (轉 int64 之前)
+
+
+def empty():
+    return pd.DataFrame({
+        "product": pd.Series(dtype="object"),
+        "price": pd.Series(dtype="float64"),
+        "qty": pd.Series(dtype="int64"),
+    })
+
+
+def _clean(df):
+    df = df.reindex(columns=COLUMNS)
+    df["product"] = df["product"].astype("object")
+    df["price"] = pd.to_numeric(df["price"], errors="coerce").fillna(0).astype("float64")
+    qty = pd.to_numeric(df["qty"], errors="coerce").astype("float64")
+    df["qty"] = qty.where(qty.abs() < math.inf).fillna(1).round().clip(1, MAX_QTY).astype("int64")
+    return df.reset_index(drop=True)
+
+
+def clip_qty(value):
+    """單一數量：四捨五入成整數並限制在 1 ~ MAX_QTY"""
+    return int(min(max(round(value), 1), MAX_QTY))
+
+
+def append(df, new_rows):
+    """new_rows: [{product, price, qty}, ...] 或 DataFrame"""
+    new = new_rows if isinstance(new_rows, pd.DataFrame) else pd.DataFrame(new_rows, columns=COLUMNS)
+    if new.empty: return df
+    if df.empty: return _clean(new)
+    return _clean(pd.concat([df, new], ignore_index=True))
+
+
+def apply_delta(df, delta):
+    """
+    把 st.data_editor 的編輯狀態 (session_state[key]) 套用到原始 DataFrame
+    delta: {"edited_rows": {列: {欄: 值}}, "added_rows": [{欄: 值}], "deleted_rows": [列]}
+    """
+    if not delta: return df
+    # 數量先以 float 套用編輯 (空白、過大的值放得進去)，_clean 再修正成整數
+    df = df.astype({"qty": "float64"})
+    for pos, changes in (delta.get("edited_rows") or {}).items():
+        for column, value in changes.items():
+            if column in COLUMNS:
+                df.loc[df.index[int(pos)], column] = value
+    deleted = [df.index[int(pos)] for pos in (delta.get("deleted_rows") or [])]
+    df = df.drop(index=deleted)
+    added = [{c: row.get(c) for c in COLUMNS} for row in (delta.get("added_rows") or [])]
+    return append(_clean(df), added) if added else _clean(df)
+
+
+def set_all_qty(df, qty):
+    df = df.copy()
+    df["qty"] = clip_qty(qty)
+    return df
+
+
+def apply_rule(df, index, rule, series_discounts=None, client_discount=1.0):
+    """
+    以定價規則整批重算單價 (modules/pricing.py)，例如 dealer_price * 0.65
+    型號照常對照目錄取經銷價；算不出有效價格的列維持原單價
+    """
+    df = _clean(df)
+    canonical = index.resolve_many(df["product"])
+    frame = df.assign(product=canonical.fillna(df["product"]),
+                      dealer_price=canonical.map(index.dealer_prices).fillna(0).astype("float64"))
+    df["price"] = pricing.price_frame(frame, rule, series_discounts, client_discount)
+    return df
+
+
+def parse_pasted(text, index):
+    """
+    解析從 Excel 複製的多列文字：每列 型號 [數量] [單價]，以 Tab 或逗號分隔
+    數量預設 1，負數、小數、過大的數量依 clip_qty 修正；單價預設 0
+    第一列若數量欄不是數字且型號不在目錄中，視為標題列略過
+    """
+    rows = []
+    for n, line in enumerate(text.splitlines()):
+        if not line.strip(): continue
+        cells = [c.strip() for c in (line.split("\t") if "\t" in line else next(csv.reader([line])))]
+        product = cells[0]
+        qty = _number(cells[1]) if len(cells) > 1 else 1
+        price = _number(cells[2]) if len(cells) > 2 else 0
+        if n == 0 and qty is None and index.resolve(product) is None:
+            continue
+        rows.append({"product": index.resolve(product) or product,
+                     "price": price or 0, "qty": clip_qty(qty) if qty is not None else 1})
+    return pd.DataFrame(rows, columns=COLUMNS)
+
+
+def _number(text):
+    # nan / inf 視同非數字，改用預設值
+    try:
+        value = float(str(text).replace(",", "").replace("$", ""))
+    except ValueError:
+        return None
+    return value if math.isfinite(value) else None
+
+
+def normalize(df, index):
+    """
+    對照產品索引 (整欄運算)：型號改成目錄正式名稱，補上經銷價與折數
+    空白型號的列會被略過；回傳欄位 product, price, qty, known, dealer_price, ratio, subtotal
+    """
+    df = _clean(df)
+    entered = df["product"].fillna("").astype(str).str.strip()
+    df = df[entered != ""].copy()
+    entered = entered[entered != ""]
+
+    canonical = index.resolve_many(entered)
+    df["known"] = canonical.notna()
+    df["product"] = canonical.fillna(entered)
+    df["dealer_price"] = df["product"].map(index.dealer_prices).fillna(0).astype("float64")
+    # 單價或經銷價未填時不算折數
+    df["ratio"] = df["price"].where(df["price"] > 0) / df["dealer_price"].where(df["dealer_price"] > 0)
+    df["subtotal"] = df["price"] * df["qty"]
+    return df.reset_index(drop=True)
+
+
+def to_rows(lines):
+    """轉成 database.save_quotation 的 items 格式"""
+    return [{"product": p, "price": float(pr), "qty": int(q)}
+            for p, pr, q in zip(lines["product"], lines["price"], lines["qty"])]
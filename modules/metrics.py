@@ -0,0 +1,198 @@
+import functools
+import os
+import sys
+import threading
+import time
+
+# --- 熱點量測：呼叫次數 / 延遲分佈 / 回傳筆數 / 錯誤次數 ---
+# 每個量測點同時記在兩個地方：整個 process (所有使用者) 與目前的 session。
+# 管理員側邊欄可檢視，並可匯出 Prometheus text format。
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PREFIX = "quotation"
+
+
+class Stat:
+    __slots__ = ("calls", "errors", "rows", "latency_sum", "buckets")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+        self.latency_sum = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)   # 最後一格是 +Inf
+
+    def observe(self, seconds, rows, error):
+        self.calls += 1
+        self.errors += bool(error)
+        self.rows += rows
+        self.latency_sum += seconds
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                return
+        self.buckets[-1] += 1
+
+    def quantile(self, q):
+        """由直方圖估計分位數 (取所在桶的上界)"""
+        if not self.calls: return 0.0
+        target, seen = q * self.calls, 0
+        for i, n in enumerate(self.buckets[:-1]):
+            seen += n
+            if seen >= target: return LATENCY_BUCKETS[i]
+        return float("inf")
+
+
+class Registry:
+    def __init__(self):
+        self.stats = {}
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds, rows=0, error=False):
+        with self._lock:
+            stat = self.stats.get(name)
+            if stat is None:
+                stat = self.stats[name] = Stat()
+            stat.observe(seconds, rows, error)
+
+    def reset(self):
+        with self._lock:
+            self.stats = {}
+            self.started_at = time.time()
+
+    def rows(self):
+        """給 st.dataframe 顯示的摘要"""
+        with self._lock:
+            items = sorted(self.stats.items())
+        return [{
+            "函式": name,
+            "次數": s.calls,
+            "錯誤": s.errors,
+            "筆數": s.rows,
+            "平均 ms": round(s.latency_sum / s.calls * 1000, 1) if s.calls else 0,
+            "p95 ms ≤": s.quantile(0.95) * 1000,
+        } for name, s in items]
+
+    def to_prometheus(self, labels=None):
+        labels = dict(labels or {})
+        with self._lock:
+            items = sorted(self.stats.items())
+
+        def fmt(extra):
+            pairs = {**labels, **extra}
+            return "{" + ",".join(f'{k}="{v}"' for k, v in pairs.items()) + "}"
+
+        lines = []
+        for metric, kind, help_text, getter in [
+            ("calls_total", "counter", "呼叫次數", lambda s: s.calls),
+            ("errors_total", "counter", "錯誤次數", lambda s: s.errors),
+            ("rows_total", "counter", "回傳筆數", lambda s: s.rows),
+        ]:
+            lines.append(f"# HELP {PREFIX}_{metric} {help_text}")
+            lines.append(f"# TYPE {PREFIX}_{metric} {kind}")
+            for name, s in items:
+                lines.append(f"{PREFIX}_{metric}{fmt({'function': name})} {getter(s)}")
+
+        lines.append(f"# HELP {PREFIX}_latency_seconds 呼叫延遲")
+        lines.append(f"# TYPE {PREFIX}_latency_seconds histogram")
+        for name, s in items:
+            cumulative = 0
+            for bound, n in zip(LATENCY_BUCKETS + ("+Inf",), s.buckets):
+                cumulative += n
+                lines.append(f"{PREFIX}_latency_seconds_bucket{fmt({'function': name, 'le': bound})} {cumulative}")
+            lines.append(f"{PREFIX}_latency_seconds_sum{fmt({'function': name})} {s.latency_sum:.6f}")
+            lines.append(f"{PREFIX}_latency_seconds_count{fmt({'function': name})} {s.calls}")
+        return "\n".join(lines) + "\n"
+
+
+process_metrics = Registry()
+
+
+def session_metrics():
+    """目前 session 的 Registry；不在 Streamlit script 執行緒內時回傳 None"""
+    # 匯出 worker process 等沒有載入 streamlit 的地方不必為了量測而 import
+    if "streamlit" not in sys.modules: return None
+    try:
+        import streamlit as st
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        if get_script_run_ctx(suppress_warning=True) is None: return None
+        if "_metrics" not in st.session_state:
+            st.session_state["_metrics"] = Registry()
+        return st.session_state["_metrics"]
+    except Exception:
+        return None
+
+
+def record(name, seconds, rows=0, error=False):
+    process_metrics.record(name, seconds, rows, error)
+    registry = session_metrics()
+    if registry is not None:
+        registry.record(name, seconds, rows, error)
+
+
+def _default_rows(result):
+    # list -> 筆數；(list, cursor) -> 第一個元素的筆數
+    if isinstance(result, list): return len(result)
+    if isinstance(result, tuple) and result and isinstance(result[0], list): return len(result[0])
+    return 0
+
+
+def _default_failed(result):
+    # 沿用本專案 (success, msg) 的回傳慣例
+    return result is False or (isinstance(result, tuple) and len(result) == 2 and result[0] is False)
+
+
+def instrument(name, rows=None):
+    """
+    量測裝飾器
+    rows(args, kwargs, result) 可自訂筆數計算；預設以回傳的 list 長度計
+    例外與 (False, msg) 回傳都算一次錯誤
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            result, error = None, True
+            try:
+                result = fn(*args, **kwargs)
+                error = _default_failed(result)
+                return result
+            finally:
+                try:
+                    n = rows(args, kwargs, result) if rows and not error else _default_rows(result)
+                except Exception:
+                    n = 0
+                record(name, time.perf_counter() - started, n, error)
+        return wrapper
+    return decorator
+
+
+# --- 匯出 ---
+def write_prometheus_file(path):
+    """原子寫入 (先寫暫存檔再改名)，給 node_exporter textfile collector 讀取"""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(process_metrics.to_prometheus({"pid": os.getpid()}))
+    os.replace(tmp, path)
+
+
+_exporter = None
+
+
+def start_file_exporter(path, interval=15):
+    """背景執行緒每 interval 秒寫一次 Prometheus 檔案 (每個 process 只啟動一次)"""
+    global _exporter
+    if _exporter is not None: return _exporter
+
+    def loop():
+        while True:
+            try:
+                write_prometheus_file(path)
+            except Exception as e:
+                print(f"寫入量測檔失敗: {e}")
+            time.sleep(interval)
+
+    _exporter = threading.Thread(target=loop, name="metrics-exporter", daemon=True)
+    _exporter.start()
+    return _exporter
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from modules import pdf_gen
+
+# --- PDF 磁碟快取 ---
+# 檔名為內容雜湊 (單號、客戶、日期、品項與規格、大小章、版型版本)，內容相同就不必重畫。
+# 另外記一份 單號 -> 雜湊 的索引，重新下載時不必先查資料庫。
+# 總容量超過 CACHE_MAX_BYTES 時，依最後使用時間 (mtime) 淘汰最舊的檔案。
+
+CACHE_DIR = os.path.join(pdf_gen.BASE_DIR, ".cache", "pdf")
+INDEX_DIR = os.path.join(CACHE_DIR, "index")
+CACHE_MAX_BYTES = 200 * 1024 * 1024
+
+_lock = threading.Lock()
+
+
+def cache_key(data, show_stamp):
+    payload = {
+        "quote_no": data['id'],
+        "client_name": data['client_name'],
+        "date": str(data['date']),
+        "items": [[str(i['name']), str(i.get('spec') or ""), float(i['price'] or 0), int(i['qty'] or 0)]
+                  for i in data['items']],
+        "show_stamp": bool(show_stamp),
+        "template": pdf_gen.TEMPLATE_VERSION,
+    }
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()
+
+
+def _pdf_path(key):
+    return os.path.join(CACHE_DIR, f"{key}.pdf")
+
+
+def _index_path(quote_no, show_stamp):
+    safe = re.sub(r"[^0-9A-Za-z_-]", "_", str(quote_no))
+    return os.path.join(INDEX_DIR, f"{safe}_{int(bool(show_stamp))}_{pdf_gen.TEMPLATE_VERSION}.key")
+
+
+def _atomic_write(path, content=None, writer=None):
+    """先寫暫存檔再改名；writer(f) 可直接串流寫入，不必先把內容放在記憶體"""
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            if writer: writer(f)
+            else: f.write(content)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp): os.remove(tmp)
+        raise
+
+
+def _touch(path):
+    try:
+        os.utime(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def lookup(quote_no, show_stamp=True):
+    """依單號找快取檔案路徑，沒有則回傳 None"""
+    try:
+        with open(_index_path(quote_no, show_stamp), encoding="ascii") as f:
+            path = _pdf_path(f.read().strip())
+    except FileNotFoundError:
+        return None
+    return path if _touch(path) else None
+
+
+def get_or_create(data, show_stamp=True):
+    """回傳 PDF 檔案路徑；快取命中直接回傳，否則產生後寫入快取"""
+    key = cache_key(data, show_stamp)
+    path = _pdf_path(key)
+    if not _touch(path):
+        os.makedirs(INDEX_DIR, exist_ok=True)
+        _atomic_write(path, writer=lambda f: pdf_gen.write_quotation_pdf(data, f, show_stamp))
+        evict()
+    _atomic_write(_index_path(data['id'], show_stamp), key.encode("ascii"))
+    return path
+
+
+def evict(max_bytes=CACHE_MAX_BYTES):
+    """依 mtime 由舊到新刪除，直到總容量低於上限"""
+    with _lock:
+        entries = []
+        for entry in os.scandir(CACHE_DIR):
+            if entry.is_file() and entry.name.endswith(".pdf"):
+                st = entry.stat()
+                entries.append((st.st_mtime, st.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        removed = False
+        for _, size, path in sorted(entries):
+            if total <= max_bytes: break
+            try:
+                os.remove(path)
+                total -= size
+                removed = True
+            except FileNotFoundError:
+                pass
+        if removed: _prune_index()
+
+
+def _prune_index():
+    """移除指向已淘汰檔案的單號索引"""
+    for entry in os.scandir(INDEX_DIR):
+        try:
+            with open(entry.path, encoding="ascii") as f:
+                if not os.path.exists(_pdf_path(f.read().strip())):
+                    os.remove(entry.path)
+        except (FileNotFoundError, IsADirectoryError):
+            pass
+
+
+def get_by_quote_no(quote_no, show_stamp, fetch):
+    """
+    重新下載：先查索引，沒有再用 fetch(quote_no) 從資料庫取回內容重新產生
+    查無報價單回傳 None
+    """
+    path = lookup(quote_no, show_stamp)
+    if path: return path
+    data = fetch(quote_no)
+    if not data: return None
+    return get_or_create(data, show_stamp)
+
+
+def read_by_quote_no(quote_no, show_stamp, fetch):
+    """
+    下載按鈕的延遲讀取 (st.download_button 的 data 傳 callable)：按下下載時才讀檔
+    期間快取被淘汰的話依單號重新產生；查無報價單回傳空 bytes
+    """
+    path = get_by_quote_no(quote_no, show_stamp, fetch)
+    if not path: return b""
+    with open(path, "rb") as f:
+        return f.read()
@@ -3,128 +3,258 @@ from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.lib import colors
+from reportlab.pdfbase import pdfdoc
+from reportlab.lib.utils import ImageReader, _digester
+import copy
 import os
+import threading
+from modules import metrics, pdf_layout
+
+# 版型有任何改變就要更新，PDF 快取 (pdf_cache) 以此區分新舊版本
+TEMPLATE_VERSION = "2026.10-3"
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FONT_DIR = os.path.join(BASE_DIR, "fonts")
+FONT_FILES = {
+    "NotoSans": "NotoSansTC-Regular.ttf",
+    "NotoSans-Bold": "NotoSansTC-Bold.ttf",
+}
+# 字型檔不存在時的備援 (不支援中文，但至少不會當掉)
+FALLBACK_FONTS = {"NotoSans": "Helvetica", "NotoSans-Bold": "Helvetica-Bold"}
+
+ASSET_DIR = os.path.join(BASE_DIR, "assets")
+# 圖片: (檔名, 透明遮罩)；'auto' 表示使用 PNG 的 alpha channel
+ASSET_FILES = {"logo": ("LOGO.png", "auto"), "stamp": ("stamp.png", "auto"), "qrcode": ("qrcode.png", None)}
+
+PAGE_WIDTH, PAGE_HEIGHT = A4
+CONTINUED_TOP = PAGE_HEIGHT - 100     # 續頁明細起點 (頁首下方)
+FOOTER_Y = 130                        # 頁尾公司資訊 / 說明事項基準線
+TABLE_BOTTOM = 175                    # 明細列不低於此線 (頁尾公司資訊在下方)
+TOTALS_HEIGHT = 70                    # 金額統計區塊高度
+TOTALS_BOTTOM = FOOTER_Y + 30         # 金額統計不可壓到說明事項與大小章
+
+# 明細欄位：(標題, x, 寬度, 對齊)
+ITEM_COLUMNS = [
+    ("項次", 30, 40, "center"),
+    ("品名 / 規格", 70, 240, "left"),
+    ("數量", 310, 50, "right"),
+    ("單價", 360, 90, "right"),
+    ("金額", 450, PAGE_WIDTH - 30 - 450, "right"),
+]
+
+_fonts = None
+_font_lock = threading.Lock()
+_assets = None
+_asset_lock = threading.Lock()
 
 # 註冊字型 (解決中文亂碼)
 def register_fonts():
-    font_dir = "fonts"
-    try:
-        pdfmetrics.registerFont(TTFont('NotoSans', os.path.join(font_dir, 'NotoSansTC-Regular.ttf')))
-        pdfmetrics.registerFont(TTFont('NotoSans-Bold', os.path.join(font_dir, 'NotoSansTC-Bold.ttf')))
-    except:
-        pass 
+    """
+    每個 process 只解析一次 TTF (NotoSansTC 數 MB，解析很花 CPU)
+    TTFont 物件留在 pdfmetrics 內，之後每份 PDF 共用已解析的字形表，只各自做子集化
+    回傳 {邏輯字型名稱: 實際使用的字型名稱}
+    """
+    global _fonts
+    if _fonts is not None: return _fonts
+    with _font_lock:
+        if _fonts is None:
+            fonts = {}
+            for name, filename in FONT_FILES.items():
+                try:
+                    pdfmetrics.registerFont(TTFont(name, os.path.join(FONT_DIR, filename)))
+                    fonts[name] = name
+                except Exception as e:
+                    print(f"字型載入失敗 {filename}: {e}")
+                    fonts[name] = FALLBACK_FONTS[name]
+            _fonts = fonts
+    return _fonts
 
-def create_quotation_pdf(data, show_stamp=True):
-    register_fonts()
-    buffer = BytesIO()
-    c = canvas.Canvas(buffer, pagesize=A4)
-    width, height = A4
-    
-    # --- 1. 頁首與 LOGO ---
-    if os.path.exists("assets/LOGO.png"):
-        c.drawImage("assets/LOGO.png", 30, height - 60, width=140, height=35, mask='auto')
+def load_assets():
+    """
+    每個 process 只讀檔、解碼、壓縮一次 LOGO / 大小章 / QR code
+    結果是已壓縮好的 image XObject (與 canvas.drawImage 產生的相同)，以 draw_image() 畫出，
+    每份 PDF 共用同一份壓縮串流，不再逐份做 md5 與 zlib
+    缺檔的項目為 None
+    """
+    global _assets
+    if _assets is not None: return _assets
+    with _asset_lock:
+        if _assets is None:
+            assets = {}
+            for key, (filename, mask) in ASSET_FILES.items():
+                path = os.path.join(ASSET_DIR, filename)
+                try:
+                    assets[key] = _encode_image(path, mask)
+                except Exception as e:
+                    if os.path.exists(path): print(f"圖片載入失敗 {filename}: {e}")
+                    assets[key] = None
+            _assets = assets
+    return _assets
+
+def _encode_image(path, mask):
+    # 名稱與 canvas.drawImage 相同 (原始像素 + 遮罩的摘要)，輸出的 PDF 與直接 drawImage 一致
+    reader = ImageReader(path)
+    rawdata = reader.getRGBData()
+    if mask == "auto" and reader._dataA:
+        mdata = reader._dataA.getRGBData()
+    else:
+        mdata = str(mask).encode("utf8")
+    name = _digester(rawdata + mdata)
+    return pdfdoc.PDFImageXObject(name, reader, mask=mask)
+
+def draw_image(c, image, x, y, width, height):
+    """
+    畫 load_assets() 預先壓縮的圖片 (取代 canvas.drawImage)
+    每份文件第一次用到時登錄該 XObject；登錄的是淺複本，共用的原件 (跨執行緒) 不會被修改
+    """
+    doc = c._doc
+    reg_name = doc.getXObjectName(image.name)
+    if reg_name not in doc.idToObject:
+        obj = copy.copy(image)
+        smask = obj.__dict__.pop("_smask", None)
+        c._setXObjects(obj)
+        doc.Reference(obj, reg_name)
+        doc.addForm(image.name, obj)
+        if smask:
+            mask_name = doc.getXObjectName(smask.name)
+            if mask_name in doc.idToObject:
+                obj.smask = pdfdoc.PDFObjectReference(mask_name)
+            else:
+                smask = copy.copy(smask)
+                c._setXObjects(smask)
+                obj.smask = doc.Reference(smask, mask_name)
+
+    c._currentPageHasImages = 1
+    c.saveState()
+    c.translate(x, y)
+    c.scale(width, height)
+    c._code.append(f"/{reg_name} Do")
+    c.restoreState()
+    c._formsinuse.append(image.name)
+
+def _define_page_chrome(c, fonts, assets):
+    """
+    頁首 (LOGO、標題、分隔線) 與頁尾 (公司資訊、QR code) 畫成 form XObject
+    每份文件只畫一次，每頁以 doForm 引用，多頁報價單不會重複嵌入內容
+    """
+    width, height = PAGE_WIDTH, PAGE_HEIGHT
+    c.beginForm("page_chrome")
+
+    if assets["logo"]:
+        draw_image(c, assets["logo"], 30, height - 60, 140, 35)
     else:
-        c.setFont("NotoSans-Bold", 18)
+        c.setFont(fonts["NotoSans-Bold"], 18)
         c.drawString(30, height - 50, "士林電機 Shihlin Electric")
 
-    c.setFont("NotoSans-Bold", 24)
+    c.setFont(fonts["NotoSans-Bold"], 24)
     c.drawRightString(width - 30, height - 50, "報 價 單")
-    
+
     c.setLineWidth(1)
     c.line(30, height - 70, width - 30, height - 70)
 
+    c.setFont(fonts["NotoSans-Bold"], 10)
+    c.drawString(350, FOOTER_Y, "士林電機廠股份有限公司")
+    c.drawString(350, FOOTER_Y - 15, "負責人：許育瑞")
+    c.drawString(350, FOOTER_Y - 30, "統一編號：11039306")
+
+    if assets["qrcode"]:
+        draw_image(c, assets["qrcode"], width - 80, 20, 50, 50)
+
+    c.endForm()
+
+def new_canvas(fileobj):
+    """建立 A4 canvas 並定義頁首頁尾 form (一份文件一次)"""
+    c = canvas.Canvas(fileobj, pagesize=A4)
+    _define_page_chrome(c, register_fonts(), load_assets())
+    return c
+
+def create_quotation_pdf(data, show_stamp=True):
+    buffer = BytesIO()
+    write_quotation_pdf(data, buffer, show_stamp)
+    buffer.seek(0)
+    return buffer
+
+# 所有 PDF 輸出都經過這裡，量測掛在這一層
+@metrics.instrument("pdf.create_quotation_pdf", rows=lambda args, kwargs, result: len(args[0]['items']))
+def write_quotation_pdf(data, fileobj, show_stamp=True):
+    """把報價單直接寫進 fileobj (BytesIO、暫存檔或磁碟檔案)"""
+    c = new_canvas(fileobj)
+    draw_quotation(c, data, show_stamp)
+    c.save()
+
+def draw_quotation(c, data, show_stamp=True):
+    """
+    在 new_canvas() 建立的 canvas 上畫一張報價單 (可跨多頁)
+    結束時停在最後一頁，不呼叫 showPage()；合併多張時由呼叫端換頁
+    """
+    fonts = register_fonts()
+    font, font_bold = fonts["NotoSans"], fonts["NotoSans-Bold"]
+    assets = load_assets()
+    width, height = A4
+    
+    # --- 1. 頁首頁尾 (每頁共用) ---
+    c.doForm("page_chrome")
+
     # --- 2. 客戶與單號資訊 ---
-    c.setFont("NotoSans", 11)
+    c.setFont(font, 11)
     text_y = height - 100
-    c.drawString(30, text_y, f"客戶名稱：{data['client_name']}")
+    client_name = pdf_layout.truncate(f"客戶名稱：{data['client_name']}", font, 11, 310)
+    c.drawString(30, text_y, client_name)
     c.drawString(30, text_y - 20, f"專案名稱：2401三菱PLC單次專案 (範例)") 
     
     c.drawString(350, text_y,     f"報價單號：{data['id']}")
     c.drawString(350, text_y - 20, f"報價日期：{data['date']}")
     c.drawString(350, text_y - 40, f"營 業 員：曾維崧") 
 
-    # --- 3. 表格標題 ---
-    table_y = height - 170
-    c.setFillColor(colors.lightgrey)
-    c.rect(30, table_y - 5, width - 60, 20, fill=1, stroke=0) 
-    c.setFillColor(colors.black)
-    
-    c.setFont("NotoSans-Bold", 11)
-    c.drawString(40, table_y, "項次")
-    c.drawString(80, table_y, "品名 / 規格")
-    c.drawString(320, table_y, "數量")
-    c.drawString(380, table_y, "單價")
-    c.drawString(480, table_y, "金額")
-    
-    # --- 4. 填入商品明細 ---
-    y = table_y - 25
-    c.setFont("NotoSans", 10)
+    # --- 3. 商品明細 (自動換行、依列高分頁、每頁重畫表頭) ---
+    rows = []
     total_amount = 0
-    
     for i, item in enumerate(data['items']):
-        name = str(item['name'])
         try:
             price = float(item['price'])
             qty = int(item['qty'])
         except:
             price, qty = 0, 0
-            
         subtotal = price * qty
         total_amount += subtotal
-        
-        # 換頁邏輯
-        if y < 200: 
-            c.drawString(width/2, 30, "- 接下頁 -")
-            c.showPage()
-            register_fonts()
-            y = height - 50 
-        
-        c.drawString(40, y, str(i + 1))
-        c.drawString(80, y, name) 
-        c.drawString(320, y, str(qty))
-        c.drawString(380, y, f"{price:,.0f}")
-        c.drawString(480, y, f"{subtotal:,.0f}")
-        c.line(30, y - 5, width - 30, y - 5)
-        y -= 25
-
-    # --- 5. 金額統計 (稅額計算) ---
+        # 品名 / 規格欄：型號一行，規格 (有的話) 從下一行開始，兩者都會自動換行
+        description = "\n".join(filter(None, [str(item['name']), str(item.get('spec') or "").strip()]))
+        rows.append([str(i + 1), description, str(qty), f"{price:,.0f}", f"{subtotal:,.0f}"])
+
+    def next_page():
+        c.setFont(font, 9)
+        c.drawCentredString(width / 2, 30, "- 接下頁 -")
+        c.showPage()
+        c.doForm("page_chrome")
+        return CONTINUED_TOP
+
+    y = pdf_layout.draw_table(c, ITEM_COLUMNS, rows, height - 155, TABLE_BOTTOM, font, font_bold, 10, next_page)
+
+    # --- 4. 金額統計 (稅額計算)，放不下就移到下一頁 ---
+    if y - TOTALS_HEIGHT < TOTALS_BOTTOM:
+        c.showPage()
+        c.doForm("page_chrome")
+        y = CONTINUED_TOP
+
     tax = total_amount * 0.05
     grand_total = total_amount + tax
     
-    y -= 10
-    c.setFont("NotoSans", 11)
+    y -= 20
+    c.setFont(font, 11)
     c.drawRightString(550, y, f"未稅金額合計： {total_amount:,.0f}")
     y -= 20
     c.drawRightString(550, y, f"營業稅 (5%)： {tax:,.0f}")
     y -= 20
-    c.setFont("NotoSans-Bold", 12)
+    c.setFont(font_bold, 12)
     c.drawRightString(550, y, f"報價金額總計： {grand_total:,.0f}")
     
-    # --- 6. 頁尾條款與簽章 ---
-    if y < 150:
-        c.showPage()
-        register_fonts()
-        y = height - 50
-
-    footer_y = 130
-    c.setFont("NotoSans", 9)
+    # --- 5. 頁尾條款與簽章 ---
+    footer_y = FOOTER_Y
+    c.setFont(font, 9)
     c.drawString(30, footer_y, "說明事項：")
     c.drawString(30, footer_y - 15, "1. 本報價單有效期限：15天。")
     c.drawString(30, footer_y - 30, "2. 交貨地點：國內卡車可達之地面，不含安裝。")
     
-    # 蓋章區
-    c.setFont("NotoSans-Bold", 10)
-    c.drawString(350, footer_y, "士林電機廠股份有限公司")
-    c.drawString(350, footer_y - 15, "負責人：許育瑞")
-    c.drawString(350, footer_y - 30, "統一編號：11039306")
-    
-    if show_stamp and os.path.exists("assets/stamp.png"):
-        c.drawImage("assets/stamp.png", 420, footer_y - 60, width=100, height=80, mask='auto')
-
-    if os.path.exists("assets/qrcode.png"):
-        c.drawImage("assets/qrcode.png", width - 80, 20, width=50, height=50)
-
-    c.save()
-    buffer.seek(0)
-    return buffer
\ No newline at end of file
+    # 蓋章區 (公司資訊在頁尾 form 內)
+    if show_stamp and assets["stamp"]:
+        draw_image(c, assets["stamp"], 420, footer_y - 60, 100, 80)
\ No newline at end of file
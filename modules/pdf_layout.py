@@ -0,0 +1,160 @@
+import functools
+from reportlab.lib import colors
+from reportlab.pdfbase import pdfmetrics
+
+# --- PDF 表格排版 ---
+# 量字寬、自動換行、依實際列高分頁，每頁重畫表頭。
+# 字寬以 (字型, 字級) 為單位快取每個字元，一段文字的寬度就是字元寬度相加
+# (reportlab 不做 kerning，結果與 stringWidth 相同)；整體排版與品項字數成線性。
+
+LEADING = 1.3              # 行高 = 字級 x LEADING
+CELL_PAD = 5               # 儲存格左右留白
+ROW_PAD = 6                # 儲存格上下留白
+HEADER_HEIGHT = 20
+MAX_CELL_LINES = 6         # 超過的行數以 … 截斷，避免單列高過一整頁
+ELLIPSIS = "…"
+BREAK_AFTER = " /-_,;)]"   # 英數字串優先在這些字元之後換行
+
+_char_widths = {}
+
+
+def _widths(font, size):
+    table = _char_widths.get((font, size))
+    if table is None:
+        table = _char_widths[(font, size)] = {}
+    return table
+
+
+def _char_width(table, ch, font, size):
+    w = table.get(ch)
+    if w is None:
+        w = table[ch] = pdfmetrics.stringWidth(ch, font, size)
+    return w
+
+
+def text_width(text, font, size):
+    table = _widths(font, size)
+    return sum(_char_width(table, ch, font, size) for ch in text)
+
+
+def _is_wide(ch):
+    # 中日韓文字與全形符號，每個字之間都可以換行
+    return ord(ch) >= 0x2E80
+
+
+def _wrap_line(text, font, size, max_width):
+    table = _widths(font, size)
+    lines = []
+    n = len(text)
+    start, i, width, brk = 0, 0, 0.0, -1
+    while i < n:
+        ch = text[i]
+        w = _char_width(table, ch, font, size)
+        if width + w > max_width and i > start:
+            end = brk if brk > start else i
+            lines.append(text[start:end].rstrip())
+            start = end
+            while start < n and text[start] == " ":
+                start += 1
+            i = max(i, start)
+            width = sum(_char_width(table, c, font, size) for c in text[start:i])
+            brk = -1
+            continue
+        if _is_wide(ch) and i > start:
+            brk = i
+        width += w
+        i += 1
+        if ch in BREAK_AFTER or _is_wide(ch):
+            brk = i
+    if start < n or not lines:
+        lines.append(text[start:].rstrip())
+    return lines
+
+
+@functools.lru_cache(maxsize=8192)
+def wrap(text, font, size, max_width, max_lines=MAX_CELL_LINES):
+    """把文字切成不超過 max_width 的多行 (保留原本的換行)，回傳 tuple"""
+    lines = []
+    for para in str(text).splitlines() or [""]:
+        lines.extend(_wrap_line(para, font, size, max_width))
+    if len(lines) > max_lines:
+        lines = lines[:max_lines]
+        lines[-1] = truncate(lines[-1] + ELLIPSIS, font, size, max_width)
+    return tuple(lines)
+
+
+def truncate(text, font, size, max_width):
+    """單行放不下時從尾端截斷並補上 …"""
+    text = str(text)
+    if text_width(text, font, size) <= max_width: return text
+    table = _widths(font, size)
+    limit = max_width - _char_width(table, ELLIPSIS, font, size)
+    width, end = 0.0, 0
+    for end, ch in enumerate(text):
+        width += _char_width(table, ch, font, size)
+        if width > limit: break
+    return text[:end].rstrip() + ELLIPSIS
+
+
+def layout_rows(rows, columns, font, size):
+    """
+    rows: 每列為各欄字串的 list；columns: [(標題, x, 寬度, 對齊)]
+    回傳 [(每欄的行 tuple, 列高)]
+    """
+    line_height = size * LEADING
+    laid_out = []
+    for cells in rows:
+        wrapped = [wrap(text, font, size, width - 2 * CELL_PAD)
+                   for text, (_, _, width, _) in zip(cells, columns)]
+        height = max(len(lines) for lines in wrapped) * line_height + 2 * ROW_PAD
+        laid_out.append((wrapped, height))
+    return laid_out
+
+
+def _draw_text(c, text, font, size, x, y, width, align):
+    if align == "right":
+        x = x + width - CELL_PAD - text_width(text, font, size)
+    elif align == "center":
+        x = x + (width - text_width(text, font, size)) / 2
+    else:
+        x = x + CELL_PAD
+    c.drawString(x, y, text)
+
+
+def draw_header(c, columns, top, font_bold, size):
+    """表頭：灰底 + 粗體欄名，回傳表頭下緣 y"""
+    left = columns[0][1]
+    right = columns[-1][1] + columns[-1][2]
+    c.setFillColor(colors.lightgrey)
+    c.rect(left, top - HEADER_HEIGHT, right - left, HEADER_HEIGHT, fill=1, stroke=0)
+    c.setFillColor(colors.black)
+    c.setFont(font_bold, size)
+    baseline = top - HEADER_HEIGHT + (HEADER_HEIGHT - size) / 2 + 1
+    for title, x, width, align in columns:
+        _draw_text(c, title, font_bold, size, x, baseline, width, align)
+    return top - HEADER_HEIGHT
+
+
+def draw_table(c, columns, rows, top, bottom, font, font_bold, size, new_page):
+    """
+    從 top 往下畫表格，下一列放不進 bottom 以上就換頁
+    new_page() 負責換頁並回傳新頁的表格起點 y；每頁都重畫表頭
+    回傳最後一列下緣的 y
+    """
+    line_height = size * LEADING
+    left = columns[0][1]
+    right = columns[-1][1] + columns[-1][2]
+
+    y = draw_header(c, columns, top, font_bold, size)
+    c.setFont(font, size)
+    for wrapped, height in layout_rows(rows, columns, font, size):
+        if y - height < bottom:
+            y = draw_header(c, columns, new_page(), font_bold, size)
+            c.setFont(font, size)   # 換頁後字型狀態會重設
+        baseline = y - ROW_PAD - size
+        for lines, (_, x, width, align) in zip(wrapped, columns):
+            for n, text in enumerate(lines):
+                _draw_text(c, text, font, size, x, baseline - n * line_height, width, align)
+        y -= height
+        c.line(left, y, right, y)
+    return y
@@ -0,0 +1,205 @@
+import ast
+import operator
+from functools import lru_cache, reduce
+import numpy as np
+import pandas as pd
+from modules import metrics
+
+# --- 定價規則 ---
+# 規則是一行算式，例如 dealer_price * 0.65、round(經銷價 * 折扣, -1)、max(dealer_price * 0.6, 100)
+# 以 ast 解析後編成巢狀函式 (不經過 eval)，只允許數字、+ - * /、白名單變數與函式。
+# 編譯結果以 lru_cache 快取，同一條規則只解析一次。
+# 變數可以是純量或整欄 (pandas Series)，套用到整份明細或整份目錄都是一次整欄運算。
+# 計算機的「=」與鍵盤輸入也走這裡 (沒有變數的算式)。
+
+# 規則可用的變數 (英文名稱: 中文別名)
+VARIABLES = {
+    "dealer_price": "經銷價",
+    "price": "單價",
+    "qty": "數量",
+    "discount": "折扣",            # 系列折扣表 (依型號開頭)，沒有對應時為 1
+    "client_discount": "客戶折扣",  # 客戶折扣表，沒有對應時為 1
+}
+ALIASES = {alias: name for name, alias in VARIABLES.items()}
+DEFAULT_RULE = "dealer_price * discount * client_discount"
+MAX_RULE_LENGTH = 200
+RULE_CACHE_SIZE = 256
+PRICE_DECIMALS = 0         # 套用規則後的單價取到整數
+MAX_ROUND_DIGITS = 15      # round 的位數上限 (float 的有效位數)
+
+
+class RuleError(ValueError):
+    """規則語法錯誤或無法計算"""
+
+
+def _round(value, digits=0):
+    """四捨五入 (0.5 進位，不用 numpy 的銀行家捨入)；digits 可為負數，例如 -1 取到十位"""
+    if not np.isscalar(digits) or not np.isfinite(digits):
+        raise RuleError("round 的位數必須是數字")
+    if abs(digits) > MAX_ROUND_DIGITS:
+        raise RuleError(f"round 的位數須在 ±{MAX_ROUND_DIGITS} 之內")
+    scale = 10.0 ** int(digits)
+    return np.sign(value) * np.floor(np.abs(value) * scale + 0.5) / scale
+
+
+def _reduce(fn):
+    def call(*values):
+        if len(values) < 2: raise RuleError("min / max 至少要兩個參數")
+        return reduce(fn, values)
+    return call
+
+
+BINARY_OPS = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv}
+UNARY_OPS = {ast.UAdd: operator.pos, ast.USub: operator.neg}
+FUNCTIONS = {
+    "round": _round,
+    "min": _reduce(np.minimum),
+    "max": _reduce(np.maximum),
+    "ceil": np.ceil,
+    "floor": np.floor,
+}
+
+
+class Rule:
+    """編譯好的規則；以關鍵字參數給變數值 (純量或 Series) 呼叫"""
+
+    def __init__(self, text, fn, names):
+        self.text = text
+        self.names = names         # 規則用到的變數 (英文名稱)
+        self._fn = fn
+
+    def __call__(self, **values):
+        missing = self.names - values.keys()
+        if missing:
+            raise RuleError(f"此處無法使用變數：{', '.join(VARIABLES[n] for n in sorted(missing))}")
+        try:
+            return self._fn(values)
+        except ZeroDivisionError:
+            raise RuleError("除以零")
+        except TypeError:
+            raise RuleError(f"函式參數錯誤：{self.text}")
+        except (OverflowError, FloatingPointError, ValueError) as e:
+            if isinstance(e, RuleError): raise
+            raise RuleError(f"數值超出範圍：{self.text}")
+
+    def __repr__(self):
+        return f"Rule({self.text!r})"
+
+
+@lru_cache(maxsize=RULE_CACHE_SIZE)
+def compile_rule(text):
+    """解析並編譯規則 (結果快取)；語法不允許時拋出 RuleError"""
+    text = str(text or "").strip().replace("×", "*").replace("÷", "/")
+    if not text: raise RuleError("規則是空的")
+    if len(text) > MAX_RULE_LENGTH: raise RuleError(f"規則太長 (上限 {MAX_RULE_LENGTH} 字)")
+    try:
+        tree = ast.parse(text, mode="eval")
+    except SyntaxError:
+        raise RuleError(f"算式格式錯誤：{text}")
+    names = set()
+    return Rule(text, _build(tree.body, names), frozenset(names))
+
+
+def _build(node, names):
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        value = node.value
+        return lambda env: value
+    if isinstance(node, ast.Name):
+        name = ALIASES.get(node.id, node.id)
+        if name not in VARIABLES: raise RuleError(f"未知的變數：{node.id}")
+        names.add(name)
+        return lambda env: env[name]
+    if isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPS:
+        op, left, right = BINARY_OPS[type(node.op)], _build(node.left, names), _build(node.right, names)
+        return lambda env: op(left(env), right(env))
+    if isinstance(node, ast.UnaryOp) and type(node.op) in UNARY_OPS:
+        op, operand = UNARY_OPS[type(node.op)], _build(node.operand, names)
+        return lambda env: op(operand(env))
+    if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+            and node.func.id in FUNCTIONS and not node.keywords):
+        fn, args = FUNCTIONS[node.func.id], [_build(a, names) for a in node.args]
+        return lambda env: fn(*(a(env) for a in args))
+    raise RuleError(f"不支援的語法：{ast.unparse(node)}")
+
+
+def evaluate(text, **values):
+    """算一次並回傳 float (計算機用)"""
+    return float(compile_rule(text)(**values))
+
+
+# --- 折扣表 ---
+
+def parse_table(text):
+    """
+    折扣表：每列 `鍵 = 倍率`，也接受 Tab 或逗號分隔；倍率可寫 0.7 或 70%
+    回傳 {鍵: 倍率}；格式錯誤時拋出 RuleError (含列號)
+    """
+    table = {}
+    for n, line in enumerate(str(text or "").splitlines(), 1):
+        if not line.strip() or line.lstrip().startswith("#"): continue
+        for sep in ("=", "\t", ","):
+            if sep in line:
+                key, _, value = line.rpartition(sep)
+                break
+        else:
+            raise RuleError(f"折扣表第 {n} 列缺少倍率：{line.strip()}")
+        value = value.strip()
+        try:
+            rate = float(value[:-1]) / 100 if value.endswith("%") else float(value)
+        except ValueError:
+            raise RuleError(f"折扣表第 {n} 列的倍率不是數字：{value}")
+        if key.strip(): table[key.strip()] = rate
+    return table
+
+
+def lookup_prefix(names, table, default=1.0):
+    """依型號開頭對照系列折扣表 (不分大小寫，最長的開頭優先)，回傳與 names 等長的 Series"""
+    result = pd.Series(default, index=names.index, dtype="float64")
+    if not table: return result
+    lowered = names.fillna("").astype(str).str.lower()
+    matched = pd.Series(False, index=names.index)
+    for prefix in sorted(table, key=len, reverse=True):
+        hit = ~matched & lowered.str.startswith(prefix.lower())
+        result[hit] = table[prefix]
+        matched |= hit
+    return result
+
+
+# --- 整欄套用 ---
+
+def price_frame(df, rule, series_discounts=None, client_discount=1.0):
+    """
+    df 需有 product、dealer_price 欄 (price、qty 可省略)
+    回傳新單價 (float Series)；規則算不出有效價格 (負數、非數字，或用到經銷價但經銷價為 0) 的列維持原單價
+    """
+    compiled = compile_rule(rule)
+    current = df["price"].astype("float64") if "price" in df else pd.Series(0.0, index=df.index)
+    dealer = df["dealer_price"].astype("float64")
+    result = compiled(
+        dealer_price=dealer,
+        price=current,
+        qty=df["qty"] if "qty" in df else 1,
+        discount=lookup_prefix(df["product"], series_discounts) if "discount" in compiled.names else 1.0,
+        client_discount=client_discount,
+    )
+    result = pd.Series(np.broadcast_to(result, len(df)), index=df.index, dtype="float64")
+    valid = np.isfinite(result) & (result >= 0)
+    if "dealer_price" in compiled.names:
+        valid &= dealer > 0
+    return _round(result, PRICE_DECIMALS).where(valid, current)
+
+
+@metrics.instrument("pricing.price_list", rows=lambda args, kwargs, result: len(result))
+def price_list(index, rule, series_discounts=None, client_discount=1.0):
+    """整份目錄的價目表 (index: product_index.ProductIndex)，欄位 型號 / 規格 / 經銷價 / 報價"""
+    catalog = pd.DataFrame({
+        "product": index.names,
+        "dealer_price": pd.Series([index.dealer_prices[n] for n in index.names], dtype="float64"),
+    })
+    prices = price_frame(catalog, rule, series_discounts, client_discount)
+    return pd.DataFrame({
+        "型號": catalog["product"],
+        "規格": [index.specs[n] for n in index.names],
+        "經銷價": catalog["dealer_price"],
+        "報價": prices,
+    })
@@ -0,0 +1,114 @@
+import bisect
+import re
+import numpy as np
+
+# --- 產品索引 ---
+# 由產品目錄建一次 (見 database.get_product_index)，目錄更新時重建。
+# 報價明細的型號檢查、經銷價對照、品項搜尋都查這裡，不必每列重新掃描整份目錄。
+#
+# 搜尋 (search) 依序取：
+#   1. 型號開頭相符 (排序好的型號 + bisect)
+#   2. 型號包含關鍵字
+#   3. 規格包含關鍵字
+#   4. 模糊比對：依共有的 2-gram 比例排序 (打錯字、漏打 - 或 / 也找得到)
+# 比對前統一轉小寫並去掉空白與 - _ / . 等分隔符號。
+# 2-gram 倒排索引以 numpy 陣列保存，一次 bincount 就算完所有產品的命中數。
+
+SEPARATORS = re.compile(r"[\s\-_/.]+")
+FUZZY_MIN_COVERAGE = 0.5   # 模糊比對至少要有一半的 2-gram 相符
+_EMPTY = np.zeros(0, dtype=np.int32)
+
+
+def compact(text):
+    return SEPARATORS.sub("", str(text or "").lower())
+
+
+def _grams(text):
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+class ProductIndex:
+    def __init__(self, products):
+        self.names = [p['name'] for p in products]
+        self.dealer_prices = {p['name']: p.get('dealer_price') or 0 for p in products}
+        self.specs = {p['name']: p.get('spec') or "" for p in products}
+        # 型號比對不分大小寫、忽略前後空白 (方便從 Excel 貼上)
+        self.by_lower = {name.strip().lower(): name for name in self.names}
+
+        self._name_keys = [compact(name) for name in self.names]
+        self._spec_keys = [compact(self.specs[name]) for name in self.names]
+        order = sorted(range(len(self.names)), key=lambda i: self._name_keys[i])
+        self._sorted_keys = [self._name_keys[i] for i in order]
+        self._sorted_ids = order
+
+        postings = {}
+        for i, (name_key, spec_key) in enumerate(zip(self._name_keys, self._spec_keys)):
+            for gram in _grams(name_key) | _grams(spec_key):
+                postings.setdefault(gram, []).append(i)
+        self._postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.dealer_prices
+
+    def resolve(self, text):
+        """把輸入的型號對應到目錄中的正式名稱，找不到回傳 None"""
+        if text is None: return None
+        return self.by_lower.get(str(text).strip().lower())
+
+    def resolve_many(self, series):
+        """整欄版本的 resolve (pandas Series)"""
+        return series.fillna("").astype(str).str.strip().str.lower().map(self.by_lower)
+
+    def search(self, query, k=20):
+        """回傳最相符的 k 個型號 (正式名稱)"""
+        q = compact(query)
+        if not q or not self.names: return []
+        found, seen = [], set()
+
+        def take(ids):
+            for i in ids:
+                if i not in seen:
+                    seen.add(i)
+                    found.append(i)
+                    if len(found) >= k: return True
+            return False
+
+        # 1. 開頭相符
+        lo = bisect.bisect_left(self._sorted_keys, q)
+        hi = bisect.bisect_left(self._sorted_keys, q + "\uffff", lo)
+        if take(self._sorted_ids[lo:min(hi, lo + k)]):
+            return self._result(found)
+
+        grams = _grams(q)
+        if not grams: return self._result(found)
+        lists = [self._postings.get(g, _EMPTY) for g in grams]
+        counts = np.bincount(np.concatenate(lists), minlength=len(self.names))
+
+        # 2 / 3. 包含關鍵字：所有 2-gram 都命中的產品再確認一次子字串
+        in_name, in_spec = [], []
+        for i in np.flatnonzero(counts == len(grams)).tolist():
+            if q in self._name_keys[i]:
+                in_name.append(i)
+            elif len(in_spec) < k and q in self._spec_keys[i]:
+                in_spec.append(i)
+            if len(in_name) >= k: break
+        if take(in_name) or take(in_spec):
+            return self._result(found)
+
+        # 4. 模糊比對
+        candidates = np.flatnonzero(counts >= max(1, FUZZY_MIN_COVERAGE * len(grams)))
+        if len(candidates):
+            top = candidates[np.argsort(-counts[candidates], kind="stable")[:k * 2]]
+            take(top.tolist())
+        return self._result(found)
+
+    def _result(self, ids):
+        return [self.names[i] for i in ids]
+
+    def label(self, name):
+        """選單顯示用：型號｜規格"""
+        spec = self.specs.get(name)
+        return f"{name}｜{spec}" if spec else name
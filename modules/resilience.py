@@ -0,0 +1,159 @@
+import random
+import threading
+import time
+
+# --- 連線韌性：重試 / 斷路器 / 暖機 ---
+# 免費版 Supabase 閒置後會休眠，第一個請求可能要等很久。
+# 這裡把等待時間控制在可預期的範圍：短逾時 + 有限次數重試，
+# 連續失敗後斷路器打開直接失敗，由 database.py 改用快取資料。
+
+
+class CircuitOpenError(Exception):
+    """斷路器打開中，不送出請求"""
+
+
+def retry_call(fn, *args, attempts=3, base_delay=0.3, max_delay=3.0, retry_on=(Exception,), deadline=None):
+    """
+    失敗時以 full jitter 指數退避重試，最後一次的例外原樣拋出
+    deadline: 整體時間預算 (秒)；已花的時間加上退避超過預算就不再重試
+    (單次請求本身的逾時無法中斷，最壞情況約為 deadline + 一次請求逾時)
+    """
+    started = time.monotonic()
+    for attempt in range(attempts):
+        try:
+            return fn(*args)
+        except retry_on:
+            if attempt == attempts - 1: raise
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            if deadline is not None and time.monotonic() - started + delay >= deadline: raise
+            time.sleep(delay)
+
+
+class CircuitBreaker:
+    """
+    closed    : 正常呼叫
+    open      : 連續失敗達 failure_threshold 次，reset_timeout 秒內直接拋 CircuitOpenError
+    half_open : 冷卻結束，放一個請求試探，成功就關閉、失敗再打開
+    只有 trip_on 內的例外 (逾時、連線中斷) 才算失敗，資料驗證錯誤不影響斷路器
+    """
+
+    def __init__(self, failure_threshold=3, reset_timeout=30, trip_on=(Exception,)):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.trip_on = trip_on
+        self.failures = 0
+        self.opened_at = None
+        self.last_error = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self.opened_at is None: return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout: return "half_open"
+        return "open"
+
+    def retry_after(self):
+        """距離下一次試探還有幾秒"""
+        with self._lock:
+            if self.opened_at is None: return 0
+            return max(0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def call(self, fn, *args, **kwargs):
+        with self._lock:
+            state = self._state()
+            if state == "open" or (state == "half_open" and self._probing):
+                raise CircuitOpenError(f"資料庫暫時無法連線：{self.last_error}")
+            if state == "half_open":
+                self._probing = True
+        try:
+            result = fn(*args, **kwargs)
+        except self.trip_on as e:
+            self._record_failure(e)
+            raise
+        except BaseException:
+            with self._lock: self._probing = False
+            raise
+        self._record_success()
+        return result
+
+    def _record_failure(self, error):
+        with self._lock:
+            self._probing = False
+            self.failures += 1
+            self.last_error = error
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+    def _record_success(self):
+        with self._lock:
+            self._probing = False
+            self.failures = 0
+            self.opened_at = None
+            self.last_error = None
+
+
+class Warmup:
+    """啟動時在背景執行緒 ping 資料庫，把休眠喚醒的等待時間從使用者身上移走"""
+
+    def __init__(self, ping, attempts=5, base_delay=1.0, max_delay=8.0):
+        self.ping = ping
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.state = "pending"     # pending / warming / ready / failed
+        self.elapsed = None
+        self.error = None
+        self._done = threading.Event()
+
+    def start(self):
+        if self.state != "pending": return self
+        self.state = "warming"
+        threading.Thread(target=self._run, name="db-warmup", daemon=True).start()
+        return self
+
+    def _run(self):
+        started = time.perf_counter()
+        try:
+            retry_call(self.ping, attempts=self.attempts, base_delay=self.base_delay, max_delay=self.max_delay)
+            self.state = "ready"
+        except Exception as e:
+            self.error = e
+            self.state = "failed"
+        finally:
+            self.elapsed = time.perf_counter() - started
+            self._done.set()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+
+def gather(tasks, timeout):
+    """
+    同時執行互不相依的讀取，共用一個截止時間 (頁面載入時間 ≈ 最慢的一個，而不是全部相加)
+    tasks: {名稱: 無參數函式}
+    回傳 (results, late)：results 為時限內成功完成的結果；late 為逾時或失敗的名稱
+    逾時的執行緒不會被中斷，完成後照樣寫進各自的快取，下一次 rerun 就拿得到
+    """
+    results = {}
+    done = threading.Semaphore(0)
+
+    def run(name, fn):
+        try:
+            results[name] = fn()
+        except Exception as e:
+            print(f"並行讀取 {name} 失敗: {e}")
+        finally:
+            done.release()
+
+    deadline = time.monotonic() + timeout
+    for name, fn in tasks.items():
+        threading.Thread(target=run, args=(name, fn), name=f"load-{name}", daemon=True).start()
+    for _ in tasks:
+        if not done.acquire(timeout=max(0, deadline - time.monotonic())): break
+    finished = dict(results)
+    return finished, [name for name in tasks if name not in finished]
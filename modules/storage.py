@@ -0,0 +1,92 @@
+# --- 儲存後端介面 ---
+# database.py 只透過這個介面存取資料，實作有：
+#   SupabaseBackend (modules/storage_supabase.py) - 正式環境
+#   SQLiteBackend   (modules/storage_sqlite.py)   - 離線 / 展場 / 效能量測
+# 後端方法失敗時一律拋出例外，錯誤訊息與快取由 database.py 處理。
+
+
+class StorageBackend:
+    name = "base"
+    # 視為暫時性 (逾時 / 斷線) 的例外：會重試並計入斷路器
+    transient_errors = (ConnectionError, TimeoutError)
+    # 資料來源識別 (本機快取依此分開存放)；空字串表示不寫入本機快取
+    location = ""
+
+    def ping(self):
+        """最輕量的往返，用來喚醒 / 檢查連線"""
+        raise NotImplementedError
+
+    # --- 客戶 / 產品 ---
+    def list_clients(self):
+        """回傳 [{id, name, tax_id, contact_person, phone, address}, ...]，依 id 排序"""
+        raise NotImplementedError
+
+    def list_products(self):
+        """回傳 [{id, name, spec, dealer_price}, ...]，依 id 排序"""
+        raise NotImplementedError
+
+    def insert_client(self, data):
+        raise NotImplementedError
+
+    def insert_product(self, data):
+        raise NotImplementedError
+
+    def upsert_products(self, records):
+        """依型號 (name) 新增或更新一批產品"""
+        raise NotImplementedError
+
+    # --- 報價單 ---
+    def next_quote_no(self, period):
+        """原子配發 period (YYYYMM) 的下一個單號"""
+        raise NotImplementedError
+
+    def save_quotation(self, client_id, quote_date, period, items):
+        """
+        單一交易寫入主表與明細並更新統計，回傳單號
+        items: [{product_name, quantity, unit_price, dealer_price_snapshot}, ...]
+        """
+        raise NotImplementedError
+
+    def list_quotations(self, start_date=None, end_date=None, client_id=None, quote_no=None):
+        """
+        依日期區間 / 客戶 / 單號列出報價單主表，依 id 排序
+        回傳 [{id, quote_no, quote_date, client_id, client_name}, ...]
+        """
+        raise NotImplementedError
+
+    def list_quotation_items(self, quotation_ids):
+        """一次取回多張報價單的明細，依 id 排序"""
+        raise NotImplementedError
+
+    # --- 歷史查詢 ---
+    def search_history(self, keyword, before_id=None, limit=10):
+        """
+        產品名稱包含 keyword 的明細，id 由新到舊、id < before_id
+        回傳 [{id, product_name, quantity, unit_price, dealer_price_snapshot,
+               quote_date, quote_no, client_name}, ...]
+        """
+        raise NotImplementedError
+
+    def history_for_products(self, client_id, product_names, limit):
+        """
+        一次查詢多個品項的近期報價：每個品項各取此客戶最近 limit 筆 (scope="client")
+        與所有客戶最近 limit 筆 (scope="global")，id 由新到舊
+        回傳欄位同 search_history，另加 scope
+        """
+        raise NotImplementedError
+
+    def list_history_since(self, after_id, limit):
+        """
+        id > after_id 的明細，id 由舊到新 (本機歷史快照增量同步用)
+        欄位同 search_history
+        """
+        raise NotImplementedError
+
+    # --- 統計 ---
+    def dashboard_stats(self, max_age_seconds):
+        """回傳 (總單數, 累積金額)；rollup 超過 max_age_seconds 未對帳時先對帳"""
+        raise NotImplementedError
+
+    def reconcile_stats(self):
+        """全表重新彙總，回傳 (總單數, 累積金額)"""
+        raise NotImplementedError
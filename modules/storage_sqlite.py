@@ -0,0 +1,312 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from modules.storage import StorageBackend
+
+# --- 內嵌 SQLite 後端 ---
+# 離線使用 (展場) 與本機效能量測。WAL 模式：讀取不擋寫入；
+# 每個執行緒一條連線，寫入以 BEGIN IMMEDIATE 序列化。
+# 結構與 Supabase 端一致，rollup / 單號計數器 / 存檔交易的語意相同 (見 sql/)。
+
+SCHEMA = """
+create table if not exists clients (
+    id integer primary key autoincrement,
+    name text not null,
+    tax_id text,
+    contact_person text,
+    phone text,
+    address text,
+    created_at text default current_timestamp
+);
+
+create table if not exists products (
+    id integer primary key autoincrement,
+    name text not null unique,
+    spec text default '',
+    dealer_price real default 0,
+    created_at text default current_timestamp
+);
+
+create table if not exists quotations (
+    id integer primary key autoincrement,
+    quote_no text not null unique,
+    client_id integer references clients(id),
+    quote_date text,
+    created_at text default current_timestamp
+);
+create index if not exists quotations_client_id on quotations(client_id);
+create index if not exists quotations_quote_date on quotations(quote_date);
+
+create table if not exists quotation_items (
+    id integer primary key autoincrement,
+    quotation_id integer not null references quotations(id) on delete cascade,
+    product_name text not null,
+    quantity integer default 0,
+    unit_price real default 0,
+    dealer_price_snapshot real default 0
+);
+create index if not exists quotation_items_quotation_id on quotation_items(quotation_id);
+create index if not exists quotation_items_product_name on quotation_items(product_name);
+
+-- 產品名稱 trigram 全文索引 (對應 Supabase 端的 pg_trgm)
+create virtual table if not exists quotation_items_fts using fts5(
+    product_name, content='quotation_items', content_rowid='id', tokenize='trigram'
+);
+create trigger if not exists quotation_items_fts_ai after insert on quotation_items begin
+    insert into quotation_items_fts(rowid, product_name) values (new.id, new.product_name);
+end;
+create trigger if not exists quotation_items_fts_ad after delete on quotation_items begin
+    insert into quotation_items_fts(quotation_items_fts, rowid, product_name) values ('delete', old.id, old.product_name);
+end;
+create trigger if not exists quotation_items_fts_au after update of product_name on quotation_items begin
+    insert into quotation_items_fts(quotation_items_fts, rowid, product_name) values ('delete', old.id, old.product_name);
+    insert into quotation_items_fts(rowid, product_name) values (new.id, new.product_name);
+end;
+
+create table if not exists quote_sequences (
+    period text primary key,
+    last_seq integer not null default 0
+);
+
+create table if not exists quotation_stats (
+    id integer primary key check (id = 1),
+    total_quotes integer not null default 0,
+    total_amount real not null default 0,
+    reconciled_at real not null default 0
+);
+insert or ignore into quotation_stats (id) values (1);
+"""
+
+# trigram 至少要 3 個字元才能走索引，較短的關鍵字改用 LIKE
+MIN_FTS_KEYWORD = 3
+
+HISTORY_COLUMNS = """
+    i.id, i.product_name, i.quantity, i.unit_price, i.dealer_price_snapshot,
+    q.quote_date, q.quote_no, c.name as client_name
+"""
+
+
+class SQLiteBackend(StorageBackend):
+    name = "sqlite"
+    transient_errors = (sqlite3.OperationalError,)
+
+    def __init__(self, path):
+        self.path = path
+        self.location = os.path.abspath(path)
+        self._local = threading.local()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("pragma journal_mode = wal")
+            conn.execute("pragma synchronous = normal")
+            conn.execute("pragma foreign_keys = on")
+            conn.execute("pragma busy_timeout = 5000")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._conn()
+        conn.execute("begin immediate")
+        try:
+            yield conn
+            conn.execute("commit")
+        except BaseException:
+            conn.execute("rollback")
+            raise
+
+    def _query(self, sql, params=()):
+        return [dict(r) for r in self._conn().execute(sql, params).fetchall()]
+
+    def ping(self):
+        self._conn().execute("select 1").fetchone()
+
+    # --- 客戶 / 產品 ---
+    def list_clients(self):
+        return self._query("select * from clients order by id")
+
+    def list_products(self):
+        return self._query("select * from products order by id")
+
+    def insert_client(self, data):
+        with self._transaction() as conn:
+            conn.execute(
+                "insert into clients (name, tax_id, contact_person, phone, address) values (?, ?, ?, ?, ?)",
+                (data['name'], data.get('tax_id'), data.get('contact_person'), data.get('phone'), data.get('address'))
+            )
+
+    def insert_product(self, data):
+        with self._transaction() as conn:
+            conn.execute(
+                "insert into products (name, spec, dealer_price) values (?, ?, ?)",
+                (data['name'], data.get('spec', ''), data.get('dealer_price', 0))
+            )
+
+    def upsert_products(self, records):
+        with self._transaction() as conn:
+            conn.executemany(
+                "insert into products (name, spec, dealer_price) values (:name, :spec, :dealer_price) "
+                "on conflict(name) do update set spec = excluded.spec, dealer_price = excluded.dealer_price",
+                records
+            )
+
+    # --- 報價單 ---
+    def _allocate(self, conn, period):
+        seq = conn.execute(
+            "insert into quote_sequences (period, last_seq) values (?, 1) "
+            "on conflict(period) do update set last_seq = last_seq + 1 returning last_seq",
+            (period,)
+        ).fetchone()[0]
+        return f"QUO-{period}-{seq:03d}"
+
+    def next_quote_no(self, period):
+        with self._transaction() as conn:
+            return self._allocate(conn, period)
+
+    def save_quotation(self, client_id, quote_date, period, items):
+        with self._transaction() as conn:
+            quote_no = self._allocate(conn, period)
+            quotation_id = conn.execute(
+                "insert into quotations (quote_no, client_id, quote_date) values (?, ?, ?)",
+                (quote_no, client_id, str(quote_date))
+            ).lastrowid
+            conn.executemany(
+                "insert into quotation_items (quotation_id, product_name, quantity, unit_price, dealer_price_snapshot) "
+                "values (?, ?, ?, ?, ?)",
+                [(quotation_id, i['product_name'], i['quantity'], i['unit_price'], i.get('dealer_price_snapshot') or 0) for i in items]
+            )
+            amount = sum(float(i['unit_price']) * int(i['quantity']) for i in items)
+            conn.execute(
+                "update quotation_stats set total_quotes = total_quotes + 1, total_amount = total_amount + ? where id = 1",
+                (amount,)
+            )
+        return quote_no
+
+    def list_quotations(self, start_date=None, end_date=None, client_id=None, quote_no=None):
+        where, params = [], []
+        if start_date:
+            where.append("q.quote_date >= ?")
+            params.append(str(start_date))
+        if end_date:
+            where.append("q.quote_date <= ?")
+            params.append(str(end_date))
+        if client_id:
+            where.append("q.client_id = ?")
+            params.append(client_id)
+        if quote_no:
+            where.append("q.quote_no = ?")
+            params.append(quote_no)
+        return self._query(f"""
+            select q.id, q.quote_no, q.quote_date, q.client_id, c.name as client_name
+            from quotations q left join clients c on c.id = q.client_id
+            {"where " + " and ".join(where) if where else ""}
+            order by q.id
+        """, params)
+
+    def list_quotation_items(self, quotation_ids):
+        ids = list(quotation_ids)
+        items = []
+        # SQLite 參數數量有上限，分批查詢
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            items.extend(self._query(
+                f"select * from quotation_items where quotation_id in ({','.join('?' * len(chunk))}) order by id", chunk
+            ))
+        return items
+
+    # --- 歷史查詢 ---
+    def search_history(self, keyword, before_id=None, limit=10):
+        keyword = keyword or ""
+
+        if len(keyword) >= MIN_FTS_KEYWORD:
+            # 先在全文索引依 rowid 倒序取一頁，再 join 主表 / 客戶
+            phrase = '"' + keyword.replace('"', '""') + '"'
+            cursor_sql = "and rowid < ?" if before_id is not None else ""
+            params = [phrase] + ([before_id] if before_id is not None else []) + [limit]
+            return self._query(f"""
+                with hits as (
+                    select rowid as id from quotation_items_fts
+                    where quotation_items_fts match ? {cursor_sql}
+                    order by rowid desc limit ?
+                )
+                select {HISTORY_COLUMNS}
+                from hits
+                join quotation_items i on i.id = hits.id
+                left join quotations q on q.id = i.quotation_id
+                left join clients c on c.id = q.client_id
+                order by i.id desc
+            """, params)
+
+        pattern = "%" + keyword.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        cursor_sql = "and i.id < ?" if before_id is not None else ""
+        params = [pattern] + ([before_id] if before_id is not None else []) + [limit]
+        return self._query(f"""
+            select {HISTORY_COLUMNS}
+            from quotation_items i
+            left join quotations q on q.id = i.quotation_id
+            left join clients c on c.id = q.client_id
+            where i.product_name like ? escape '\\' {cursor_sql}
+            order by i.id desc limit ?
+        """, params)
+
+    def history_for_products(self, client_id, product_names, limit):
+        return self._query(f"""
+            with wanted(name) as (select value from json_each(?)),
+            ranked as (
+                select {HISTORY_COLUMNS}, q.client_id,
+                    row_number() over (partition by i.product_name order by i.id desc) as global_rank,
+                    row_number() over (partition by i.product_name, q.client_id order by i.id desc) as client_rank
+                from quotation_items i
+                join wanted w on w.name = i.product_name
+                left join quotations q on q.id = i.quotation_id
+                left join clients c on c.id = q.client_id
+            )
+            select 'client' as scope, id, product_name, quantity, unit_price, dealer_price_snapshot,
+                   quote_date, quote_no, client_name
+            from ranked where client_id = ? and client_rank <= ?
+            union all
+            select 'global', id, product_name, quantity, unit_price, dealer_price_snapshot,
+                   quote_date, quote_no, client_name
+            from ranked where global_rank <= ?
+            order by scope, product_name, id desc
+        """, (json.dumps(list(product_names)), client_id, limit, limit))
+
+    def list_history_since(self, after_id, limit):
+        return self._query(f"""
+            select {HISTORY_COLUMNS}
+            from quotation_items i
+            left join quotations q on q.id = i.quotation_id
+            left join clients c on c.id = q.client_id
+            where i.id > ?
+            order by i.id limit ?
+        """, (after_id, limit))
+
+    # --- 統計 ---
+    def dashboard_stats(self, max_age_seconds):
+        row = self._conn().execute(
+            "select total_quotes, total_amount, reconciled_at from quotation_stats where id = 1"
+        ).fetchone()
+        if row is None or row['reconciled_at'] < time.time() - max_age_seconds:
+            return self.reconcile_stats()
+        return int(row['total_quotes']), float(row['total_amount'])
+
+    def reconcile_stats(self):
+        with self._transaction() as conn:
+            row = conn.execute("""
+                update quotation_stats set
+                    total_quotes = (select count(*) from quotations),
+                    total_amount = (select coalesce(sum(unit_price * quantity), 0) from quotation_items),
+                    reconciled_at = ?
+                where id = 1
+                returning total_quotes, total_amount
+            """, (time.time(),)).fetchone()
+        return int(row['total_quotes']), float(row['total_amount'])
@@ -0,0 +1,172 @@
+import httpx
+from supabase import create_client
+from supabase.lib.client_options import ClientOptions
+from modules.storage import StorageBackend
+
+# --- Supabase 後端 ---
+# 需要先套用 sql/ 底下的 migration (rollup、單號計數器、存檔 RPC、trigram 索引)
+
+IN_FILTER_CHUNK = 200      # in_() 篩選每批 id 數，避免 URL 過長
+PAGE_SIZE = 1000           # 不可超過 PostgREST 的 max-rows (Supabase 預設 1000)，超過的列會被默默截掉
+
+
+class SupabaseBackend(StorageBackend):
+    name = "supabase"
+    transient_errors = (httpx.TransportError, ConnectionError, TimeoutError)
+
+    def __init__(self, client, location=""):
+        self.client = client
+        self.location = location
+
+    @classmethod
+    def connect(cls, url, key, timeout=10):
+        # 休眠喚醒交給背景暖機與重試處理，單次請求逾時不必拉長到 60 秒
+        options = ClientOptions(postgrest_client_timeout=timeout)
+        return cls(create_client(url, key, options=options), location=url)
+
+    def ping(self):
+        self.client.table("clients").select("id").limit(1).execute()
+
+    # --- 客戶 / 產品 ---
+    def list_clients(self):
+        return _paged(lambda: self.client.table("clients").select("*"))
+
+    def list_products(self):
+        return _paged(lambda: self.client.table("products").select("*"))
+
+    def insert_client(self, data):
+        self.client.table("clients").insert(data).execute()
+
+    def insert_product(self, data):
+        self.client.table("products").insert(data).execute()
+
+    def upsert_products(self, records):
+        self.client.table("products").upsert(records, on_conflict="name").execute()
+
+    # --- 報價單 ---
+    def next_quote_no(self, period):
+        res = self.client.rpc("next_quote_no", {"p_period": period}).execute()
+        if not res.data: raise RuntimeError("單號配發失敗")
+        return res.data
+
+    def save_quotation(self, client_id, quote_date, period, items):
+        res = self.client.rpc("save_quotation", {
+            "p_client_id": client_id,
+            "p_quote_date": str(quote_date),
+            "p_period": period,
+            "p_items": items
+        }).execute()
+        if not res.data: raise RuntimeError("存檔失敗")
+        return res.data
+
+    def list_quotations(self, start_date=None, end_date=None, client_id=None, quote_no=None):
+        def query():
+            q = self.client.table("quotations").select("id, quote_no, quote_date, client_id, clients(name)")
+            if start_date: q = q.gte("quote_date", str(start_date))
+            if end_date: q = q.lte("quote_date", str(end_date))
+            if client_id: q = q.eq("client_id", client_id)
+            if quote_no: q = q.eq("quote_no", quote_no)
+            return q
+        rows = _paged(query)
+        for row in rows:
+            row['client_name'] = (row.pop('clients', None) or {}).get('name')
+        return rows
+
+    def list_quotation_items(self, quotation_ids):
+        ids = list(quotation_ids)
+        items = []
+        for start in range(0, len(ids), IN_FILTER_CHUNK):
+            chunk = ids[start:start + IN_FILTER_CHUNK]
+            items.extend(_paged(lambda: self.client.table("quotation_items").select("*").in_("quotation_id", chunk)))
+        return items
+
+    # --- 歷史查詢 ---
+    def search_history(self, keyword, before_id=None, limit=10):
+        keyword = keyword or ""
+        if "*" not in keyword:
+            return self._search_page(keyword, before_id, limit)
+        # * 在 ilike 只能以 _ 代替 (見 _contains_pattern)，多出來的列在這裡濾掉，不足一頁就往下補抓
+        needle, rows = keyword.lower(), []
+        while len(rows) < limit:
+            page = self._search_page(keyword, before_id, limit)
+            rows.extend(r for r in page if needle in (r['product_name'] or "").lower())
+            if len(page) < limit: break
+            before_id = page[-1]['id']
+        return rows[:limit]
+
+    def _search_page(self, keyword, before_id, limit):
+        query = self.client.table("quotation_items")\
+            .select("*, quotations(quote_date, quote_no, clients(name))")\
+            .ilike("product_name", _contains_pattern(keyword))
+        if before_id is not None:
+            query = query.lt("id", before_id)
+        return _history_rows(query.order("id", desc=True).limit(limit).execute().data)
+
+    def history_for_products(self, client_id, product_names, limit):
+        # 見 sql/006_history_for_products.sql
+        return self.client.rpc("history_for_products", {
+            "p_client_id": client_id, "p_products": list(product_names), "p_limit": limit
+        }).execute().data
+
+    def list_history_since(self, after_id, limit):
+        response = self.client.table("quotation_items")\
+            .select("*, quotations(quote_date, quote_no, clients(name))")\
+            .gt("id", after_id).order("id").limit(limit).execute()
+        return _history_rows(response.data)
+
+    # --- 統計 ---
+    def dashboard_stats(self, max_age_seconds):
+        res = self.client.rpc("get_dashboard_stats", {"p_max_age_seconds": max_age_seconds}).execute()
+        return _stats_row(res.data)
+
+    def reconcile_stats(self):
+        return _stats_row(self.client.rpc("reconcile_dashboard_stats").execute().data)
+
+
+def _paged(query):
+    """
+    依 id 游標分頁讀完整個結果 (id 由小到大)；query() 每次回傳一個新的、已套用篩選的查詢
+    PostgREST 每次回應最多 max-rows 筆，不分頁時多出的列會被默默截掉
+    """
+    rows, last_id = [], None
+    while True:
+        q = query()
+        if last_id is not None: q = q.gt("id", last_id)
+        page = q.order("id").limit(PAGE_SIZE).execute().data
+        rows.extend(page)
+        if len(page) < PAGE_SIZE: return rows
+        last_id = page[-1]['id']
+
+
+def _contains_pattern(keyword):
+    """
+    「包含 keyword」的 ilike 樣式：反斜線、% 與 _ 以反斜線跳脫 (Postgres LIKE 預設的 escape，與 SQLite 後端、快照搜尋一致)
+    PostgREST 會把 * 一律當成 %，無法跳脫，只能改成單一字元的 _ (search_history 再濾掉多出的列)
+    """
+    escaped = (keyword or "").replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_").replace("*", "_")
+    return f"%{escaped}%"
+
+
+def _stats_row(data):
+    if not data: return 0, 0
+    row = data[0]
+    return int(row['total_quotes'] or 0), float(row['total_amount'] or 0)
+
+
+def _history_rows(data):
+    # 攤平內嵌的 quotations / clients
+    rows = []
+    for item in data:
+        q_data = item.get('quotations') or {}
+        c_data = q_data.get('clients') or {}
+        rows.append({
+            "id": item['id'],
+            "product_name": item['product_name'],
+            "quantity": item['quantity'],
+            "unit_price": item['unit_price'],
+            "dealer_price_snapshot": item.get('dealer_price_snapshot', 0),
+            "quote_date": q_data.get('quote_date'),
+            "quote_no": q_data.get('quote_no'),
+            "client_name": c_data.get('name'),
+        })
+    return rows
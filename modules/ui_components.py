@@ -1,7 +1,9 @@
 import streamlit as st
 import pandas as pd
-import time
-from modules import database
+import functools
+import os
+from datetime import date
+from modules import analytics, bulk_export, database, line_items, metrics, pdf_cache, pricing, product_index
 
 def display_history_table(data_list):
     if not data_list:
@@ -10,15 +12,9 @@ def display_history_table(data_list):
 
     df = pd.DataFrame(data_list)
     
-    # 計算折數
-    def calc_ratio(row):
-        cost = row.get('經銷價', 0)
-        price = row.get('單價', 0)
-        if cost and cost > 0:
-            return f"{price / cost:.2%}"
-        return "N/A"
-
-    df['折數'] = df.apply(calc_ratio, axis=1)
+    # 計算折數 (整欄運算；經銷價為 0 或缺值時留白)
+    cost = pd.to_numeric(df['經銷價'], errors='coerce')
+    df['折數'] = pd.to_numeric(df['單價'], errors='coerce') / cost.where(cost > 0) * 100
     
     cols = ['日期', '客戶', '產品', '數量', '單價', '折數', '單號']
     display_cols = [c for c in cols if c in df.columns]
@@ -29,54 +25,184 @@ def display_history_table(data_list):
         hide_index=True,
         column_config={
             "單價": st.column_config.NumberColumn(format="$%d"),
+            "折數": st.column_config.NumberColumn(format="%.2f%%"),
             "日期": st.column_config.DateColumn(format="YYYY-MM-DD"),
         }
     )
 
 # --- 彈出視窗 (Modal) ---
 @st.dialog("📜 歷史報價查詢")
-def show_history_modal(client_name, product_name):
+def show_history_modal(client_id, client_name, product_name):
     st.subheader(f"產品：{product_name}")
-    st.caption(f"查詢客戶：{client_name}")
-    
-    if "modal_data" not in st.session_state:
-        st.session_state.modal_data = []
-        st.session_state.modal_offset = 0
-        st.session_state.modal_has_more = True
-        st.session_state.modal_first_load = True
-
-    def load_data():
-        bar = st.progress(0, text="正在連線資料庫...")
-        time.sleep(0.1) 
-        
-        new_data, has_more = database.search_product_history(
-            product_name, 
-            offset=st.session_state.modal_offset, 
-            limit=5 
-        )
-        
-        bar.progress(80, text="整理數據中...")
-        st.session_state.modal_data.extend(new_data)
-        st.session_state.modal_offset += 5
-        st.session_state.modal_has_more = has_more
-        
-        bar.progress(100, text="完成！")
-        time.sleep(0.2)
-        bar.empty()
-        st.session_state.modal_first_load = False
 
-    if st.session_state.modal_first_load:
-        load_data()
-        st.rerun()
+    # 報價單上的品項已整批預先抓好 (database.prefetch_history)，這裡直接讀快取
+    history = database.fetch_history_items(client_id, product_name)
 
-    display_history_table(st.session_state.modal_data)
+    st.markdown(f"**{client_name} 的最近報價**")
+    display_history_table(history["client"])
+    st.markdown("**所有客戶的最近報價**")
+    display_history_table(history["global"])
+    st.caption("更多紀錄請至「📊 歷史定價比較」查詢")
 
-    if st.session_state.modal_has_more:
-        if st.button("🔽 載入更多 (5筆)", key="btn_modal_more", use_container_width=True):
-            load_data()
-            st.rerun()
-    elif st.session_state.modal_data:
-        st.caption("✅ 已顯示所有資料")
+# --- 報價明細編輯器 (新增報價單頁) ---
+PICKER_RESULTS = 20
+# 原始明細放在 session_state.quote_items，表格內的編輯由 data_editor 自己保存；
+# 按鈕以 callback 把「原始 + 編輯中」合併後整批套用，再換一個 editor key 重新開始，不需要額外 rerun。
+def _editor_key():
+    return f"quote_items_{st.session_state.quote_items_ver}"
+
+def _current_items():
+    return line_items.apply_delta(st.session_state.quote_items, st.session_state.get(_editor_key()))
+
+def _replace_items(df):
+    st.session_state.quote_items = df
+    st.session_state.quote_items_ver += 1
+
+def _on_add_product(picker_key):
+    name = st.session_state.get(picker_key)
+    if not name: return
+    row = {"product": name, "price": 0, "qty": st.session_state.get("add_qty", 1)}
+    _replace_items(line_items.append(_current_items(), [row]))
+
+def _on_paste(index):
+    pasted = line_items.parse_pasted(st.session_state.get("paste_items", ""), index)
+    _replace_items(line_items.append(_current_items(), pasted))
+    st.session_state.paste_items = ""
+
+def _on_set_qty():
+    _replace_items(line_items.set_all_qty(_current_items(), st.session_state.bulk_qty))
+
+def _on_clear_items():
+    _replace_items(line_items.empty())
+
+def _on_apply_rule(index, client_name):
+    try:
+        series, clients = _pricing_tables("quote_pricing")
+        _replace_items(line_items.apply_rule(_current_items(), index, st.session_state.quote_pricing_rule,
+                                             series, clients.get(client_name, 1.0)))
+    except pricing.RuleError as e:
+        st.session_state.pricing_error = str(e)
+
+# --- 定價規則 (明細整批定價 / 目錄價目表) ---
+def _pricing_inputs(prefix):
+    """規則與折扣表的輸入欄，值存在 session_state[f"{prefix}_rule" / "_series" / "_clients"]"""
+    names = "、".join(f"{name} ({alias})" for name, alias in pricing.VARIABLES.items())
+    st.text_input("定價規則", value=pricing.DEFAULT_RULE, key=f"{prefix}_rule",
+                  help=f"可用變數：{names}；函式：round / min / max / ceil / floor。例如 round(dealer_price * 0.65, -1)")
+    c1, c2 = st.columns(2)
+    c1.text_area("系列折扣表 (型號開頭 = 倍率)", key=f"{prefix}_series", height=100,
+                 placeholder="FX5U = 0.7\nQ03 = 75%")
+    c2.text_area("客戶折扣表 (客戶名稱 = 倍率)", key=f"{prefix}_clients", height=100,
+                 placeholder="大同科技 = 0.95")
+
+def _pricing_tables(prefix):
+    """回傳 (系列折扣表, 客戶折扣表)；格式錯誤時拋出 pricing.RuleError"""
+    return (pricing.parse_table(st.session_state.get(f"{prefix}_series")),
+            pricing.parse_table(st.session_state.get(f"{prefix}_clients")))
+
+def render_line_item_editor(index, client_id, client_name):
+    """
+    index: database.get_product_index()
+    明細中所有品項的歷史報價會整批預先抓取，開啟「📜 歷史」時不必再查詢
+    回傳 line_items.normalize() 後的明細 DataFrame
+    """
+    if "quote_items" not in st.session_state:
+        st.session_state.quote_items = line_items.empty()
+        st.session_state.quote_items_ver = 0
+    _line_item_editor(index, client_id, client_name)
+    return st.session_state.quote_lines
+
+# 編輯明細是 fragment：搜尋、新增、改表格只重跑這一段，不重新讀取客戶清單、不重畫頁面其他部分。
+# 最新的明細存在 session_state.quote_lines；按「儲存」會整頁重跑，會先重算一次再存檔。
+@st.fragment
+def _line_item_editor(index, client_id, client_name):
+    # 品項搜尋：選單只放索引查到的前 PICKER_RESULTS 筆，不把整份目錄送到瀏覽器
+    c1, c2, c3, c4 = st.columns([2, 3, 1, 1])
+    query = c1.text_input("搜尋型號 / 規格", placeholder="🔍 搜尋型號 / 規格 (可模糊比對)",
+                          key="product_query", label_visibility="collapsed")
+    matches = index.search(query, PICKER_RESULTS) if query else []
+    # 選單 key 跟著關鍵字換，換關鍵字時預設選第一個結果
+    picker_key = f"add_product_{product_index.compact(query)}"
+    c2.selectbox("產品", matches, index=0 if matches else None, format_func=index.label,
+                 placeholder="先輸入關鍵字搜尋產品" if not query else "查無相符的產品",
+                 key=picker_key, label_visibility="collapsed")
+    c3.number_input("數量", min_value=1, max_value=line_items.MAX_QTY, value=1, step=1, key="add_qty", label_visibility="collapsed")
+    c4.button("➕ 新增品項", on_click=_on_add_product, args=(picker_key,), use_container_width=True)
+
+    with st.expander("📋 從 Excel 貼上 / 批次修改"):
+        st.text_area("每列一個品項：型號 [Tab] 數量 [Tab] 單價 (數量、單價可省略)", key="paste_items", height=120)
+        b1, b2, b3, b4 = st.columns(4)
+        b1.button("📥 加入貼上的品項", on_click=_on_paste, args=(index,), use_container_width=True)
+        b2.number_input("批次數量", min_value=1, max_value=line_items.MAX_QTY, value=1, step=1, key="bulk_qty", label_visibility="collapsed")
+        b3.button("🔢 全部數量改為此值", on_click=_on_set_qty, use_container_width=True)
+        b4.button("🗑️ 清空明細", on_click=_on_clear_items, use_container_width=True)
+
+    with st.expander("💲 定價規則 (依經銷價 / 折扣表整批重算單價)"):
+        _pricing_inputs("quote_pricing")
+        st.button("💲 套用到所有品項", on_click=_on_apply_rule, args=(index, client_name), use_container_width=True)
+    if st.session_state.get("pricing_error"):
+        st.error(f"定價規則錯誤：{st.session_state.pop('pricing_error')}")
+
+    edited = st.data_editor(
+        st.session_state.quote_items,
+        key=_editor_key(),
+        num_rows="dynamic",
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "product": st.column_config.TextColumn("產品型號", required=True),
+            "price": st.column_config.NumberColumn("單價", min_value=0, format="%d"),
+            "qty": st.column_config.NumberColumn("數量", min_value=1, max_value=line_items.MAX_QTY, step=1, format="%d"),
+        }
+    )
+    lines = line_items.normalize(edited, index)
+
+    unknown = lines.loc[~lines["known"], "product"]
+    if len(unknown):
+        more = " ..." if len(unknown) > 5 else ""
+        st.warning(f"⚠️ 目錄中找不到 {len(unknown)} 個型號：{', '.join(unknown.head(5))}{more}")
+    low = lines[lines["ratio"] < line_items.LOW_RATIO]
+    if len(low):
+        listed = "、".join(f"{p} ({r:.0%})" for p, r in zip(low["product"].head(5), low["ratio"].head(5)))
+        st.warning(f"⚠️ {len(low)} 個品項單價低於經銷價 {line_items.LOW_RATIO:.0%}：{listed}")
+
+    m1, m2, h1, h2 = st.columns([1, 1.5, 3, 1])
+    m1.metric("品項數", len(lines))
+    m2.metric("未稅合計", f"${lines['subtotal'].sum():,.0f}")
+    known = lines.loc[lines["known"], "product"].drop_duplicates().tolist()
+    database.prefetch_history(client_id, known)
+    history_product = h1.selectbox("查詢歷史報價", known, index=None, placeholder="選擇品項查詢歷史報價...",
+                                   key="history_product")
+    h2.write("")
+    if h2.button("📜 歷史", key="btn_history", use_container_width=True) and history_product:
+        show_history_modal(client_id, client_name, history_product)
+
+    st.session_state.quote_lines = lines
+
+# --- 價目表 (資料庫管理頁) ---
+# 整份目錄一次整欄套用定價規則 (5000 個產品約數毫秒)，改規則只重跑這個 fragment
+@st.fragment
+def render_price_list(index, client_names):
+    if not st.toggle("產生價目表", key="price_list_on"): return
+    _pricing_inputs("price_list")
+    client = st.selectbox("套用客戶折扣", ["(不指定)"] + list(client_names), key="price_list_client")
+    try:
+        series, clients = _pricing_tables("price_list")
+        table = pricing.price_list(index, st.session_state.price_list_rule, series, clients.get(client, 1.0))
+    except pricing.RuleError as e:
+        st.error(f"定價規則錯誤：{e}")
+        return
+    st.dataframe(
+        table,
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "經銷價": st.column_config.NumberColumn(format="$%d"),
+            "報價": st.column_config.NumberColumn(format="$%d"),
+        }
+    )
+    st.download_button("📥 下載價目表 (CSV)", data=table.to_csv(index=False).encode("utf-8-sig"),
+                       file_name=f"price_list_{date.today():%Y%m%d}.csv", mime="text/csv")
 
 # --- 歷史定價比較 (獨立頁面) ---
 def render_price_analysis_page():
@@ -94,45 +220,220 @@ def render_price_analysis_page():
 
     if "analysis_data" not in st.session_state:
         st.session_state.analysis_data = []
-        st.session_state.analysis_offset = 0
+        st.session_state.analysis_cursor = None
         st.session_state.analysis_has_more = False
         st.session_state.last_keyword = ""
 
     if do_search:
         st.session_state.analysis_data = []
-        st.session_state.analysis_offset = 0
+        st.session_state.analysis_cursor = None
         st.session_state.analysis_has_more = True
         st.session_state.last_keyword = keyword
         
         with st.spinner("🔍 搜尋中..."):
-            new_data, has_more = database.search_product_history(keyword, offset=0, limit=10)
+            new_data, next_cursor = database.search_product_history(keyword, limit=10)
             st.session_state.analysis_data = new_data
-            st.session_state.analysis_offset = 10
-            st.session_state.analysis_has_more = has_more
+            st.session_state.analysis_cursor = next_cursor
+            st.session_state.analysis_has_more = next_cursor is not None
 
     if st.session_state.analysis_data:
-        st.subheader(f"🔎 '{st.session_state.last_keyword}' 的報價紀錄")
-        display_history_table(st.session_state.analysis_data)
-        
-        if st.session_state.analysis_has_more:
-            if st.button("🔽 載入更多 (10筆)", key="btn_page_more", use_container_width=True):
-                bar = st.progress(0, text="載入更多資料...")
-                time.sleep(0.2)
-                
-                new_data, has_more = database.search_product_history(
-                    st.session_state.last_keyword, 
-                    offset=st.session_state.analysis_offset, 
-                    limit=10
-                )
-                
-                bar.progress(100)
-                st.session_state.analysis_data.extend(new_data)
-                st.session_state.analysis_offset += 10
-                st.session_state.analysis_has_more = has_more
-                bar.empty()
-                st.rerun()
-        else:
-            st.caption("✅ 已達最後一筆")
+        _render_analysis_results()
+        st.divider()
+        render_price_stats(st.session_state.last_keyword)
     
     elif do_search: 
-        st.warning("查無相關資料")
\ No newline at end of file
+        st.warning("查無相關資料")
+
+    st.divider()
+    render_redownload()
+
+def _on_load_more():
+    new_data, next_cursor = database.search_product_history(
+        st.session_state.last_keyword, 
+        before_id=st.session_state.analysis_cursor, 
+        limit=10
+    )
+    st.session_state.analysis_data.extend(new_data)
+    st.session_state.analysis_cursor = next_cursor
+    st.session_state.analysis_has_more = next_cursor is not None
+
+# 「載入更多」只重跑結果表格 (fragment)，不重跑整頁與下方的統計分析
+@st.fragment
+def _render_analysis_results():
+    st.subheader(f"🔎 '{st.session_state.last_keyword}' 的報價紀錄")
+    display_history_table(st.session_state.analysis_data)
+    
+    if st.session_state.analysis_has_more:
+        st.button("🔽 載入更多 (10筆)", key="btn_page_more", on_click=_on_load_more, use_container_width=True)
+    else:
+        st.caption("✅ 已達最後一筆")
+
+@st.fragment
+def render_price_stats(keyword):
+    """關鍵字全部歷史明細的統計：客戶價格區間、折數分佈、價格趨勢、客戶最近報價"""
+    df = database.fetch_history_frame(keyword)
+    if df.empty: return
+    df = analytics.prepare(df)
+    stats = analytics.client_price_stats(df)
+
+    st.subheader(f"📈 '{keyword}' 統計分析 (共 {len(df):,} 筆)")
+    tab1, tab2, tab3, tab4 = st.tabs(["客戶價格區間", "折數分佈", "價格趨勢", "客戶最近報價"])
+
+    with tab1:
+        st.dataframe(
+            stats.rename(columns={
+                "client_name": "客戶", "min": "最低", "median": "中位數", "max": "最高", "count": "筆數",
+                "avg_ratio": "平均折數", "last_price": "最近單價", "last_date": "最近日期", "last_product": "最近產品",
+            }).assign(平均折數=lambda d: d["平均折數"] * 100),
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                "最低": st.column_config.NumberColumn(format="$%d"),
+                "中位數": st.column_config.NumberColumn(format="$%d"),
+                "最高": st.column_config.NumberColumn(format="$%d"),
+                "最近單價": st.column_config.NumberColumn(format="$%d"),
+                "平均折數": st.column_config.NumberColumn(format="%.1f%%"),
+                "最近日期": st.column_config.DateColumn(format="YYYY-MM-DD"),
+            }
+        )
+
+    with tab2:
+        dist = analytics.ratio_distribution(df)
+        if dist.sum():
+            st.bar_chart(dist)
+        else:
+            st.info("沒有經銷價資料，無法計算折數")
+
+    with tab3:
+        trend = analytics.price_trend(df)
+        if trend.empty:
+            st.info("沒有日期資料")
+        else:
+            st.line_chart(trend)
+
+    with tab4:
+        client = st.selectbox("客戶", stats["client_name"].tolist(), key="stats_client")
+        last = analytics.last_price(df, client)
+        if last:
+            price, quote_date, quote_no = last
+            c1, c2, c3 = st.columns(3)
+            c1.metric("最近單價", f"${price:,.0f}")
+            c2.metric("報價日期", quote_date.strftime("%Y-%m-%d") if pd.notna(quote_date) else "N/A")
+            c3.metric("單號", quote_no or "N/A")
+
+# --- PDF 下載 (磁碟快取) ---
+PDF_INLINE_MAX = 2 * 1024 * 1024      # 超過這個大小的 PDF 按下下載時才讀檔 (不隨每次 rerun 送出)
+
+def pdf_download_button(quote_no, show_stamp=True, key=None):
+    """
+    從 PDF 快取提供下載；快取被淘汰時自動依單號重新產生
+    大檔案的 data 傳 callable (pdf_cache.read_by_quote_no)，按下下載才讀檔，不會每次 rerun 都佔著記憶體
+    """
+    path = pdf_cache.get_by_quote_no(quote_no, show_stamp, fetch=database.fetch_quotation)
+    if not path:
+        st.error(f"查無報價單 {quote_no}")
+        return
+    size = os.path.getsize(path)
+    if size <= PDF_INLINE_MAX:
+        with open(path, "rb") as f:
+            st.download_button(label=f"📥 下載 PDF ({quote_no})", data=f, file_name=f"{quote_no}.pdf",
+                               mime="application/pdf", key=key)
+        return
+    st.download_button(label=f"📥 下載 PDF ({quote_no}, {size / 1e6:.1f} MB)",
+                       data=functools.partial(pdf_cache.read_by_quote_no, quote_no, show_stamp, database.fetch_quotation),
+                       file_name=f"{quote_no}.pdf", mime="application/pdf", key=key)
+
+def render_redownload():
+    with st.expander("📥 重新下載報價單"):
+        c1, c2 = st.columns([3, 1])
+        quote_no = c1.text_input("報價單號", placeholder="例如: QUO-202610-001", key="redownload_no").strip()
+        show_stamp = c2.checkbox("顯示公司大小章", value=True, key="redownload_stamp")
+        if quote_no:
+            pdf_download_button(quote_no, show_stamp, key="dl_redownload")
+
+# --- 批次匯出 (資料庫管理頁) ---
+def render_bulk_export():
+    st.subheader("批次匯出報價單 PDF")
+    today = date.today()
+
+    c1, c2 = st.columns(2)
+    date_range = c1.date_input("報價日期區間", value=(today.replace(day=1), today), key="export_range")
+    clients = database.get_clients()
+    client_options = ["(全部客戶)"] + [f"{c['id']}: {c['name']}" for c in clients]
+    client_str = c2.selectbox("客戶", client_options, key="export_client")
+
+    c3, c4 = st.columns(2)
+    fmt = c3.radio("格式", ["ZIP (每張一個檔案)", "合併 PDF (含書籤)"], key="export_format")
+    show_stamp = c4.checkbox("顯示公司大小章", value=True, key="export_stamp")
+
+    if st.button("📦 開始匯出", type="primary", use_container_width=True):
+        # 只點一天時 date_input 回傳的 tuple 只有一個元素
+        dates = date_range if isinstance(date_range, tuple) else (date_range,)
+        if not dates:
+            st.warning("請選擇日期")
+            return
+        start, end = dates[0], dates[-1]
+        client_id = None if client_str == "(全部客戶)" else int(client_str.split(":")[0])
+
+        with st.spinner("讀取報價單..."):
+            quotes = database.fetch_quotations(start, end, client_id)
+        if not quotes:
+            st.warning("查無報價單")
+            return
+
+        bar = st.progress(0, text="產生 PDF...")
+        def show_progress(done, total):
+            bar.progress(done / total, text=f"產生 PDF... {done}/{total}")
+
+        # 寫到磁碟上的匯出檔，不把整個壓縮檔留在記憶體
+        is_zip = fmt.startswith("ZIP")
+        path, out = bulk_export.new_export_file(".zip" if is_zip else ".pdf")
+        try:
+            with out:
+                if is_zip:
+                    bulk_export.export_zip(quotes, show_stamp, on_progress=show_progress, fileobj=out)
+                else:
+                    bulk_export.export_merged(quotes, show_stamp, on_progress=show_progress, fileobj=out)
+        except BaseException:
+            os.remove(path)
+            raise
+        bar.empty()
+        previous = st.session_state.get("bulk_export")
+        if previous and os.path.exists(previous["path"]):
+            os.remove(previous["path"])
+        st.session_state.bulk_export = {
+            "path": path, "count": len(quotes),
+            "file_name": f"quotations_{start}_{end}{'.zip' if is_zip else '.pdf'}",
+            "mime": "application/zip" if is_zip else "application/pdf",
+        }
+
+    # 匯出結果留在 session 裡，按下載 (或其他元件) 造成的 rerun 後仍可再次下載
+    export = st.session_state.get("bulk_export")
+    if export and os.path.exists(export["path"]):
+        st.success(f"✅ 已匯出 {export['count']} 張報價單 ({os.path.getsize(export['path']) / 1e6:.1f} MB)")
+        # data 傳 callable：按下載時才讀檔
+        st.download_button("📥 下載", data=functools.partial(bulk_export.read_file, export["path"]),
+                           file_name=export["file_name"], mime=export["mime"], use_container_width=True)
+
+# --- 效能量測面板 (管理員) ---
+def render_metrics_panel():
+    with st.sidebar.expander("📈 效能量測 (管理員)"):
+        scope = st.radio("範圍", ["本次連線", "全站"], horizontal=True, key="metrics_scope")
+        registry = metrics.session_metrics() if scope == "本次連線" else metrics.process_metrics
+
+        rows = registry.rows() if registry else []
+        if rows:
+            st.dataframe(rows, hide_index=True, use_container_width=True)
+        else:
+            st.caption("尚無資料")
+
+        st.download_button(
+            "⬇️ 匯出 Prometheus",
+            data=metrics.process_metrics.to_prometheus({"pid": os.getpid()}),
+            file_name="quotation_metrics.prom",
+            mime="text/plain",
+            use_container_width=True
+        )
+        if registry and st.button("🔄 重設", key="metrics_reset", use_container_width=True):
+            registry.reset()
+            st.rerun()
@@ -0,0 +1,50 @@
+-- 儀表板統計 rollup
+-- 總單數 / 累積金額存在單一列，save_quotation 寫入時累加，
+-- get_dashboard_stats 讀取時若超過 p_max_age_seconds 未對帳則重新彙總一次。
+
+create table if not exists quotation_stats (
+    id smallint primary key default 1 check (id = 1),
+    total_quotes bigint not null default 0,
+    total_amount numeric not null default 0,
+    reconciled_at timestamptz not null default 'epoch'
+);
+
+insert into quotation_stats (id) values (1) on conflict (id) do nothing;
+
+-- 全表重新彙總 (對帳)
+create or replace function reconcile_dashboard_stats()
+returns table (total_quotes bigint, total_amount numeric)
+language sql as $$
+    update quotation_stats s set
+        total_quotes = (select count(*) from quotations),
+        total_amount = (select coalesce(sum(unit_price * quantity), 0) from quotation_items),
+        reconciled_at = now()
+    where s.id = 1
+    returning s.total_quotes, s.total_amount;
+$$;
+
+-- 新增報價單後累加
+create or replace function bump_dashboard_stats(p_quotes bigint, p_amount numeric)
+returns void
+language sql as $$
+    update quotation_stats set
+        total_quotes = total_quotes + p_quotes,
+        total_amount = total_amount + p_amount
+    where id = 1;
+$$;
+
+-- 儀表板讀取：平常只讀一列，過期才對帳
+create or replace function get_dashboard_stats(p_max_age_seconds integer default 86400)
+returns table (total_quotes bigint, total_amount numeric)
+language plpgsql as $$
+begin
+    if exists (
+        select 1 from quotation_stats s
+        where s.id = 1 and s.reconciled_at < now() - make_interval(secs => p_max_age_seconds)
+    ) then
+        return query select * from reconcile_dashboard_stats();
+    else
+        return query select s.total_quotes, s.total_amount from quotation_stats s where s.id = 1;
+    end if;
+end;
+$$;
@@ -0,0 +1,8 @@
+-- 產品依型號 upsert (batch_import_products 使用 on_conflict=name)
+-- 先移除重複型號 (保留最新一筆)，再加上唯一限制
+
+delete from products a
+using products b
+where a.name = b.name and a.id < b.id;
+
+alter table products add constraint products_name_key unique (name);
@@ -0,0 +1,70 @@
+-- 報價單號配發：每月一列計數器
+-- next_quote_no 以單一 upsert 取號，列鎖保證多人同時存檔不會拿到相同號碼
+
+create table if not exists quote_sequences (
+    period text primary key,            -- YYYYMM
+    last_seq integer not null default 0
+);
+
+-- 既有的重複單號 (舊版取號的競態、取號失敗時的 QUO-YYYYMM-000 備援號) 先重新編號，否則最後的唯一限制會失敗
+-- 每組相同單號保留最早的一筆 (id 最小)，其餘依 id 順序改發該月份目前最大序號之後的號碼
+-- 新舊單號對照記在 quote_no_renumbered (已寄出的 PDF 仍是舊號，需要時據此通知客戶)：
+--     select * from quote_no_renumbered order by quotation_id;
+create table if not exists quote_no_renumbered (
+    quotation_id bigint primary key references quotations(id) on delete cascade,
+    old_quote_no text not null,
+    new_quote_no text not null,
+    renumbered_at timestamptz not null default now()
+);
+
+with numbered as (
+    select id, quote_no,
+           case when quote_no ~ '^QUO-[0-9]{6}-[0-9]+$' then substring(quote_no from 5 for 6)
+                else to_char(coalesce(quote_date, current_date), 'YYYYMM') end as period,
+           row_number() over (partition by quote_no order by id) as copy
+    from quotations
+),
+period_max as (
+    select substring(quote_no from 5 for 6) as period, max(split_part(quote_no, '-', 3)::integer) as max_seq
+    from quotations
+    where quote_no ~ '^QUO-[0-9]{6}-[0-9]+$'
+    group by 1
+),
+renumber as (
+    select id, quote_no as old_quote_no,
+           'QUO-' || period || '-' || lpad(seq::text, greatest(length(seq::text), 3), '0') as new_quote_no
+    from (
+        select n.id, n.quote_no, n.period,
+               coalesce(m.max_seq, 0) + row_number() over (partition by n.period order by n.id) as seq
+        from numbered n
+        left join period_max m on m.period = n.period
+        where n.copy > 1
+    ) dup
+),
+logged as (
+    insert into quote_no_renumbered (quotation_id, old_quote_no, new_quote_no)
+    select id, old_quote_no, new_quote_no from renumber
+)
+update quotations q
+set quote_no = r.new_quote_no
+from renumber r
+where q.id = r.id;
+
+-- 以現有單號初始化計數器 (在重新編號之後，計數器從清理後的最大序號接續)
+insert into quote_sequences (period, last_seq)
+select substring(quote_no from 5 for 6), max(split_part(quote_no, '-', 3)::integer)
+from quotations
+where quote_no ~ '^QUO-[0-9]{6}-[0-9]+$'
+group by 1
+on conflict (period) do update set last_seq = greatest(quote_sequences.last_seq, excluded.last_seq);
+
+create or replace function next_quote_no(p_period text)
+returns text
+language sql as $$
+    insert into quote_sequences as s (period, last_seq) values (p_period, 1)
+    on conflict (period) do update set last_seq = s.last_seq + 1
+    returning 'QUO-' || s.period || '-' || lpad(s.last_seq::text, greatest(length(s.last_seq::text), 3), '0');
+$$;
+
+-- 最後一道防線
+alter table quotations add constraint quotations_quote_no_key unique (quote_no);
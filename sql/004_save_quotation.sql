@@ -0,0 +1,36 @@
+-- 報價單存檔：取號、主表、明細、統計在同一個交易內完成
+-- 任何一步失敗整筆回滾，不會留下沒有明細的主表，也不會浪費單號
+-- p_items: [{"product_name", "quantity", "unit_price", "dealer_price_snapshot"}, ...]
+
+create or replace function save_quotation(
+    p_client_id bigint,
+    p_quote_date date,
+    p_period text,
+    p_items jsonb
+)
+returns text
+language plpgsql as $$
+declare
+    v_quote_no text;
+    v_quotation_id bigint;
+    v_amount numeric;
+begin
+    v_quote_no := next_quote_no(p_period);
+
+    insert into quotations (quote_no, client_id, quote_date)
+    values (v_quote_no, p_client_id, p_quote_date)
+    returning id into v_quotation_id;
+
+    insert into quotation_items (quotation_id, product_name, quantity, unit_price, dealer_price_snapshot)
+    select v_quotation_id, i.product_name, i.quantity, i.unit_price, coalesce(i.dealer_price_snapshot, 0)
+    from jsonb_to_recordset(p_items)
+        as i(product_name text, quantity integer, unit_price numeric, dealer_price_snapshot numeric);
+
+    select coalesce(sum(i.unit_price * i.quantity), 0) into v_amount
+    from jsonb_to_recordset(p_items) as i(quantity integer, unit_price numeric);
+
+    perform bump_dashboard_stats(1, v_amount);
+
+    return v_quote_no;
+end;
+$$;
@@ -0,0 +1,7 @@
+-- 歷史報價搜尋：product_name 三字元 (trigram) 索引
+-- 讓 ilike '%關鍵字%' 走索引，不必全表掃描；分頁改用 id 游標 (keyset)
+
+create extension if not exists pg_trgm;
+
+create index if not exists quotation_items_product_name_trgm
+    on quotation_items using gin (product_name gin_trgm_ops);
@@ -0,0 +1,50 @@
+-- 報價明細「📜 歷史」：一次取回整張報價單所有品項的近期報價
+-- 每個品項各取：此客戶最近 p_limit 筆 (scope = 'client') + 所有客戶最近 p_limit 筆 (scope = 'global')
+-- 每個品項以 lateral 子查詢走 (product_name, id desc) 索引，只讀需要的筆數
+
+create index if not exists quotation_items_product_name_id
+    on quotation_items (product_name, id desc);
+
+create or replace function history_for_products(
+    p_client_id bigint,
+    p_products text[],
+    p_limit integer default 5
+)
+returns table (
+    scope text,
+    id bigint,
+    product_name text,
+    quantity integer,
+    unit_price numeric,
+    dealer_price_snapshot numeric,
+    quote_date date,
+    quote_no text,
+    client_name text
+)
+language sql stable as $$
+    select 'client'::text, h.*
+    from unnest(p_products) as p(name)
+    cross join lateral (
+        select i.id::bigint, i.product_name::text, i.quantity::integer, i.unit_price::numeric,
+               i.dealer_price_snapshot::numeric, q.quote_date::date, q.quote_no::text, c.name::text
+        from quotation_items i
+        join quotations q on q.id = i.quotation_id
+        left join clients c on c.id = q.client_id
+        where i.product_name = p.name and q.client_id = p_client_id
+        order by i.id desc
+        limit p_limit
+    ) h
+    union all
+    select 'global'::text, h.*
+    from unnest(p_products) as p(name)
+    cross join lateral (
+        select i.id::bigint, i.product_name::text, i.quantity::integer, i.unit_price::numeric,
+               i.dealer_price_snapshot::numeric, q.quote_date::date, q.quote_no::text, c.name::text
+        from quotation_items i
+        left join quotations q on q.id = i.quotation_id
+        left join clients c on c.id = q.client_id
+        where i.product_name = p.name
+        order by i.id desc
+        limit p_limit
+    ) h
+$$;
@@ -0,0 +1,58 @@
+import pytest
+
+from benchmarks.fake_supabase import FakeSupabase
+from modules import history_snapshot
+from modules.storage_sqlite import SQLiteBackend
+from modules.storage_supabase import SupabaseBackend
+
+NAMES = [
+    "FX5U-32MR/ES", "fx5u-32mt/es", "50% 折扣套件", "500 折扣套件",
+    "A_B-1", "AXB-1", "C\\D", "CXD", "X*Y", "XZY", "X**Y", "NF32-SV 3P",
+]
+KEYWORDS = ["FX5U", "32m", "50%", "%", "A_B", "_", "C\\D", "\\", "X*Y", "*", "**", "3P", "不存在"]
+
+
+def _seed(backend):
+    backend.insert_client({"name": "客戶", "tax_id": "", "contact_person": "", "phone": "", "address": ""})
+    client_id = backend.list_clients()[0]['id']
+    for n in range(3):
+        items = [{"product_name": name, "quantity": 1, "unit_price": 100, "dealer_price_snapshot": 100} for name in NAMES]
+        backend.save_quotation(client_id, "2026-10-01", "202610", items)
+    return backend
+
+
+@pytest.fixture(scope="module")
+def backends(tmp_path_factory):
+    sqlite = _seed(SQLiteBackend(str(tmp_path_factory.mktemp("db") / "history.db")))
+    supabase = _seed(SupabaseBackend(FakeSupabase()))
+    snapshot = history_snapshot.HistorySnapshot(supabase.list_history_since)
+    snapshot.sync(force=True)
+    return sqlite, supabase, snapshot
+
+
+def _names(rows):
+    return [r['product_name'] for r in rows]
+
+
+@pytest.mark.parametrize("keyword", KEYWORDS)
+def test_search_history_matches_across_backends(backends, keyword):
+    sqlite, supabase, snapshot = backends
+    expected = [name for name in NAMES if keyword.lower() in name.lower()]
+    for limit in (2, 50):
+        rows = sqlite.search_history(keyword, None, limit)
+        assert _names(rows) == _names(supabase.search_history(keyword, None, limit))
+        assert _names(rows) == _names(snapshot.search(keyword, None, limit))
+    assert sorted(set(_names(rows))) == sorted(expected)
+
+
+@pytest.mark.parametrize("keyword", ["X*Y", "50%"])
+def test_search_history_pages_with_cursor(backends, keyword):
+    sqlite, supabase, _ = backends
+    for backend in (sqlite, supabase):
+        seen, cursor = [], None
+        while True:
+            rows = backend.search_history(keyword, cursor, 2)
+            seen.extend(r['id'] for r in rows)
+            if len(rows) < 2: break
+            cursor = rows[-1]['id']
+        assert len(seen) == len(set(seen)) == 3
@@ -0,0 +1,45 @@
+import pandas as pd
+import pytest
+
+from modules import line_items
+from modules.product_index import ProductIndex
+
+INDEX = ProductIndex([{"name": "FX5U-32MR/ES", "spec": "PLC", "dealer_price": 12000}])
+
+
+@pytest.mark.parametrize("text, qty", [
+    ("FX5U-32MR/ES\t3\t100", 3),
+    ("FX5U-32MR/ES\t-5\t100", 1),
+    ("FX5U-32MR/ES\t0\t100", 1),
+    ("FX5U-32MR/ES\t2.6\t100", 3),
+    ("FX5U-32MR/ES\t1e20\t5", line_items.MAX_QTY),
+    ("FX5U-32MR/ES\tnan\t5", 1),
+    ("FX5U-32MR/ES\t-inf\t5", 1),
+    ("FX5U-32MR/ES", 1),
+])
+def test_parse_pasted_qty_is_clipped(text, qty):
+    rows = line_items.append(line_items.empty(), line_items.parse_pasted(text, INDEX))
+    assert rows["qty"].tolist() == [qty]
+    assert rows["qty"].dtype == "int64"
+
+
+def test_parse_pasted_skips_header_row():
+    rows = line_items.parse_pasted("型號\t數量\t單價\nFX5U-32MR/ES\t2\t100", INDEX)
+    assert rows["product"].tolist() == ["FX5U-32MR/ES"]
+
+
+def test_edited_qty_is_clipped():
+    df = line_items.append(line_items.empty(), [{"product": "A", "price": 1, "qty": 2}] * 4)
+    delta = {"edited_rows": {0: {"qty": -3}, 1: {"qty": 1e20}, 2: {"qty": 0.4}, 3: {"qty": None}}}
+    assert line_items.apply_delta(df, delta)["qty"].tolist() == [1, line_items.MAX_QTY, 1, 1]
+
+
+def test_set_all_qty_is_clipped():
+    df = line_items.append(line_items.empty(), [{"product": "A", "price": 1, "qty": 2}])
+    assert line_items.set_all_qty(df, 10 ** 12)["qty"].tolist() == [line_items.MAX_QTY]
+
+
+def test_totals_stay_positive_for_huge_qty():
+    df = line_items.append(line_items.empty(), line_items.parse_pasted("x\t1e20\t5", INDEX))
+    assert (df["qty"] * df["price"]).sum() == line_items.MAX_QTY * 5
+    assert pd.api.types.is_integer_dtype(df["qty"])